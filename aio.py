@@ -0,0 +1,126 @@
+"""Async database access for the hot read pages (ASYNC_MODE=1, experimental).
+
+ASYNC_MODE is off by default, and it does not raise throughput. Flask is a
+WSGI app, so each request still holds a server thread (an a2wsgi thread
+under asgi.py), and that thread blocks in ``run_on_request_thread`` until
+its queries finish. Threads wait on the database exactly as they do with
+the sync views. The one gain is that independent queries of one page run
+concurrently: the entity and its upcoming and past shows on the detail
+pages. benchmarks/bench_async.py measured no difference at 50, 200 and
+1000 clients (its docstring has the numbers). Not blocking threads would
+need these pages served by an ASGI app of their own.
+
+An ``AsyncEngine`` (asyncpg on Postgres, aiosqlite on SQLite) lives on one
+event loop in a background thread, so its connection pool is shared by
+every request. ``async def`` views run on a loop of the request's own
+thread (in place of Flask's default of a new loop per request through
+asgiref); only the database calls, through ``on_db_loop``, are handed to
+the shared loop. Templates render on the request threads, so one slow page
+never holds up other requests' queries. Queries a page needs that do not
+depend on each other run concurrently on separate connections.
+
+The statements are the same ones queries.py builds for the sync views.
+"""
+import asyncio
+import threading
+from datetime import datetime
+from functools import wraps
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import queries
+from models import db, Venue, Artist, Show
+
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+engine = None
+_loop = None
+_local = threading.local()
+
+
+def async_url(url):
+    """``url`` with the async driver for its database."""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def init_async(app):
+    global engine, _loop
+    if not app.config['ASYNC_MODE']:
+        return
+    url = app.config['ASYNC_DATABASE_URL'] or async_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    options = {'pool_pre_ping': True}
+    if make_url(url).get_backend_name() != 'sqlite':
+        options.update(pool_size=app.config['ASYNC_POOL_SIZE'], max_overflow=app.config['ASYNC_MAX_OVERFLOW'])
+    engine = create_async_engine(url, **options)
+    _loop = asyncio.new_event_loop()
+    threading.Thread(target=_loop.run_forever, name='aio-db', daemon=True).start()
+    app.async_to_sync = run_on_request_thread
+
+
+def run_on_request_thread(func):
+    """Flask's async_to_sync: run the view coroutine on this thread's own loop.
+
+    The thread blocks until the coroutine is done; see the module docstring.
+    The loop is kept for the thread's next request. The coroutine runs in the
+    request thread's context, and with it Flask's request context.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        loop = getattr(_local, 'loop', None)
+        if loop is None:
+            loop = _local.loop = asyncio.new_event_loop()
+        return loop.run_until_complete(func(*args, **kwargs))
+    return wrapper
+
+
+async def on_db_loop(coroutine):
+    """Await ``coroutine`` on the database loop, from it or from any other event loop."""
+    if asyncio.get_running_loop() is _loop:
+        return await coroutine
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, _loop))
+
+
+async def _all(statement):
+    async with engine.connect() as connection:
+        return (await connection.execute(statement)).all()
+
+
+async def _get(model, id):
+    async with AsyncSession(engine) as session:
+        entity = await session.get(model, id, options=[db.joinedload(model.genres)])
+        if entity is None:
+            return None
+        return queries.venue_data(entity) if model is Venue else queries.artist_data(entity)
+
+
+async def _detail(model, id, owner_column, counterpart, prefix):
+    now = datetime.now()
+    data, upcoming_rows, past_rows = await asyncio.gather(
+        _get(model, id),
+        _all(queries.show_rows_statement(owner_column, id, counterpart, prefix, True, now)),
+        _all(queries.show_rows_statement(owner_column, id, counterpart, prefix, False, now)),
+    )
+    if data is None:
+        return None
+    return queries.attach_split_shows(data, upcoming_rows, past_rows, prefix)
+
+
+async def venue_detail(venue_id):
+    """queries.venue_detail, with the venue and its upcoming and past shows read concurrently."""
+    return await on_db_loop(_detail(Venue, venue_id, Show.venue_id, Artist, 'artist'))
+
+
+async def artist_detail(artist_id):
+    """queries.artist_detail, with the artist and its upcoming and past shows read concurrently."""
+    return await on_db_loop(_detail(Artist, artist_id, Show.artist_id, Venue, 'venue'))
+
+
+async def venue_directory(genre=None):
+    return queries.group_areas(await on_db_loop(_all(queries.venue_directory_statement(genre))))
+
+
+async def artist_list(genre=None):
+    rows = await on_db_loop(_all(queries.artist_list_statement(genre)))
+    return [{'id': row.id, 'name': row.name} for row in rows]
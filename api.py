@@ -0,0 +1,220 @@
+"""JSON mirror of the listing, search and detail pages under /api/v1.
+
+Payloads come from the same query layer as the HTML views (plain dicts
+built from row tuples) and are encoded with orjson when it is installed.
+``?fields=a,b`` keeps only those keys of each object in ``data``, and
+responses are gzip- or brotli-compressed when the client accepts it.
+/venues/<id>/free-slots lists the gaps in a venue's schedule for a month.
+POST /venues/validate and /artists/validate check a JSON array of records
+against the form rules and return each record's errors, with a 400 when any
+record is invalid; nothing is saved.
+"""
+import gzip
+import json
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, Response, abort, current_app, request
+
+import conditional
+import geo
+import queries
+import scheduling
+import search
+import validation
+from models import db, Venue
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Smaller bodies are not worth the CPU of compressing them.
+COMPRESS_MIN_SIZE = 1024
+# In order of preference when the client accepts several equally.
+ENCODINGS = ('br', 'gzip')
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError('%r is not JSON serializable' % (value,))
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+
+def select_fields(payload):
+    fields = request.args.get('fields')
+    if not fields:
+        return payload
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    if 'data' in payload:
+        return dict(payload, data=[{key: item[key] for key in fields if key in item} for item in payload['data']])
+    return {key: payload[key] for key in fields if key in payload}
+
+
+def compress(body):
+    """``(body, encoding)``: the client's most preferred encoding this server can produce."""
+    if len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    # Without the brotli module, a client accepting br still gets gzip if it accepts that.
+    encoding = request.accept_encodings.best_match(ENCODINGS if brotli is not None else ENCODINGS[1:])
+    if encoding == 'br':
+        return brotli.compress(body, quality=4), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=5), 'gzip'
+    return body, None
+
+
+def json_response(payload, status=200):
+    body, encoding = compress(dumps(select_fields(payload)))
+    response = Response(body, status=status, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@api.errorhandler(404)
+def not_found(error):
+    return json_response({'error': 'not found'}, 404)
+
+
+@api.errorhandler(400)
+def bad_request(error):
+    return json_response({'error': 'bad request'}, 400)
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+def venues():
+    return json_response({'data': queries.venue_directory(request.args.get('genre'))})
+
+
+@api.route('/venues/search')
+def search_venues():
+    return json_response(search.search_venues(request.args.get('q', '')))
+
+
+@api.route('/venues/nearby')
+def nearby_venues():
+    # ?lat=&lng= (degrees), optional ?radius= (km) and ?limit= (nearest first)
+    arguments = geo.nearby_arguments(request.args)
+    if arguments is None:
+        abort(400)
+    return json_response(geo.nearby_venues(*arguments))
+
+
+@api.route('/venues/<int:venue_id>')
+@conditional.conditional_page(queries.venue_validators)
+def venue(venue_id):
+    data = queries.venue_detail(venue_id)
+    if data is None:
+        abort(404)
+    return json_response(data)
+
+
+@api.route('/venues/<int:venue_id>/free-slots')
+def venue_free_slots(venue_id):
+    # ?month=YYYY-MM (this month by default); ?minutes= is the shortest slot wanted
+    now = datetime.now()
+    try:
+        if 'month' in request.args:
+            month = datetime.strptime(request.args['month'], '%Y-%m')
+        else:
+            month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        minutes = int(request.args.get('minutes', current_app.config['SHOW_DEFAULT_MINUTES']))
+    except ValueError:
+        abort(400)
+    if minutes <= 0:
+        abort(400)
+    if db.session.get(Venue, venue_id) is None:
+        abort(404)
+    start, end = max(month, now), (month + timedelta(days=32)).replace(day=1)
+    slots = scheduling.free_slots(venue_id, start, end, timedelta(minutes=minutes)) if start < end else []
+    return json_response({
+        'venue_id': venue_id,
+        'month': month.strftime('%Y-%m'),
+        'minutes': minutes,
+        'data': [{'start_time': slot_start, 'end_time': slot_end} for slot_start, slot_end in slots],
+    })
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+def artists():
+    return json_response({'data': queries.artist_list(request.args.get('genre'))})
+
+
+@api.route('/artists/search')
+def search_artists():
+    return json_response(search.search_artists(request.args.get('q', '')))
+
+
+@api.route('/artists/<int:artist_id>')
+@conditional.conditional_page(queries.artist_validators)
+def artist(artist_id):
+    data = queries.artist_detail(artist_id)
+    if data is None:
+        abort(404)
+    return json_response(data)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+def shows():
+    arguments = queries.show_page_arguments(
+        request.args, current_app.config['SHOWS_PAGE_SIZE'], current_app.config['SHOWS_MAX_PAGE_SIZE'])
+    if arguments is None:
+        abort(400)
+    limit, cursors = arguments
+    page = queries.show_page(limit, **cursors)
+    return json_response({
+        'data': page['shows'],
+        'prev_cursor': page['prev_cursor'],
+        'next_cursor': page['next_cursor'],
+    })
+
+
+#  Validation
+#  ----------------------------------------------------------------
+
+def _validate(schema):
+    rows = request.get_json(silent=True)
+    if not isinstance(rows, list) or len(rows) > current_app.config['VALIDATE_MAX_ROWS']:
+        abort(400)
+    if not all(isinstance(row, dict) for row in rows):
+        abort(400)
+    records, errors = validation.validate(schema, rows)
+    valid = sum(record is not None for record in records)
+    return json_response({
+        'count': len(rows),
+        'valid': valid,
+        'errors': errors,
+    }, 200 if valid == len(rows) else 400)
+
+
+@api.route('/venues/validate', methods=['POST'])
+def validate_venues():
+    return _validate(validation.VENUE)
+
+
+@api.route('/artists/validate', methods=['POST'])
+def validate_artists():
+    return _validate(validation.ARTIST)
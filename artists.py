@@ -0,0 +1,157 @@
+"""Artist pages: list, search, detail, create and edit."""
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+
+import aio
+import cache
+import conditional
+import jobs
+import queries
+import search
+from forms import ArtistForm
+from models import db, Artist, Genre
+
+artists = Blueprint('artists', __name__, url_prefix='/artists')
+
+
+@artists.route('')
+@cache.cached_page('artists')
+def index():
+    # ?genre=<name> keeps only the artists of that genre
+    return render_template('pages/artists.html', artists=queries.artist_list(request.args.get('genre')))
+
+
+@artists.route('/search', methods=['POST'], endpoint='search')
+def search_artists():
+    search_term = request.form.get('search_term', '')
+    response = cache.fragment(
+        'search:artists:' + search_term.strip().lower(), ['artists'],
+        lambda: search.search_artists(search_term))
+    return render_template('pages/search_artists.html', results=response, search_term=search_term,
+                           min_term_length=search.MIN_TERM_LENGTH)
+
+
+@artists.route('/<int:artist_id>')
+@conditional.conditional_page(queries.artist_validators)
+@cache.cached_page('artist:{artist_id}')
+def show(artist_id):
+    # shows the artist page with the given artist_id
+    data = queries.artist_detail(artist_id)
+    if data is None:
+        abort(404)
+    cache.add_tags(*('venue:%s' % show['venue_id'] for show in data['past_shows'] + data['upcoming_shows']))
+    return render_template('pages/show_artist.html', artist=data)
+
+
+def fill_artist(artist, form):
+    """Copy the fields of a submitted ArtistForm onto ``artist``; returns it."""
+    artist.name = form.name.data
+    artist.city = form.city.data
+    artist.state = form.state.data
+    artist.phone = form.phone.data
+    artist.genres = Genre.get_or_create_all(form.genres.data)
+    artist.image_link = form.image_link.data
+    artist.facebook_link = form.facebook_link.data
+    artist.website = form.website_link.data
+    artist.seeking_venue = form.seeking_venue.data
+    artist.seeking_description = form.seeking_description.data
+    return artist
+
+
+#  Update
+#  ----------------------------------------------------------------
+
+@artists.route('/<int:artist_id>/edit', methods=['GET'])
+def edit(artist_id):
+    form = ArtistForm()
+    artist = {
+        "id": 4,
+        "name": "Guns N Petals",
+        "genres": ["Rock n Roll"],
+        "city": "San Francisco",
+        "state": "CA",
+        "phone": "326-123-5000",
+        "website": "https://www.gunsnpetalsband.com",
+        "facebook_link": "https://www.facebook.com/GunsNPetals",
+        "seeking_venue": True,
+        "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
+        "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
+    }
+    # TODO: populate form with fields from artist with ID <artist_id>
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+
+@artists.route('/<int:artist_id>/edit', methods=['POST'])
+def edit_submission(artist_id):
+    artist = db.session.get(Artist, artist_id)
+    if artist is None:
+        abort(404)
+    image_link = artist.image_link
+    try:
+        fill_artist(artist, ArtistForm(request.form))
+        if artist.image_link != image_link:
+            jobs.check_image_later('artist', artist)
+        db.session.commit()
+        flash('Artist ' + artist.name + ' was successfully updated!')
+    except Exception:
+        db.session.rollback()
+        flash('An error occurred. Artist could not be updated.')
+        current_app.logger.exception('Error updating artist %s', artist_id)
+    finally:
+        db.session.close()
+    return redirect(url_for('artists.show', artist_id=artist_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@artists.route('/create', methods=['GET'])
+def create_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@artists.route('/create', methods=['POST'])
+def create_submission():
+    form = ArtistForm(request.form)
+    try:
+        new_artist = fill_artist(Artist(), form)
+        db.session.add(new_artist)
+        db.session.flush()
+        # Checked by a worker; committed with the artist.
+        jobs.check_image_later('artist', new_artist)
+        db.session.commit()
+        flash('Artist ' + new_artist.name + ' was successfully listed!')
+    except Exception:
+        db.session.rollback()
+        flash('An error occurred. Artist could not be listed.')
+        current_app.logger.exception('Error adding artist')
+    finally:
+        db.session.close()
+    return render_template('pages/home.html')
+
+
+#  Async variants
+#  ----------------------------------------------------------------
+# With ASYNC_MODE=1 these replace the sync views of the same endpoint: the
+# queries run on the async engine in aio.py, independent ones concurrently.
+
+async def index_async():
+    return render_template('pages/artists.html', artists=await aio.artist_list(request.args.get('genre')))
+
+
+async def show_async(artist_id):
+    data = await aio.artist_detail(artist_id)
+    if data is None:
+        abort(404)
+    cache.add_tags(*('venue:%s' % show['venue_id'] for show in data['past_shows'] + data['upcoming_shows']))
+    return render_template('pages/show_artist.html', artist=data)
+
+
+@artists.record_once
+def use_async_views(state):
+    if state.app.config['ASYNC_MODE']:
+        state.app.view_functions.update({
+            'artists.index': cache.cached_page('artists')(index_async),
+            'artists.show': conditional.conditional_page(queries.artist_validators)(
+                cache.cached_page('artist:{artist_id}')(show_async)),
+        })
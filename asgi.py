@@ -0,0 +1,15 @@
+"""ASGI entry point, for ASGI servers such as uvicorn or hypercorn:
+
+    ASYNC_MODE=1 uvicorn asgi:application --workers 4
+
+Needs a2wsgi. The Flask app is still WSGI underneath: a2wsgi runs it on a
+pool of ASGI_THREADS threads per process, and a request holds its thread
+until it is answered. ASYNC_MODE=1 (experimental, see aio.py) reads the
+hot pages through the async engine, but those threads still wait on it.
+"""
+from a2wsgi import WSGIMiddleware
+
+from app import create_app
+
+app = create_app()
+application = WSGIMiddleware(app, workers=app.config['ASGI_THREADS'])
@@ -0,0 +1,183 @@
+"""Fingerprinted, bundled and precompressed static assets.
+
+``flask build-assets`` writes every file under static/ to static/dist/ with
+a content hash in its name, joins the stylesheets and scripts of each entry
+in BUNDLES into one minified file, stores a ``.gz`` (and, when the brotli
+package is installed, a ``.br``) copy of each text asset next to it, and
+records the names in static/dist/manifest.json.
+
+Once a manifest exists, ``url_for('static', filename=...)`` returns the
+hashed name, ``asset_urls(bundle)`` returns the single bundle URL, and
+hashed files are served with an immutable far-future Cache-Control and the
+best precompressed variant the client accepts. Without a manifest (a fresh
+checkout) the sources are linked one by one, as before.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bundle name -> source files, relative to static/, in load order.
+BUNDLES = {
+    'css/site.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'js/head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    'js/site.js': [
+        'js/libs/jquery-1.11.1.min.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+        'js/script.js',
+    ],
+}
+DIST = 'dist'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.map', '.txt', '.json', '.eot', '.ttf', '.otf')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+_CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s*([{};,>])\s*')
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)(?!data:|https?:|//|/|#)([^'")?#]+)([^'")]*)\1\s*\)''')
+
+manifest = {}
+
+
+def minify_css(text):
+    """Drop comments (except /*! licences */) and the whitespace around punctuation."""
+    text = _CSS_COMMENT.sub('', text)
+    text = _CSS_SPACE.sub(r'\1', text)
+    return re.sub(r'\s+', ' ', text).replace(';}', '}').strip()
+
+
+def _hashed(path, content):
+    root, ext = os.path.splitext(path)
+    return '%s/%s.%s%s' % (DIST, root, hashlib.sha256(content).hexdigest()[:12], ext)
+
+
+def _rewrite_urls(text, source, names):
+    """Point relative url()s of ``source`` at the hashed copies of their targets."""
+    def replace(match):
+        target = os.path.normpath(os.path.join(os.path.dirname(source), match.group(2))).replace(os.sep, '/')
+        return 'url("/static/%s%s")' % (names.get(target, target), match.group(3))
+    return _CSS_URL.sub(replace, text)
+
+
+def build(static_folder):
+    """Write static/dist/ and its manifest; returns the manifest."""
+    output = os.path.join(static_folder, DIST)
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    names, contents = {}, {}
+    for directory, subdirectories, files in os.walk(static_folder):
+        subdirectories[:] = [name for name in subdirectories if os.path.join(directory, name) != output]
+        for name in files:
+            path = os.path.relpath(os.path.join(directory, name), static_folder).replace(os.sep, '/')
+            if not name.startswith('.'):
+                with open(os.path.join(static_folder, path), 'rb') as source:
+                    contents[path] = source.read()
+
+    # Everything but stylesheets first, so stylesheets can link the hashed copies.
+    for path in sorted(contents, key=lambda path: path.endswith('.css')):
+        content = contents[path]
+        if path.endswith('.css'):
+            content = _rewrite_urls(content.decode('utf-8'), path, names).encode('utf-8')
+            contents[path] = content
+        names[path] = _hashed(path, content)
+    for bundle, sources in BUNDLES.items():
+        if bundle.endswith('.css'):
+            content = '\n'.join(minify_css(contents[source].decode('utf-8')) for source in sources)
+        else:
+            # Scripts are concatenated as they are; the libraries are already minified.
+            content = '\n;\n'.join(contents[source].decode('utf-8').strip() for source in sources) + '\n'
+        contents[bundle] = content.encode('utf-8')
+        names[bundle] = _hashed(bundle, contents[bundle])
+
+    for path, hashed in names.items():
+        target = os.path.join(static_folder, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as out:
+            out.write(contents[path])
+        if path.endswith(COMPRESSIBLE):
+            with open(target + '.gz', 'wb') as out:
+                out.write(gzip.compress(contents[path], compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(target + '.br', 'wb') as out:
+                    out.write(brotli.compress(contents[path]))
+    with open(os.path.join(output, 'manifest.json'), 'w') as out:
+        json.dump(names, out, indent=2, sort_keys=True)
+    return names
+
+
+def load_manifest(static_folder):
+    manifest.clear()
+    try:
+        with open(os.path.join(static_folder, DIST, 'manifest.json')) as source:
+            manifest.update(json.load(source))
+    except FileNotFoundError:
+        pass
+
+
+def asset_urls(bundle):
+    """URLs to link for ``bundle``: the built bundle, or its sources before a build."""
+    if bundle in manifest:
+        return [url_for('static', filename=bundle)]
+    return [url_for('static', filename=source) for source in BUNDLES[bundle]]
+
+
+def hashed_static(endpoint, values):
+    if endpoint == 'static' and values.get('filename') in manifest:
+        values['filename'] = manifest[values['filename']]
+
+
+def serve_static(filename):
+    static_folder = current_app.static_folder
+    if not filename.startswith(DIST + '/'):
+        return current_app.send_static_file(filename)
+    # Hashed names never change content, so they can be cached for good.
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.isfile(os.path.join(static_folder, filename + suffix)):
+            response = send_from_directory(
+                static_folder, filename + suffix,
+                mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(static_folder, filename)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def init_assets(app):
+    load_manifest(app.static_folder)
+    app.url_defaults(hashed_static)
+    app.add_template_global(asset_urls)
+    app.view_functions['static'] = serve_static
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_command():
+    """Bundle, fingerprint and precompress static/ into static/dist/."""
+    names = build(current_app.static_folder)
+    load_manifest(current_app.static_folder)
+    click.echo('%d files and %d bundles written to static/%s/' % (len(names) - len(BUNDLES), len(BUNDLES), DIST))
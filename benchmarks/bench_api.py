@@ -0,0 +1,42 @@
+"""Cost of turning 1k shows into a response: JSON encoding versus render_template."""
+import json
+
+from flask import render_template
+
+from common import app, reset_db, seed, timer
+import api
+import queries
+
+SHOWS = 1000
+ROUNDS = 50
+
+
+def main():
+    with app.app_context():
+        reset_db()
+        seed(venues=100, artists=100, shows=SHOWS)
+        page = queries.show_page(SHOWS)
+        payload = {'data': page['shows'], 'prev_cursor': None, 'next_cursor': page['next_cursor']}
+        with app.test_request_context('/shows'):
+            render_template('pages/shows.html', limit=SHOWS, **page)
+            candidates = [
+                ('render_template', lambda: render_template('pages/shows.html', limit=SHOWS, **page)),
+                ('json', lambda: json.dumps(payload, default=api._default, separators=(',', ':'))),
+            ]
+            if api.orjson is not None:
+                candidates.append(('orjson', lambda: api.orjson.dumps(payload)))
+            print('%16s %14s %10s' % ('encoder', 'ms / 1k shows', 'bytes'))
+            for name, encode in candidates:
+                with timer() as elapsed:
+                    for _ in range(ROUNDS):
+                        body = encode()
+                print('%16s %14.2f %10d' % (name, elapsed['ms'] / ROUNDS, len(body)))
+        client = app.test_client()
+        for encoding in ('identity', 'gzip', 'br'):
+            response = client.get('/api/v1/shows?limit=100', headers={'Accept-Encoding': encoding})
+            print('/api/v1/shows?limit=100 %-8s -> %6d bytes (%s)' % (
+                encoding, len(response.get_data()), response.headers.get('Content-Encoding', 'identity')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Throughput of the sync WSGI path versus ASYNC_MODE at 50/200/1000 concurrent clients.
+
+Start both servers against the same seeded database, then point this at them:
+
+    gunicorn -w 4 --threads 8 -b :8000 'app:create_app()'
+    ASYNC_MODE=1 uvicorn asgi:application --workers 4 --port 8001
+    python benchmarks/bench_async.py http://127.0.0.1:8000 http://127.0.0.1:8001
+
+Each client is a keep-alive connection cycling through the hot read pages
+(the page cache should be off, CACHE_BACKEND=none, to measure the database
+path) for DURATION seconds.
+
+Both modes under the same server, on one CPU, SQLite with 2000 venues,
+5000 artists and 100k shows (flask seed --seed 1), CACHE_BACKEND=none:
+
+    uvicorn asgi:application --port 8000
+    ASYNC_MODE=1 uvicorn asgi:application --port 8001
+
+      server  clients      req/s     p99 ms   errors
+        sync       50       26.2     2973.0        0
+       async       50       25.3     2862.1        0
+        sync      200       26.6     8550.1        0
+       async      200       27.0     8255.8        0
+        sync     1000       24.1    42657.5        0
+       async     1000       24.6    41547.8        0
+
+No difference: a request holds its a2wsgi thread either way (see aio.py),
+and here the pages are bound by rendering, not by waiting on the database.
+"""
+import asyncio
+import sys
+import time
+from urllib.parse import urlsplit
+
+CONCURRENCY = [50, 200, 1000]
+DURATION = 10
+PATHS = ['/venues', '/venues/{id}', '/artists', '/artists/{id}']
+IDS = 20
+
+
+async def fetch(reader, writer, host, path):
+    writer.write(('GET %s HTTP/1.1\r\nHost: %s\r\n\r\n' % (path, host)).encode())
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = dict(line.split(': ', 1) for line in lines[1:] if ': ' in line)
+    headers = {key.lower(): value for key, value in headers.items()}
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+        keep_alive = headers.get('connection', '').lower() != 'close' and lines[0].startswith('HTTP/1.1')
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
+
+
+async def client(number, base, deadline, latencies, errors):
+    parts = urlsplit(base)
+    host, port = parts.hostname, parts.port or 80
+    connection = None
+    request = number
+    while time.perf_counter() < deadline:
+        path = PATHS[request % len(PATHS)].format(id=request % IDS + 1)
+        request += 1
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(host, port)
+            status, keep_alive = await fetch(*connection, '%s:%d' % (host, port), path)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            errors.append(path)
+            connection = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            errors.append(path)
+        if not keep_alive:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def run(base, concurrency):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + DURATION
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number, base, deadline, latencies, errors) for number in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan')
+    return len(latencies) / elapsed, p99, len(errors)
+
+
+def main(urls):
+    labels = ['sync', 'async'] if len(urls) == 2 else ['server %d' % i for i in range(len(urls))]
+    print('%8s %8s %10s %10s %8s' % ('server', 'clients', 'req/s', 'p99 ms', 'errors'))
+    for concurrency in CONCURRENCY:
+        for label, base in zip(labels, urls):
+            rps, p99, errors = asyncio.run(run(base, concurrency))
+            print('%8s %8d %10.1f %10.1f %8d' % (label, concurrency, rps, p99, errors))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    main(sys.argv[1:])
@@ -0,0 +1,48 @@
+"""The `datetime` template filter over 100k timestamps, before and after caching."""
+import random
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from common import timer
+import filters
+
+COUNT = 100000
+
+
+def format_datetime_uncached(value, format='medium'):
+    # The filter as it was: generic parsing and pattern lookup on every call.
+    date = value if isinstance(value, datetime) else dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main():
+    rng = random.Random(3)
+    start = datetime(2035, 1, 1, 20)
+    # Shows cluster on a limited set of start times, so values repeat.
+    datetimes = [start + timedelta(hours=rng.randint(0, 24 * 90)) for _ in range(COUNT)]
+    inputs = {
+        'datetime': datetimes,
+        'iso string': [value.isoformat() + '.000Z' for value in datetimes],
+    }
+    print('%12s %8s %12s %12s' % ('input', 'format', 'before ms', 'after ms'))
+    for name, values in inputs.items():
+        for format in ('full', 'medium'):
+            with timer() as before:
+                for value in values:
+                    format_datetime_uncached(value, format)
+            filters._format_datetime.cache_clear()
+            with timer() as after:
+                for value in values:
+                    filters.format_datetime(value, format)
+            print('%12s %8s %12.1f %12.1f' % (name, format, before['ms'], after['ms']))
+    print(filters._format_datetime.cache_info())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""Time show_venue and show_artist, and their 304 revalidation, from 0 to 10k shows.
+
+The statement counts are printed for reference; tests/test_detail_pages.py
+checks them.
+"""
+from common import app, db, reset_db, seed, count_queries, timer
+
+SHOW_COUNTS = [0, 10, 100, 1000, 10000]
+
+
+def main():
+    client = app.test_client()
+    print('%8s %8s %8s %10s' % ('shows', 'page', 'queries', 'ms'))
+    with app.app_context():
+        for shows in SHOW_COUNTS:
+            reset_db()
+            # A single venue and artist own every show.
+            seed(venues=1, artists=1, shows=shows)
+            for page in ('/venues/1', '/artists/1'):
+                db.session.remove()
+                with count_queries() as statements, timer() as elapsed:
+                    response = client.get(page)
+                print('%8d %8s %8d %10.1f' % (shows, page, len(statements), elapsed['ms']))
+
+                db.session.remove()
+                with count_queries() as statements, timer() as elapsed:
+                    response = client.get(page, headers={'If-None-Match': response.headers['ETag']})
+                print('%8d %8s %8d %10.1f  (304)' % (shows, page, len(statements), elapsed['ms']))
+
+
+if __name__ == '__main__':
+    main()
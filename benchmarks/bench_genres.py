@@ -0,0 +1,80 @@
+"""Genre filtering: comma-joined string column versus the Genre link tables.
+
+The legacy layout is rebuilt in a scratch table holding the same artists
+with their genres joined by commas, as create_artist_submission used to
+store them.
+"""
+import random
+import sys
+
+import sqlalchemy as sa
+
+from common import app, db, reset_db, seed, timer
+from models import Genre, artist_genres
+import queries
+
+SIZES = [1000, 100000]
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+    'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+    'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll',
+    'Soul', 'Other',
+]
+ROUNDS = 20
+
+legacy = sa.Table(
+    'legacy_artist', sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('name', sa.String),
+    sa.Column('genres', sa.String(120)),
+)
+
+
+def seed_genres(size, rng):
+    db.session.execute(sa.insert(Genre), [{'name': name} for name in GENRES])
+    links, rows = [], []
+    for artist_id in range(1, size + 1):
+        picked = rng.sample(range(len(GENRES)), rng.randint(1, 3))
+        links.extend({'artist_id': artist_id, 'genre_id': index + 1} for index in picked)
+        rows.append({'id': artist_id, 'name': 'Artist %d' % artist_id,
+                     'genres': ','.join(GENRES[index] for index in picked)})
+    db.session.execute(sa.insert(artist_genres), links)
+    legacy.drop(db.engine, checkfirst=True)
+    legacy.create(db.engine)
+    db.session.execute(sa.insert(legacy), rows)
+    db.session.commit()
+
+
+def legacy_filter(genre):
+    rows = db.session.execute(
+        sa.select(legacy.c.id, legacy.c.name, legacy.c.genres)
+        .where(legacy.c.genres.like('%' + genre + '%'))
+        .order_by(legacy.c.name, legacy.c.id)
+    )
+    # 'Rock' would also match 'Rock n Roll', so every hit is split and checked.
+    return [(row.id, row.name) for row in rows if genre in row.genres.split(',')]
+
+
+def main(sizes):
+    print('%9s %8s %12s %12s %8s' % ('artists', 'genre', 'string ms', 'linked ms', 'hits'))
+    rng = random.Random(7)
+    with app.app_context():
+        for size in sizes:
+            reset_db()
+            seed(venues=1, artists=size)
+            seed_genres(size, rng)
+            for genre in ('Jazz', 'Soul', 'Pop'):
+                with timer() as string_column:
+                    for _ in range(ROUNDS):
+                        expected = legacy_filter(genre)
+                with timer() as linked:
+                    for _ in range(ROUNDS):
+                        found = queries.artist_list(genre)
+                assert len(found) == len(expected), (len(found), len(expected))
+                print('%9d %8s %12.2f %12.2f %8d' % (
+                    size, genre, string_column['ms'] / ROUNDS, linked['ms'] / ROUNDS, len(found)))
+            legacy.drop(db.engine)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,78 @@
+"""Radius and nearest-venue lookups on the geohash index, up to 1M venues.
+
+Venues are scattered around the gazetteer's cities (normal spread of about
+15 km, so city centres are dense and the outskirts sparse) with a few
+spread evenly over the country. Queries are drawn the same way, so both
+crowded and empty neighbourhoods are measured. Each size reports p50 and
+p99 of geo.nearby for three radii and for the 10 nearest venues with no
+radius, and the average number of venues returned.
+"""
+import random
+import time
+
+from sqlalchemy import insert
+
+from common import app, db, reset_db
+from models import Venue
+import geo
+
+SIZES = [10000, 100000, 1000000]
+QUERIES = 500
+RADII = [1, 5, 25]
+NEAREST = 10
+SPREAD = 0.15
+# Roughly the contiguous United States.
+SOUTH, NORTH, WEST, EAST = 25.0, 49.0, -124.0, -67.0
+
+
+def point(rng, centres):
+    if rng.random() < 0.05:
+        return rng.uniform(SOUTH, NORTH), rng.uniform(WEST, EAST)
+    latitude, longitude = rng.choice(centres)
+    return rng.gauss(latitude, SPREAD), rng.gauss(longitude, SPREAD)
+
+
+def venues(count, rng, centres):
+    for i in range(count):
+        latitude, longitude = point(rng, centres)
+        yield {'name': 'Venue %d' % i, 'city': 'Somewhere', 'state': 'CA', 'address': '%d Main Street' % i,
+               'latitude': latitude, 'longitude': longitude, 'geohash': geo.encode(latitude, longitude)}
+
+
+def percentiles(times):
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.99)]
+
+
+def main():
+    centres = list(geo.load_gazetteer()[0].values())
+    print('%9s %10s %8s %8s %8s' % ('venues', 'query', 'p50 ms', 'p99 ms', 'found'))
+    with app.app_context():
+        reset_db()
+        rng = random.Random(22)
+        total = 0
+        for size in SIZES:
+            batch = []
+            for row in venues(size - total, rng, centres):
+                batch.append(row)
+                if len(batch) == 10000:
+                    db.session.execute(insert(Venue), batch)
+                    batch = []
+            if batch:
+                db.session.execute(insert(Venue), batch)
+            db.session.commit()
+            total = size
+            probes = [point(rng, centres) for _ in range(QUERIES)]
+            for label, radius, limit in ([('%d km' % radius, radius, geo.MAX_LIMIT) for radius in RADII]
+                                         + [('%d nearest' % NEAREST, None, NEAREST)]):
+                times, found = [], 0
+                for latitude, longitude in probes:
+                    start = time.perf_counter()
+                    found += len(geo.nearby(Venue, latitude, longitude, radius, limit))
+                    times.append((time.perf_counter() - start) * 1000)
+                p50, p99 = percentiles(times)
+                print('%9d %10s %8.2f %8.2f %8.1f' % (size, label, p50, p99, found / len(probes)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Image bytes of the shows page, and /img miss and hit latency.
+
+Artists and venues get image_links to a local HTTP stub serving 1600x1200
+JPEGs (about the size of the photos people paste in). The script loads
+the images of one 30-tile /shows page as the page used to (the originals)
+and through /img, as JPEG and as WebP, timing the first request (fetch
+and resize) and the cached ones. tests/test_images.py covers broken
+links, stale ?v= and eviction.
+
+Needs Pillow.
+"""
+import http.server
+import io
+import os
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+CACHE_DIR = tempfile.mkdtemp(prefix='fyyur-images-')
+os.environ['IMAGE_CACHE_DIR'] = CACHE_DIR
+# The stub listens on a loopback address.
+os.environ['IMAGE_FETCH_ALLOW_PRIVATE'] = '1'
+
+from PIL import Image, ImageFilter
+
+from common import app, db, reset_db, seed
+from models import Artist, Venue
+
+SOURCES = 20
+
+
+def photo(seed):
+    rng = random.Random(seed)
+    image = Image.effect_noise((1600, 1200), 60).convert('RGB')
+    image = Image.blend(image, Image.new('RGB', image.size, tuple(rng.randrange(256) for _ in range(3))), 0.6)
+    out = io.BytesIO()
+    image.filter(ImageFilter.GaussianBlur(2)).save(out, 'JPEG', quality=90)
+    return out.getvalue()
+
+
+PHOTOS = {'/%d.jpg' % i: photo(i) for i in range(SOURCES)}
+fetches = []
+
+
+class Stub(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        fetches.append(self.path)
+        body = PHOTOS.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def get(client, url, accept):
+    start = time.perf_counter()
+    response = client.get(url, headers={'Accept': accept})
+    return response, (time.perf_counter() - start) * 1000
+
+
+def main():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = 'http://127.0.0.1:%d' % server.server_port
+    client = app.test_client()
+    try:
+        with app.app_context():
+            reset_db()
+            seed(venues=SOURCES, artists=SOURCES, shows=300)
+            for model in (Venue, Artist):
+                for record in db.session.scalars(db.select(model)):
+                    record.image_link = '%s/%d.jpg' % (base, record.id % SOURCES)
+            db.session.commit()
+
+        page = client.get('/shows').get_data(as_text=True)
+        urls = re.findall(r'<img src="([^"]+)"', page)
+        originals = sum(len(PHOTOS['/%d.jpg' % (int(url.split('/')[3]) % SOURCES)]) for url in urls)
+        print('shows page: %d images, originals %d KB' % (len(urls), originals // 1024))
+
+        print('%-6s %12s %12s %12s %10s' % ('format', 'miss p50 ms', 'hit p50 ms', 'hit p99 ms', 'page KB'))
+        for name, accept in (('jpeg', 'image/*'), ('webp', 'image/webp,image/*')):
+            misses, hits, total, seen = [], [], 0, set()
+            for url in urls:
+                response, elapsed = get(client, url, accept)
+                (hits if url in seen else misses).append(elapsed)
+                seen.add(url)
+                total += len(response.get_data())
+                response.close()
+            for _ in range(20):
+                for url in urls:
+                    response, elapsed = get(client, url, accept)
+                    hits.append(elapsed)
+                    response.close()
+            hits.sort()
+            print('%-6s %12.2f %12.2f %12.2f %10d' % (
+                name, statistics.median(misses), statistics.median(hits),
+                hits[int(len(hits) * 0.99)], total // 1024))
+        print('source fetches: %d for %d distinct images and 2 formats' % (len(fetches), len(set(urls))))
+    finally:
+        server.shutdown()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Worker startup cost: importing the app and building it, from ``python -X importtime``.
+
+Each run is a fresh interpreter that imports app.py and builds the app (with
+create_app, or the module-level app of trees from before the factory), as a
+gunicorn worker does. Pass checkouts to compare, e.g. a worktree of the
+previous revision against this one:
+
+    git worktree add /tmp/fyyur-before HEAD~1
+    python benchmarks/bench_importtime.py /tmp/fyyur-before .
+
+Prints the median wall time and the slowest imports made by app.py in each tree.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+RUNS = 7
+TOP = 12
+WORKER = '''
+import time
+start = time.perf_counter()
+import app
+if hasattr(app, 'create_app'):
+    app.create_app()
+print(time.perf_counter() - start)
+'''
+
+
+def parse(stderr):
+    """{module imported by app.py: cumulative microseconds} from -X importtime output."""
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0 and name.strip() == 'app':
+            return children
+        if depth == 0:
+            children = {}
+        elif depth == 1:
+            # A module is reported after the modules it imported.
+            children[name.strip()] = int(cumulative)
+    return children
+
+
+def run(checkout, *options):
+    env = dict(os.environ, DATABASE_URL=os.environ.get('DATABASE_URL', 'sqlite://'))
+    result = subprocess.run([sys.executable] + list(options) + ['-c', WORKER], cwd=checkout, env=env,
+                            check=True, capture_output=True, text=True)
+    return float(result.stdout.split()[-1]), result.stderr
+
+
+def main(checkouts):
+    for checkout in checkouts:
+        # -X importtime itself slows imports down, so time the runs without it.
+        wall = statistics.median(run(checkout)[0] for _ in range(RUNS)) * 1000
+        modules = parse(run(checkout, '-X', 'importtime')[1])
+        print('%s: import and build app %.1f ms (median of %d)' % (os.path.abspath(checkout), wall, RUNS))
+        for name, micros in sorted(modules.items(), key=lambda item: -item[1])[:TOP]:
+            print('  %-28s %8.1f ms' % (name, micros / 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))])
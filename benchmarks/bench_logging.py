@@ -0,0 +1,73 @@
+"""Request-path cost of app.logger calls: synchronous FileHandler versus the queued pipeline.
+
+Each handler writes to a file whose writes are slowed by SLOW_WRITE_MS to
+stand in for a busy disk. The synchronous handler pays that delay inside
+every log call; the queued one only pays for the enqueue, and drops records
+once its bounded queue is full rather than stalling the request.
+"""
+import logging
+import os
+import tempfile
+import time
+from logging import FileHandler
+
+from common import app
+import logs
+
+CALLS = 2000
+SLOW_WRITE_MS = 1.0
+QUEUE_SIZE = 1000
+
+
+class SlowFile(object):
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        time.sleep(SLOW_WRITE_MS / 1000)
+        return self.stream.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def slow(handler):
+    handler.stream = SlowFile(handler._open())
+    return handler
+
+
+def measure(handler):
+    logger = logging.getLogger('bench_logging')
+    logger.handlers[:] = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    timings = []
+    with app.test_request_context('/venues/1'):
+        app.preprocess_request()
+        for i in range(CALLS):
+            start = time.perf_counter()
+            logger.info('Rendered venue %d', i)
+            timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return sum(timings) / len(timings), timings[int(len(timings) * 0.99)]
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    config = dict(app.config, LOG_QUEUE_SIZE=QUEUE_SIZE)
+    sync = slow(FileHandler(os.path.join(directory, 'sync.log')))
+    sync.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
+    queued_file = slow(logs.file_handler(config, os.path.join(directory, 'queued.log')))
+    queued_file.setFormatter(logs.JSONFormatter())
+
+    print('%d log calls, %.1f ms per disk write' % (CALLS, SLOW_WRITE_MS))
+    print('%-22s %10s %10s %8s' % ('handler', 'mean ms', 'p99 ms', 'dropped'))
+    mean, p99 = measure(sync)
+    print('%-22s %10.4f %10.4f %8d' % ('FileHandler', mean, p99, 0))
+    before = logs.dropped.value
+    mean, p99 = measure(logs.queued(queued_file, config))
+    print('%-22s %10.4f %10.4f %8d' % ('queued (drop)', mean, p99, logs.dropped.value - before))
+
+
+if __name__ == '__main__':
+    main()
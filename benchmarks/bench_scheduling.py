@@ -0,0 +1,61 @@
+"""Double-booking checks and free-slot lookups as one venue's schedule grows.
+
+The naive check loads every show of the venue and the artist and scans them;
+scheduling.find_conflict makes one probe per owner on the (owner, start_time)
+indexes, so its cost should stay flat as the schedule grows.
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from common import app, db, reset_db, seed, timer
+from models import Show
+import scheduling
+
+SIZES = [1000, 10000, 100000]
+ARTISTS = 1000
+CHECKS = 1000
+
+
+def naive_conflict(venue_id, artist_id, start_time, end_time):
+    for column, owner_id in ((Show.venue_id, venue_id), (Show.artist_id, artist_id)):
+        for other_start, other_end in db.session.execute(select(Show.start_time, Show.end_time).where(column == owner_id)):
+            if other_start < end_time and other_end > start_time:
+                return True
+    return False
+
+
+def main():
+    rng = random.Random(5)
+    start = datetime(2030, 1, 1)
+    print('%9s %14s %14s %14s' % ('shows', 'naive ms/chk', 'index ms/chk', 'month slots ms'))
+    with app.app_context():
+        for size in SIZES:
+            reset_db()
+            seed(venues=1, artists=ARTISTS)
+            # Back to back one-hour shows at venue 1, a different artist each hour.
+            db.session.execute(insert(Show), [{
+                'venue_id': 1,
+                'artist_id': hour % ARTISTS + 1,
+                'start_time': start + timedelta(hours=hour),
+                'end_time': start + timedelta(hours=hour, minutes=rng.choice((30, 45, 60))),
+            } for hour in range(size)])
+            db.session.commit()
+            probes = [start + timedelta(hours=rng.randrange(size), minutes=rng.choice((0, 50))) for _ in range(CHECKS)]
+            naive_checks = probes[:max(CHECKS * 1000 // size, 10)]
+            with timer() as naive:
+                for probe in naive_checks:
+                    naive_conflict(1, 1, probe, probe + timedelta(minutes=5))
+            with timer() as indexed:
+                for probe in probes:
+                    scheduling.find_conflict(1, 1, probe, probe + timedelta(minutes=5))
+            month = start + timedelta(hours=size // 2)
+            with timer() as slots:
+                scheduling.free_slots(1, month, month + timedelta(days=31), timedelta(minutes=10))
+            print('%9d %14.3f %14.3f %14.1f' % (
+                size, naive['ms'] / len(naive_checks), indexed['ms'] / len(probes), slots['ms']))
+
+
+if __name__ == '__main__':
+    main()
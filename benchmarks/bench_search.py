@@ -0,0 +1,40 @@
+"""Search latency of the naive ILIKE scan versus search.py at growing table sizes.
+
+    python benchmarks/bench_search.py [rows ...]
+"""
+import sys
+
+from common import app, db, reset_db, seed, timer
+from models import Venue
+import search
+
+SIZES = [1000, 100000, 1000000]
+TERMS = ['Venue 12', 'nue 99', 'v', 'no such venue']
+ROUNDS = 20
+
+
+def naive(term):
+    return Venue.query.filter(Venue.name.ilike('%' + term + '%')).all()
+
+
+def main(sizes):
+    print('%9s %15s %12s %12s' % ('venues', 'term', 'ilike ms', 'search ms'))
+    with app.app_context():
+        for size in sizes:
+            reset_db()
+            seed(venues=size)
+            # Build the in-process index outside of the timed section.
+            search.search_venues('warm up')
+            for term in TERMS:
+                with timer() as ilike:
+                    for _ in range(ROUNDS):
+                        naive(term)
+                        db.session.expunge_all()
+                with timer() as indexed:
+                    for _ in range(ROUNDS):
+                        search.search_venues(term)
+                print('%9d %15r %12.2f %12.2f' % (size, term, ilike['ms'] / ROUNDS, indexed['ms'] / ROUNDS))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
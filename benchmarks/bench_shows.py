@@ -0,0 +1,30 @@
+"""Time to first byte and peak memory of /shows as the Show table grows."""
+import tracemalloc
+
+from common import app, db, reset_db, seed, timer
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+
+def main():
+    client = app.test_client()
+    print('%9s %8s %10s %10s' % ('shows', 'stream', 'ttfb ms', 'peak KiB'))
+    with app.app_context():
+        for size in SIZES:
+            reset_db()
+            seed(venues=100, artists=100, shows=size)
+            for stream in ('0', '1'):
+                db.session.remove()
+                tracemalloc.start()
+                with timer() as ttfb:
+                    response = client.get('/shows?stream=' + stream, buffered=False)
+                    next(iter(response.response))
+                b''.join(response.response)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                response.close()
+                print('%9d %8s %10.1f %10d' % (size, stream, ttfb['ms'], peak // 1024))
+
+
+if __name__ == '__main__':
+    main()
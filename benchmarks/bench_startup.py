@@ -0,0 +1,71 @@
+"""Time to first response of a fresh worker, with and without the Jinja bytecode cache.
+
+Each run starts a new Python process, as a freshly forked or restarted
+worker would be, imports the app and times the first request to each page,
+which is when Jinja parses and compiles the page's templates. Runs:
+
+    none     TEMPLATE_CACHE_DIR unset: every worker compiles every template
+    warm     after ``flask precompile-templates``: workers load bytecode
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PAGES = [
+    '/', '/venues', '/venues/1', '/artists', '/artists/1', '/shows',
+    '/venues/create', '/artists/create', '/shows/create', '/venues/1/edit', '/artists/1/edit',
+]
+
+
+def worker():
+    start = time.perf_counter()
+    from common import app, reset_db, seed
+    imported = time.perf_counter() - start
+    with app.app_context():
+        reset_db()
+        seed(venues=5, artists=5, shows=20)
+    client = app.test_client()
+    timings = {}
+    for page in PAGES:
+        start = time.perf_counter()
+        response = client.get(page)
+        timings[page] = time.perf_counter() - start
+        assert response.status_code == 200, (page, response.status_code)
+    print(json.dumps({'import': imported, 'pages': timings}))
+
+
+def spawn(cache_dir):
+    env = dict(os.environ, TEMPLATE_CACHE_DIR=cache_dir)
+    output = subprocess.run([sys.executable, __file__, '--worker'], env=env, cwd=HERE,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(runs):
+    cache_dir = tempfile.mkdtemp(prefix='jinja_cache_')
+    env = dict(os.environ, TEMPLATE_CACHE_DIR=cache_dir, FLASK_APP='app')
+    subprocess.run([sys.executable, '-m', 'flask', 'precompile-templates'], env=env,
+                   cwd=os.path.dirname(HERE), check=True)
+
+    results = {label: [spawn(directory) for _ in range(runs)] for label, directory in (('none', ''), ('warm', cache_dir))}
+    print('%-18s %10s %10s' % ('first request ms', 'none', 'warm'))
+    for page in PAGES:
+        best = [min(run['pages'][page] for run in results[label]) * 1000 for label in ('none', 'warm')]
+        print('%-18s %10.1f %10.1f' % ((page,) + tuple(best)))
+    totals = [min(sum(run['pages'].values()) for run in results[label]) * 1000 for label in ('none', 'warm')]
+    print('%-18s %10.1f %10.1f' % (('all pages',) + tuple(totals)))
+    imports = [min(run['import'] for run in results[label]) * 1000 for label in ('none', 'warm')]
+    print('%-18s %10.1f %10.1f' % (('import app',) + tuple(imports)))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['--worker']:
+        worker()
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
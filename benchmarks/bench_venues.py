@@ -0,0 +1,25 @@
+"""/venues must cost a constant number of queries however many venues exist."""
+from common import app, db, reset_db, seed, count_queries, timer
+
+SIZES = [10, 100, 1000, 10000, 100000]
+
+
+def main():
+    client = app.test_client()
+    query_counts = set()
+    print('%8s %8s %10s' % ('venues', 'queries', 'ms'))
+    with app.app_context():
+        for size in SIZES:
+            reset_db()
+            seed(venues=size, artists=max(size // 10, 1), shows=size * 2)
+            db.session.remove()
+            with count_queries() as statements, timer() as elapsed:
+                response = client.get('/venues')
+            assert response.status_code == 200, response.status_code
+            query_counts.add(len(statements))
+            print('%8d %8d %10.1f' % (size, len(statements), elapsed['ms']))
+    assert len(query_counts) == 1, 'query count grew with venue rows: %s' % sorted(query_counts)
+
+
+if __name__ == '__main__':
+    main()
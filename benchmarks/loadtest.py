@@ -0,0 +1,281 @@
+"""Drive a running Fyyur server with a realistic mix of requests.
+
+Every route is exercised except DELETE /venues/<id>, which is not
+implemented yet: the HTML and JSON read pages, search, /venues/nearby,
+free slots, /img, /metrics and static files, and the writes (creating
+venues, artists and shows, the edit submissions and record validation).
+The writes add rows, so run against a seeded throwaway database, or pass
+--read-only. Detail pages and edits are chosen with the same Zipf skew as
+``flask seed``, so hot venues and artists take most of the traffic.
+Latency percentiles and throughput, overall and per route, are written to
+a JSON file that can be diffed between releases:
+
+    flask seed --venues 2000 --artists 5000 --shows 200000 --seed 1
+    CACHE_BACKEND=redis gunicorn -w 4 'app:create_app()'
+    python benchmarks/loadtest.py --base-url http://127.0.0.1:8000 --duration 60 --output loadtest.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from forms import GENRES
+from seeder import CITIES, zipf_weights
+
+SEARCH_TERMS = ['hop', 'the', 'Club', 'velvet', 'band', 'echo', 'Fox', 'or', 'a', 'zz']
+# Where /venues/nearby is asked from.
+PLACES = [(40.7128, -74.0060), (34.0522, -118.2437), (41.8781, -87.6298), (30.2672, -97.7431),
+          (36.1627, -86.7816), (37.7749, -122.4194), (47.6062, -122.3321), (29.9511, -90.0715)]
+
+# (route name, weight, method, path template); {venue}, {artist}, {term},
+# {lat} and {lng} are drawn per request, and BODIES builds the POST bodies.
+MIX = [
+    ('index', 5, 'GET', '/'),
+    ('venues', 10, 'GET', '/venues'),
+    ('show_venue', 15, 'GET', '/venues/{venue}'),
+    ('search_venues', 6, 'POST', '/venues/search'),
+    ('artists', 8, 'GET', '/artists'),
+    ('show_artist', 15, 'GET', '/artists/{artist}'),
+    ('search_artists', 6, 'POST', '/artists/search'),
+    ('shows', 10, 'GET', '/shows'),
+    ('create_venue_form', 1, 'GET', '/venues/create'),
+    ('create_artist_form', 1, 'GET', '/artists/create'),
+    ('create_shows', 1, 'GET', '/shows/create'),
+    ('edit_venue', 1, 'GET', '/venues/{venue}/edit'),
+    ('edit_artist', 1, 'GET', '/artists/{artist}/edit'),
+    ('api_venues', 3, 'GET', '/api/v1/venues'),
+    ('api_venue', 4, 'GET', '/api/v1/venues/{venue}'),
+    ('api_venue_search', 2, 'GET', '/api/v1/venues/search?q={term}'),
+    ('api_artists', 2, 'GET', '/api/v1/artists'),
+    ('api_artist', 4, 'GET', '/api/v1/artists/{artist}'),
+    ('api_artist_search', 2, 'GET', '/api/v1/artists/search?q={term}'),
+    ('api_shows', 3, 'GET', '/api/v1/shows'),
+    ('nearby_venues', 2, 'GET', '/venues/nearby?lat={lat}&lng={lng}&radius=25'),
+    ('api_nearby_venues', 1, 'GET', '/api/v1/venues/nearby?lat={lat}&lng={lng}&limit=10'),
+    ('api_free_slots', 1, 'GET', '/api/v1/venues/{venue}/free-slots'),
+    ('venue_image', 3, 'GET', '/img/venue/{venue}/tile'),
+    ('metrics', 1, 'GET', '/metrics'),
+    ('static', 2, 'GET', '/static/css/main.css'),
+    ('create_venue', 1, 'POST', '/venues/create'),
+    ('create_artist', 1, 'POST', '/artists/create'),
+    ('create_show', 1, 'POST', '/shows/create'),
+    ('edit_venue_submission', 1, 'POST', '/venues/{venue}/edit'),
+    ('edit_artist_submission', 1, 'POST', '/artists/{artist}/edit'),
+    ('api_validate_venues', 1, 'POST', '/api/v1/venues/validate'),
+]
+WRITES = {'create_venue', 'create_artist', 'create_show', 'edit_venue_submission', 'edit_artist_submission'}
+# Seeded rows have no image_link, so /img answers 404 for most of them.
+EXPECTED = {'venue_image': {404}}
+
+
+def place_fields(rng, number):
+    city, state, _ = rng.choice(CITIES)
+    return [('name', 'Load test %d' % number), ('city', city), ('state', state),
+            ('phone', '555-%03d-%04d' % (rng.randrange(1000), rng.randrange(10000))),
+            ('facebook_link', 'https://www.facebook.com/loadtest%d' % number)] \
+        + [('genres', genre) for genre in rng.sample(sorted(GENRES), 2)]
+
+
+def venue_form(rng, venue, artist, term):
+    return place_fields(rng, rng.randrange(10 ** 9)) + [('address', '%d Main Street' % rng.randrange(1000))]
+
+
+def artist_form(rng, venue, artist, term):
+    return place_fields(rng, rng.randrange(10 ** 9))
+
+
+def show_form(rng, venue, artist, term):
+    # Far enough out that most bookings do not clash.
+    start = datetime(2030, 1, 1) + timedelta(hours=rng.randrange(24 * 365 * 5))
+    return [('venue_id', venue), ('artist_id', artist), ('start_time', start.strftime('%Y-%m-%d %H:%M:%S'))]
+
+
+def search_form(rng, venue, artist, term):
+    return [('search_term', term)]
+
+
+def validate_records(rng, venue, artist, term):
+    return [dict(venue_form(rng, venue, artist, term), genres=rng.sample(sorted(GENRES), 2)) for _ in range(20)]
+
+
+# Route name -> (content type, function of (rng, venue, artist, term) returning the body).
+BODIES = {
+    'search_venues': ('form', search_form),
+    'search_artists': ('form', search_form),
+    'create_venue': ('form', venue_form),
+    'create_artist': ('form', artist_form),
+    'create_show': ('form', show_form),
+    'edit_venue_submission': ('form', venue_form),
+    'edit_artist_submission': ('form', artist_form),
+    'api_validate_venues': ('json', validate_records),
+}
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1)]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 1) if elapsed else 0,
+        'latency_ms': {
+            'p50': percentile(ordered, 0.50),
+            'p95': percentile(ordered, 0.95),
+            'p99': percentile(ordered, 0.99),
+            'mean': round(sum(ordered) / len(ordered), 3) if ordered else None,
+            'max': ordered[-1] if ordered else None,
+        },
+    }
+
+
+class Driver(object):
+    def __init__(self, base_url, venue_ids, artist_ids, seed=None, read_only=False):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.venue_ids, self.artist_ids = venue_ids, artist_ids
+        self.venue_weights = zipf_weights(len(venue_ids), 1.1)
+        self.artist_weights = zipf_weights(len(artist_ids), 0.9)
+        self.mix = [route for route in MIX if not (read_only and route[0] in WRITES)]
+        self.route_weights = [weight for _, weight, _, _ in self.mix]
+        self.seed = seed
+        self.results = {name: [] for name, _, _, _ in self.mix}
+        self.errors = {name: 0 for name, _, _, _ in self.mix}
+        self.lock = threading.Lock()
+
+    def request(self, connection, rng):
+        name, _, method, template = rng.choices(self.mix, weights=self.route_weights)[0]
+        term = rng.choice(SEARCH_TERMS)
+        venue = rng.choices(self.venue_ids, cum_weights=self.venue_weights)[0]
+        artist = rng.choices(self.artist_ids, cum_weights=self.artist_weights)[0]
+        latitude, longitude = rng.choice(PLACES)
+        path = template.format(venue=venue, artist=artist, term=term, lat=latitude, lng=longitude)
+        body, headers = None, {'Accept-Encoding': 'gzip', 'Accept': 'text/html,image/webp,*/*'}
+        if name in BODIES:
+            kind, build = BODIES[name]
+            if kind == 'form':
+                body = urlencode(build(rng, venue, artist, term))
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            else:
+                body = json.dumps(build(rng, venue, artist, term))
+                headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        failed = response.status >= 400 and response.status not in EXPECTED.get(name, ())
+        return name, (time.perf_counter() - start) * 1000, failed
+
+    def worker(self, number, deadline):
+        rng = random.Random(None if self.seed is None else self.seed + number)
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        latencies = {name: [] for name in self.results}
+        errors = dict.fromkeys(self.errors, 0)
+        while time.perf_counter() < deadline:
+            try:
+                name, elapsed, failed = self.request(connection, rng)
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+                continue
+            latencies[name].append(round(elapsed, 3))
+            errors[name] += failed
+        connection.close()
+        with self.lock:
+            for name in latencies:
+                self.results[name].extend(latencies[name])
+                self.errors[name] += errors[name]
+
+    def run(self, concurrency, duration):
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+        threads = [threading.Thread(target=self.worker, args=(number, deadline)) for number in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        everything = [latency for latencies in self.results.values() for latency in latencies]
+        report = summarize(everything, sum(self.errors.values()), elapsed)
+        report['routes'] = {
+            name: summarize(self.results[name], self.errors[name], elapsed) for name, _, _, _ in self.mix
+        }
+        return report
+
+
+def fetch_json(base_url, path):
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    connection.request('GET', path)
+    response = connection.getresponse()
+    if response.status != 200:
+        sys.exit('%s returned %d; is the server running and seeded?' % (path, response.status))
+    return json.loads(response.read())
+
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent connections')
+    parser.add_argument('--seed', type=int, help='random seed for the request mix')
+    parser.add_argument('--output', default='loadtest.json', help='JSON results file')
+    parser.add_argument('--read-only', action='store_true', help='leave out the routes that write')
+    args = parser.parse_args()
+
+    venue_ids = [venue['id'] for area in fetch_json(args.base_url, '/api/v1/venues?fields=venues')['data']
+                 for venue in area['venues']]
+    artist_ids = [artist['id'] for artist in fetch_json(args.base_url, '/api/v1/artists?fields=id')['data']]
+    if not venue_ids or not artist_ids:
+        sys.exit('No venues or artists; run flask seed first.')
+    rng = random.Random(args.seed)
+    rng.shuffle(venue_ids)
+    rng.shuffle(artist_ids)
+
+    driver = Driver(args.base_url, venue_ids, artist_ids, args.seed, args.read_only)
+    report = {
+        'revision': revision(),
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'base_url': args.base_url,
+        'duration': args.duration,
+        'concurrency': args.concurrency,
+        'read_only': args.read_only,
+    }
+    report.update(driver.run(args.concurrency, args.duration))
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+
+    print('%-20s %8s %7s %9s %9s %9s %8s' % ('route', 'requests', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s'))
+    for name, stats in sorted(report['routes'].items()) + [('total', report)]:
+        latency = stats['latency_ms']
+        print('%-20s %8d %7d %9s %9s %9s %8.1f' % (
+            name, stats['requests'], stats['errors'],
+            latency['p50'], latency['p95'], latency['p99'], stats['rps']))
+    print('Results written to %s' % args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Fail if a hot Show query stops using an index.
+
+Seeds SHOWS rows (1M by default, or the first argument), captures the SQL
+of the venue/artist detail pages, their conditional GET validators and the
+/shows keyset pages, and runs EXPLAIN on each. A sequential scan of "Show"
+in any plan is reported as a regression (list pages and search read the
+counters stored on Venue and Artist instead of Show), and so is a sort in
+the plan of a /shows page, which must read its rows in index order:
+
+    python benchmarks/plan_check.py [SHOWS]
+"""
+import sys
+
+from sqlalchemy import text
+
+from common import app, db, reset_db, seed, count_queries
+import queries
+from models import Show
+
+VENUES = 10000
+ARTISTS = 10000
+
+
+def hot_queries():
+    """(name, statement, parameters, ordered) for each query the pages issue against Show.
+
+    ``ordered`` queries must return their rows in index order, without a sort.
+    """
+    middle = db.session.execute(db.select(Show.start_time, Show.id).order_by(Show.start_time, Show.id)
+                                .offset(db.session.query(Show).count() // 2).limit(1)).one()
+    calls = [
+        ('venue detail', False, lambda: queries.venue_detail(1)),
+        ('artist detail', False, lambda: queries.artist_detail(1)),
+        ('venue validators', False, lambda: queries.venue_validators(1)),
+        ('artist validators', False, lambda: queries.artist_validators(1)),
+        ('shows first page', True, lambda: queries.show_page(30)),
+        ('shows next page', True, lambda: queries.show_page(30, after=tuple(middle))),
+        ('shows previous page', True, lambda: queries.show_page(30, before=tuple(middle))),
+    ]
+    for name, ordered, call in calls:
+        with count_queries(parameters=True) as statements:
+            call()
+        for statement, parameters in statements:
+            if '"Show"' in statement:
+                yield name, statement, parameters, ordered
+
+
+def regressions(connection, statement, parameters, ordered):
+    """Plan lines that read all of "Show" without an index, or sort when ``ordered``."""
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql('EXPLAIN ' + statement, parameters).scalars().all()
+        return plan, [line for line in plan if 'Seq Scan on "Show"' in line
+                      or ordered and line.strip().startswith(('Sort ', '->  Sort ', 'Incremental Sort'))]
+    plan = [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+    # "SEARCH" walks an index range; "SCAN" reads the whole table or index,
+    # except for an ordered query, whose LIMIT stops the walk of its index.
+    return plan, [line for line in plan
+                  if line.startswith('SCAN Show') and not (ordered and ' INDEX ' in line)
+                  or ordered and 'TEMP B-TREE FOR ORDER BY' in line]
+
+
+def main():
+    shows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    failures = []
+    with app.app_context():
+        reset_db()
+        seed(venues=VENUES, artists=ARTISTS, shows=shows)
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        connection = db.session.connection()
+        for name, statement, parameters, ordered in hot_queries():
+            plan, found = regressions(connection, statement, parameters, ordered)
+            print('%s%s' % (name, '  <-- ' + '; '.join(found) if found else ''))
+            for line in plan:
+                print('    ' + line)
+            if found:
+                failures.append(name)
+    if failures:
+        sys.exit('Sequential scan of "Show" or sort in: %s' % ', '.join(failures))
+    print('%d shows: every hot query reads "Show" through an index' % shows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""Page and fragment cache for the read-heavy public pages.
+
+Entries are stored under a key (the request path for pages) together with
+a set of tags naming what they were built from: ``venue:<id>``,
+``artist:<id>``, and ``venues``/``artists``/``shows`` for listings.
+Mapper events on Venue, Artist and Show collect the tags a write affects,
+and the matching entries are evicted once the session commits.
+
+The backend is chosen by CACHE_BACKEND: ``lru`` (in-process), ``redis``
+(shared between workers, needs the ``redis`` package) or ``none``. Hits,
+misses and evictions are exported on /metrics.
+
+An ``lru`` eviction only reaches the process that made the write. Other
+gunicorn workers, and every server process after ``flask import``, the
+counter rolls or a job worker's writes, keep their pages until
+CACHE_DEFAULT_TIMEOUT runs out. Pages are exact across processes only
+with ``redis``, which is the default when CACHE_REDIS_URL is set or
+WEB_CONCURRENCY asks for more than one worker; ``lru`` suits a single
+process, or pages that may lag by up to CACHE_DEFAULT_TIMEOUT.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, request, session, make_response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import metrics
+from models import Venue, Artist, Show
+
+hits = metrics.Counter('fyyur_cache_hits_total', 'Cache lookups answered from the cache.')
+misses = metrics.Counter('fyyur_cache_misses_total', 'Cache lookups that had to build the entry.')
+evictions = metrics.Counter('fyyur_cache_evictions_total', 'Entries evicted by writes or by the size limit.')
+
+backend = None
+
+
+class LRUBackend(object):
+    """Process-local cache bounded to ``max_entries``, least recently used first out.
+
+    Writes in other processes do not evict its entries; see the module docstring.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires, _ = entry
+            if expires is not None and expires < time.time():
+                self._delete(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout, tags):
+        with self.lock:
+            if key in self.entries:
+                self._delete(key)
+            self.entries[key] = (value, time.time() + timeout if timeout else None, tags)
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._delete(next(iter(self.entries)))
+                evictions.inc()
+
+    def evict_tags(self, tags):
+        with self.lock:
+            keys = set()
+            for tag in tags:
+                keys.update(self.tags.get(tag, ()))
+            for key in keys:
+                self._delete(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _delete(self, key):
+        _, _, tags = self.entries.pop(key)
+        for tag in tags:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+
+class RedisBackend(object):
+    """Cache shared by every worker through a Redis-compatible server."""
+
+    def __init__(self, url, prefix='fyyur:cache:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, timeout, tags):
+        pipeline = self.client.pipeline()
+        pipeline.set(self.prefix + key, pickle.dumps(value), ex=timeout or None)
+        for tag in tags:
+            pipeline.sadd(self.prefix + 'tag:' + tag, key)
+        pipeline.execute()
+
+    def evict_tags(self, tags):
+        tag_keys = [self.prefix + 'tag:' + tag for tag in tags]
+        keys = [member.decode() for member in self.client.sunion(tag_keys)]
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+        self.client.delete(*tag_keys)
+        return len(keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+def init_cache(app):
+    global backend
+    kind = app.config['CACHE_BACKEND']
+    if kind == 'redis':
+        backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+    elif kind == 'lru':
+        backend = LRUBackend(app.config['CACHE_MAX_ENTRIES'])
+
+        @metrics.collector
+        def cache_gauges():
+            return metrics.gauge('fyyur_cache_entries', 'Entries held by the in-process cache.', len(backend))
+    else:
+        backend = None
+
+
+def add_tags(*tags):
+    """Tag the page being rendered with extra entities it shows."""
+    if 'cache_tags' in g:
+        g.cache_tags.update(tags)
+
+
+def evict(*tags):
+    if backend is not None and tags:
+        evictions.inc(backend.evict_tags(tags))
+
+
+def clear():
+    """Drop every entry, for writes that bypass the ORM such as bulk imports."""
+    if backend is not None:
+        backend.clear()
+
+
+def _cacheable():
+    # Flashed messages are rendered into the page, so such responses are personal.
+    return backend is not None and request.method == 'GET' and '_flashes' not in session
+
+
+def cached_page(*tags):
+    """Cache a view's response per request path.
+
+    ``tags`` are formatted with the view arguments, e.g. ``'venue:{venue_id}'``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # ensure_sync lets the async page variants share this decorator.
+            if not _cacheable():
+                return current_app.ensure_sync(view)(**kwargs)
+            # Keyed by release too, so a shared cache never serves pages of an old deploy.
+            key = 'page:%s:%s' % (current_app.extensions['release'][0], request.full_path)
+            entry = backend.get(key)
+            if entry is not None:
+                hits.inc()
+                body, status, mimetype = entry
+                response = make_response(body, status)
+                response.mimetype = mimetype
+                return response
+            misses.inc()
+            g.cache_tags = set(tag.format(**kwargs) for tag in tags)
+            response = make_response(current_app.ensure_sync(view)(**kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                backend.set(
+                    key, (response.get_data(), response.status_code, response.mimetype),
+                    current_app.config['CACHE_DEFAULT_TIMEOUT'], g.pop('cache_tags'),
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+def fragment(key, tags, produce, timeout=None):
+    """The cached value for ``key``, built with ``produce()`` on a miss."""
+    if backend is None:
+        return produce()
+    value = backend.get('fragment:' + key)
+    if value is not None:
+        hits.inc()
+        return value
+    misses.inc()
+    value = produce()
+    backend.set('fragment:' + key, value, timeout or current_app.config['CACHE_DEFAULT_TIMEOUT'], set(tags))
+    return value
+
+
+#----------------------------------------------------------------------------#
+# Invalidation.
+#----------------------------------------------------------------------------#
+
+def _tags_for(target):
+    if isinstance(target, Venue):
+        return {'venue:%s' % target.id, 'venues', 'shows'}
+    if isinstance(target, Artist):
+        return {'artist:%s' % target.id, 'artists', 'shows'}
+    return {'venue:%s' % target.venue_id, 'artist:%s' % target.artist_id, 'venues', 'artists', 'shows'}
+
+
+def _collect(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('cache_tags', set()).update(_tags_for(target))
+
+
+for _model in (Venue, Artist, Show):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _collect)
+
+
+@event.listens_for(Session, 'after_commit')
+def _evict_committed(session):
+    # Evicting after the commit keeps a concurrent request from caching the old rows again.
+    evict(*session.info.pop('cache_tags', ()))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    session.info.pop('cache_tags', None)
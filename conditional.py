@@ -0,0 +1,75 @@
+"""Conditional GET for pages whose freshness can be checked cheaply.
+
+``conditional_page(load_validators)`` asks ``load_validators(**view_args)``
+for ``(etag, last_modified)`` before running the view. When the client's
+If-None-Match (or, without it, If-Modified-Since) still matches, a 304 is
+returned without loading the page data or rendering the template.
+
+A page also depends on the templates and static assets it was rendered
+with, so the release (see ``release``) is folded into both validators: a
+deploy that changes either sends clients the new page, whose links point
+at the assets of the new build.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import abort, current_app, make_response, request
+
+import assets
+
+
+def not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        # HTTP dates only carry whole seconds.
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def release(app):
+    """``(version, released_at)`` of the templates and assets ``app`` serves.
+
+    The version is RELEASE when set (e.g. the deployed commit), otherwise a
+    checksum of every template's source and of the asset manifest.
+    released_at is the latest modification time among those files.
+    """
+    loader = app.jinja_env.loader
+    checksum = hashlib.sha1(json.dumps(assets.manifest, sort_keys=True).encode())
+    paths = [os.path.join(app.static_folder, assets.DIST, 'manifest.json')]
+    for name in sorted(loader.list_templates()):
+        source, path, _ = loader.get_source(app.jinja_env, name)
+        checksum.update(name.encode() + b'\0' + source.encode('utf-8') + b'\0')
+        paths.append(path)
+    mtimes = [os.path.getmtime(path) for path in paths if path and os.path.exists(path)]
+    released_at = datetime.fromtimestamp(max(mtimes, default=0), timezone.utc)
+    return app.config['RELEASE'] or checksum.hexdigest()[:12], released_at
+
+
+def init_conditional(app):
+    app.extensions['release'] = release(app)
+
+
+def conditional_page(load_validators):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            validators = load_validators(**kwargs)
+            if validators is None:
+                abort(404)
+            version, released_at = current_app.extensions['release']
+            etag, last_modified = '%s-%s' % (version, validators[0]), max(validators[1], released_at)
+            if not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(current_app.ensure_sync(view)(**kwargs))
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            # Let browsers and proxies keep the page, but revalidate on each use.
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
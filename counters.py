@@ -0,0 +1,211 @@
+"""Upcoming and past show counters stored on Venue and Artist.
+
+``upcoming_shows_count`` and ``past_shows_count`` split each venue's and
+artist's shows at the ``shows_rolled_at`` watermark rather than at the
+current time, so list pages and search results read them without touching
+Show. Creating, moving or deleting a Show adjusts the counters in the same
+transaction (mapper events for the ORM, ``add_shows`` for bulk inserts).
+
+``flask roll-counters`` moves the shows that started since the watermark
+from upcoming to past and advances it; run it from cron every minute or so,
+or leave it to ``flask worker``, which rolls every COUNTERS_ROLL_SECONDS.
+``flask check-counters`` recomputes every counter from Show and reports
+(or, with ``--fix``, repairs) any drift.
+"""
+import sys
+from collections import Counter
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect, select, update
+
+import cache
+from models import db, Venue, Artist, Show, Watermark
+
+WATERMARK = 'shows_rolled_at'
+OWNERS = ((Venue, 'venue_id'), (Artist, 'artist_id'))
+
+
+def rolled_at(connection, lock=None):
+    """The watermark, or None when the counters have never been computed.
+
+    ``lock`` is ``'share'`` for writers adjusting counters and ``'update'``
+    for the roll, so the two never interleave on Postgres.
+    """
+    query = select(Watermark.value).where(Watermark.name == WATERMARK)
+    if lock is not None:
+        query = query.with_for_update(read=lock == 'share')
+    return connection.scalar(query)
+
+
+def _set_rolled_at(connection, value):
+    updated = connection.execute(update(Watermark).where(Watermark.name == WATERMARK).values(value=value))
+    if not updated.rowcount:
+        connection.execute(Watermark.__table__.insert().values(name=WATERMARK, value=value))
+
+
+def _apply(connection, deltas):
+    """Add ``deltas`` ({(model, id): (upcoming, past)}) to the counters."""
+    for model, _ in OWNERS:
+        rows = [
+            {'owner_id': id, 'upcoming': upcoming, 'past': past}
+            for (owner, id), (upcoming, past) in deltas.items()
+            if owner is model and (upcoming or past)
+        ]
+        if rows:
+            table = model.__table__
+            connection.execute(
+                table.update().where(table.c.id == db.bindparam('owner_id')).values(
+                    upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam('upcoming'),
+                    past_shows_count=table.c.past_shows_count + db.bindparam('past'),
+                ),
+                rows,
+            )
+
+
+def add_shows(connection, shows, sign=1):
+    """Count ``shows`` (dicts or Show objects) in, or out with ``sign=-1``."""
+    watermark = rolled_at(connection, lock='share') or datetime.now()
+    deltas = {}
+    for show in shows:
+        get = show.get if isinstance(show, dict) else lambda key: getattr(show, key)
+        upcoming = get('start_time') > watermark
+        for model, column in OWNERS:
+            key = (model, get(column))
+            count_upcoming, count_past = deltas.get(key, (0, 0))
+            deltas[key] = (count_upcoming + sign * upcoming, count_past + sign * (not upcoming))
+    _apply(connection, deltas)
+
+
+@event.listens_for(Show, 'after_insert')
+def _count_inserted(mapper, connection, target):
+    add_shows(connection, [target])
+
+
+@event.listens_for(Show, 'after_delete')
+def _count_deleted(mapper, connection, target):
+    add_shows(connection, [target], sign=-1)
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Load the value being replaced even when it was expired, so after_update
+# can take the show out of the counters it used to belong to.
+for _field in ('venue_id', 'artist_id', 'start_time'):
+    event.listen(getattr(Show, _field), 'set', _load_old_value, active_history=True)
+
+
+@event.listens_for(Show, 'after_update')
+def _count_moved(mapper, connection, target):
+    state = inspect(target)
+    histories = {field: state.attrs[field].history for field in ('venue_id', 'artist_id', 'start_time')}
+    if not any(history.deleted for history in histories.values()):
+        return
+    old = {
+        field: history.deleted[0] if history.deleted else getattr(target, field)
+        for field, history in histories.items()
+    }
+    add_shows(connection, [old], sign=-1)
+    add_shows(connection, [target])
+
+
+def roll(now=None):
+    """Move shows that started since the watermark to past; returns how many moved."""
+    now = now or datetime.now()
+    connection = db.session.connection()
+    watermark = rolled_at(connection, lock='update')
+    if watermark is None:
+        recompute(now)
+        return 0
+    moved = 0
+    deltas = {}
+    for model, column in OWNERS:
+        owner_column = getattr(Show, column)
+        rows = connection.execute(
+            select(owner_column, db.func.count(Show.id))
+            .where(Show.start_time > watermark, Show.start_time <= now)
+            .group_by(owner_column)
+        )
+        for id, count in rows:
+            deltas[(model, id)] = (-count, count)
+            if model is Venue:
+                moved += count
+    _apply(connection, deltas)
+    _set_rolled_at(connection, now)
+    db.session.commit()
+    if moved:
+        cache.evict('venues', 'artists')
+    return moved
+
+
+def _actual_counts(model, column, watermark):
+    owner_column = getattr(Show, column)
+    upcoming = db.func.count(db.case((Show.start_time > watermark, Show.id)))
+    past = db.func.count(db.case((Show.start_time <= watermark, Show.id)))
+    return select(model.id, model.upcoming_shows_count, model.past_shows_count, upcoming, past) \
+        .outerjoin(Show, owner_column == model.id) \
+        .group_by(model.id, model.upcoming_shows_count, model.past_shows_count)
+
+
+def drift():
+    """(model name, id, stored (upcoming, past), actual (upcoming, past)) for every wrong counter."""
+    connection = db.session.connection()
+    watermark = rolled_at(connection)
+    if watermark is None:
+        return None
+    wrong = []
+    for model, column in OWNERS:
+        for id, upcoming, past, actual_upcoming, actual_past in connection.execute(
+                _actual_counts(model, column, watermark)):
+            if (upcoming, past) != (actual_upcoming, actual_past):
+                wrong.append((model.__name__, id, (upcoming, past), (actual_upcoming, actual_past)))
+    return wrong
+
+
+def recompute(now=None):
+    """Rebuild every counter from Show, splitting at ``now``."""
+    now = now or datetime.now()
+    connection = db.session.connection()
+    for model, column in OWNERS:
+        owner_column = getattr(Show, column)
+
+        def count(condition):
+            return select(db.func.count(Show.id)).where(owner_column == model.id, condition).scalar_subquery()
+
+        connection.execute(update(model).values(
+            upcoming_shows_count=count(Show.start_time > now),
+            past_shows_count=count(Show.start_time <= now),
+        ))
+    _set_rolled_at(connection, now)
+    db.session.commit()
+    cache.evict('venues', 'artists')
+
+
+@click.command('roll-counters')
+@with_appcontext
+def roll_command():
+    """Move shows that have started from the upcoming to the past counters."""
+    click.echo('%d shows moved to past' % roll())
+
+
+@click.command('check-counters')
+@click.option('--fix', is_flag=True, help='Recompute every counter when drift is found.')
+@with_appcontext
+def check_command(fix):
+    """Recompute the show counters from scratch and report drift."""
+    wrong = drift()
+    if wrong is None:
+        click.echo('Counters have never been computed.')
+    else:
+        for name, id, stored, actual in wrong:
+            click.echo('%s %d: stored upcoming/past %d/%d, actual %d/%d' % ((name, id) + stored + actual))
+        summary = Counter(name for name, _, _, _ in wrong)
+        click.echo('%d venues and %d artists drifted' % (summary['Venue'], summary['Artist']))
+    if fix and wrong != []:
+        recompute()
+        click.echo('Counters recomputed.')
+    elif wrong:
+        sys.exit(1)
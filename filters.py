@@ -0,0 +1,55 @@
+"""Jinja filters.
+
+babel and dateutil are imported on the first call rather than at startup:
+most requests never format a date, and a worker should not pay for them
+before serving its first page.
+"""
+from datetime import datetime, timezone
+from functools import lru_cache
+
+# Named formats; other values of `format` are babel patterns.
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+def parse_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        # ISO-8601, as stored and rendered by the app, skips dateutil's generic parser
+        return datetime.fromisoformat(value)
+    except ValueError:
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+
+
+@lru_cache(maxsize=None)
+def _pattern(format):
+    """The compiled babel pattern of ``format``, compiled once."""
+    import babel.dates
+    return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+
+
+def _format_datetime_uncached(value, format, locale):
+    import babel
+    date = parse_datetime(value)
+    if date.tzinfo is None:
+        # babel formats naive datetimes as UTC
+        date = date.replace(tzinfo=timezone.utc)
+    return _pattern(format).apply(date, babel.Locale.parse(locale))
+
+
+# Replaced by init_filters with a cache of DATETIME_FILTER_CACHE_SIZE entries.
+_format_datetime = lru_cache(maxsize=4096)(_format_datetime_uncached)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    return _format_datetime(value, format, locale)
+
+
+def init_filters(app):
+    global _format_datetime
+    _format_datetime = lru_cache(maxsize=app.config['DATETIME_FILTER_CACHE_SIZE'])(_format_datetime_uncached)
+    app.jinja_env.filters['datetime'] = format_datetime
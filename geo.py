@@ -0,0 +1,284 @@
+"""Venue and artist locations: geohash cells, nearby lookups and ``flask geocode``.
+
+Venues, and artists for their home town, store ``latitude`` and
+``longitude`` together with the 12-character geohash of that point, set by
+mapper events and indexed with a plain B-tree. A geohash cell is a prefix
+of every hash inside it, so reading one cell is one range scan.
+
+``within`` covers the bounding box of a circle with at most MAX_CELLS
+cells and reads them, together with the coordinates, from the index alone
+(``ix_<table>_geohash`` is on geohash, latitude and longitude). ``nearby``
+starts with a 1 km circle and widens it until it holds the nearest
+``limit`` rows, then loads just those rows, so both crowded and empty areas
+cost a few small index scans, whatever the size of the table.
+
+``flask geocode`` fills in coordinates offline from data/gazetteer.csv, a
+bundled table of approximate US city centres and, for --state-fallback,
+state centres. Street addresses are not resolved: every venue of a city
+gets that city's centre.
+"""
+import csv
+import math
+import os
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, event, or_, select
+
+from models import db, Venue, Artist
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+HALF_CIRCUMFERENCE_KM = 180 * KM_PER_DEGREE
+# Most cells read for one circle; fewer, coarser cells read more spare rows.
+MAX_CELLS = 16
+FIRST_RADIUS_KM = 1.0
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+GAZETTEER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'gazetteer.csv')
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    """The geohash of a point: longitude and latitude bits interleaved, in base 32."""
+    south, north, west, east = -90.0, 90.0, -180.0, 180.0
+    chars = []
+    value = bits = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            middle = (west + east) / 2
+            value = value * 2 + (longitude >= middle)
+            west, east = (middle, east) if longitude >= middle else (west, middle)
+        else:
+            middle = (south + north) / 2
+            value = value * 2 + (latitude >= middle)
+            south, north = (middle, north) if latitude >= middle else (south, middle)
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            value = bits = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of the cells of ``precision``."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def distance(latitude, longitude, other_latitude, other_longitude):
+    """Great-circle distance in km (haversine)."""
+    phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+    a = (math.sin((other_phi - phi) / 2) ** 2
+         + math.cos(phi) * math.cos(other_phi) * math.sin(math.radians(other_longitude - longitude) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounds(latitude, longitude, radius):
+    """(south, north, west, east) in degrees around the circle; west > east across the antimeridian."""
+    degrees = radius / KM_PER_DEGREE
+    south, north = latitude - degrees, latitude + degrees
+    if south <= -90 or north >= 90:
+        return max(south, -90.0), min(north, 90.0), -180.0, 180.0
+    # A circle is widest in degrees of longitude at its poleward edge.
+    span = degrees / math.cos(math.radians(max(abs(south), abs(north))))
+    if span >= 180:
+        return south, north, -180.0, 180.0
+    return south, north, (longitude - span + 180) % 360 - 180, (longitude + span + 180) % 360 - 180
+
+
+def cover(south, north, west, east):
+    """The finest geohash cells covering the box that number at most MAX_CELLS."""
+    for precision in range(PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        last_row, last_column = round(180 / height) - 1, round(360 / width) - 1
+        rows = range(int((south + 90) // height), min(int((north + 90) // height), last_row) + 1)
+        first, last = int((west + 180) // width), min(int((east + 180) // width), last_column)
+        if west <= east:
+            columns = range(first, last + 1)
+        else:
+            columns = range(first, last + last_column + 2)
+        if len(rows) * len(columns) <= MAX_CELLS or precision == 1:
+            # Past the last column, across the antimeridian, longitudes wrap around.
+            return sorted(encode(-90 + (row + 0.5) * height, (-180 + (column + 0.5) * width + 180) % 360 - 180, precision)
+                          for row in rows for column in columns)
+
+
+def _after(cell):
+    """The first geohash past every hash starting with ``cell``, or None at the end."""
+    cell = cell.rstrip(BASE32[-1])
+    if not cell:
+        return None
+    return cell[:-1] + BASE32[BASE32.index(cell[-1]) + 1]
+
+
+def _in_cells(column, cells):
+    # Neighbouring cells often follow each other in geohash order and share
+    # one range. Bounds made of base-32 digits sort the same under every collation.
+    ranges = []
+    for cell in cells:
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1][1] = _after(cell)
+        else:
+            ranges.append([cell, _after(cell)])
+    return or_(*(column >= low if high is None else and_(column >= low, column < high) for low, high in ranges))
+
+
+def within(model, latitude, longitude, radius):
+    """[(km, id)] of the rows within ``radius`` km, nearest first, read from the geohash index alone."""
+    south, north, west, east = bounds(latitude, longitude, radius)
+    if west <= east:
+        in_longitude = model.longitude.between(west, east)
+    else:
+        in_longitude = or_(model.longitude >= west, model.longitude <= east)
+    rows = db.session.execute(select(model.id, model.latitude, model.longitude).where(
+        _in_cells(model.geohash, cover(south, north, west, east)),
+        model.latitude.between(south, north), in_longitude))
+    found = [(distance(latitude, longitude, row.latitude, row.longitude), row.id) for row in rows]
+    return sorted(item for item in found if item[0] <= radius)
+
+
+def nearby(model, latitude, longitude, radius=None, limit=DEFAULT_LIMIT):
+    """[(row, km)] for the ``limit`` rows of ``model`` nearest the point, within ``radius`` km if given.
+
+    Searches a small circle first and widens it until it holds ``limit``
+    rows or reaches ``radius``, so crowded and empty areas both read about
+    as many index entries as they return.
+    """
+    reach = HALF_CIRCUMFERENCE_KM if radius is None else min(radius, HALF_CIRCUMFERENCE_KM)
+    search = min(reach, FIRST_RADIUS_KM)
+    while True:
+        found = within(model, latitude, longitude, search)
+        if len(found) >= limit or search >= reach:
+            break
+        # Grow to where the density seen so far would hold ``limit`` rows.
+        growth = math.sqrt(limit / len(found)) * 1.2 if found else 4
+        search = min(reach, search * min(4, max(1.5, growth)))
+    found = found[:limit]
+    if not found:
+        return []
+    rows = {row.id: row for row in db.session.execute(
+        select(model.id, model.name, model.city, model.state, model.latitude, model.longitude,
+               model.upcoming_shows_count).where(model.id.in_([id for _, id in found])))}
+    return [(rows[id], km) for km, id in found]
+
+
+def nearby_arguments(args):
+    """(latitude, longitude, radius, limit) from ?lat=&lng=&radius=&limit=, or None when invalid."""
+    try:
+        latitude = float(args['lat'])
+        longitude = float(args['lng'])
+        radius = float(args['radius']) if args.get('radius') else None
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+    except (KeyError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180 and 1 <= limit <= MAX_LIMIT):
+        return None
+    if radius is not None and not radius > 0:
+        return None
+    return latitude, longitude, radius, limit
+
+
+def nearby_venues(latitude, longitude, radius=None, limit=DEFAULT_LIMIT):
+    data = [{
+        'id': row.id,
+        'name': row.name,
+        'city': row.city,
+        'state': row.state,
+        'latitude': row.latitude,
+        'longitude': row.longitude,
+        'distance_km': round(km, 3),
+        'num_upcoming_shows': row.upcoming_shows_count,
+    } for row, km in nearby(Venue, latitude, longitude, radius, limit)]
+    return {'count': len(data), 'data': data}
+
+
+@event.listens_for(Venue, 'before_insert')
+@event.listens_for(Venue, 'before_update')
+@event.listens_for(Artist, 'before_insert')
+@event.listens_for(Artist, 'before_update')
+def _set_geohash(mapper, connection, target):
+    if target.latitude is None or target.longitude is None:
+        target.geohash = None
+    else:
+        target.geohash = encode(target.latitude, target.longitude)
+
+
+#  Geocoding
+#  ----------------------------------------------------------------
+
+def place_key(city, state):
+    """Normalized (city, state), so 'St. Louis' and 'saint louis' match."""
+    city = ' '.join((city or '').replace('.', '').lower().split())
+    if city.startswith('saint '):
+        city = 'st ' + city[len('saint '):]
+    return city, (state or '').strip().upper()
+
+
+def load_gazetteer(path=GAZETTEER):
+    """({(city, state): (latitude, longitude)}, {state: (latitude, longitude)})."""
+    cities, states = {}, {}
+    with open(path, newline='', encoding='utf-8') as source:
+        for row in csv.DictReader(source):
+            point = (float(row['latitude']), float(row['longitude']))
+            if row['city']:
+                cities[place_key(row['city'], row['state'])] = point
+            else:
+                states[row['state'].strip().upper()] = point
+    return cities, states
+
+
+def geocode(model, cities, states=None, everything=False, chunk_size=5000):
+    """Set the coordinates of ``model`` rows from the gazetteer; returns (by city, by state, not found)."""
+    table = model.__table__
+    update = table.update().where(table.c.id == bindparam('row_id')).values(
+        latitude=bindparam('latitude'), longitude=bindparam('longitude'), geohash=bindparam('geohash'))
+    by_city = by_state = missing = 0
+    last_id = 0
+    while True:
+        query = select(model.id, model.city, model.state).where(model.id > last_id).order_by(model.id).limit(chunk_size)
+        if not everything:
+            query = query.where(model.latitude.is_(None))
+        rows = db.session.execute(query).all()
+        if not rows:
+            return by_city, by_state, missing
+        changes = []
+        for row in rows:
+            key = place_key(row.city, row.state)
+            point = cities.get(key)
+            if point is not None:
+                by_city += 1
+            elif states is not None and key[1] in states:
+                point = states[key[1]]
+                by_state += 1
+            else:
+                missing += 1
+                continue
+            changes.append({'row_id': row.id, 'latitude': point[0], 'longitude': point[1],
+                            'geohash': encode(*point)})
+        if changes:
+            db.session.execute(update, changes)
+        db.session.commit()
+        last_id = rows[-1].id
+
+
+@click.command('geocode')
+@click.option('--kind', type=click.Choice(['venues', 'artists', 'all']), default='all', show_default=True)
+@click.option('--all', 'everything', is_flag=True, help='Also geocode rows that already have coordinates.')
+@click.option('--state-fallback', is_flag=True, help='Place rows of unknown cities at the centre of their state.')
+@click.option('--gazetteer', type=click.Path(exists=True, dir_okay=False), default=GAZETTEER,
+              help='CSV of city,state,latitude,longitude; rows without a city are state centres.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows per transaction.')
+@with_appcontext
+def geocode_command(kind, everything, state_fallback, gazetteer, chunk_size):
+    """Fill in venue and artist coordinates from the bundled gazetteer, offline."""
+    cities, states = load_gazetteer(gazetteer)
+    models = {'venues': [Venue], 'artists': [Artist], 'all': [Venue, Artist]}[kind]
+    for model in models:
+        by_city, by_state, missing = geocode(
+            model, cities, states if state_fallback else None, everything, chunk_size)
+        click.echo('%s: %d placed by city, %d by state, %d not found' % (
+            model.__tablename__.lower() + 's', by_city, by_state, missing))
@@ -0,0 +1,303 @@
+"""Resized venue and artist images: ``/img/<kind>/<id>/<size>``.
+
+Pages link images through ``image_url(kind, id, image_link, size)``,
+which adds ``?v=``, a hash of the image_link. The first request for an
+image and size fetches the original, shrinks it to fit the size's box and
+stores it as WebP (for clients that accept it) or JPEG under
+IMAGE_CACHE_DIR. The file is named by ``v``, the size and the format, so
+a name always holds the same bytes: venues sharing an image share the
+file, a changed image_link gets a new name, and responses for a current
+``v`` are cached by browsers for a year. Hits are served straight from
+disk without touching the database.
+
+The cache is kept under IMAGE_CACHE_MAX_BYTES by deleting the least
+recently used files; hits refresh a file's mtime at most once per
+TOUCH_SECONDS. Sources that fail are remembered for ERROR_SECONDS so a
+broken link does not slow down every page that shows it.
+
+image_links are typed in by users, so sources are only fetched from public
+addresses: every address the host resolves to, and the one connected to,
+must be public, on each redirect too (IMAGE_FETCH_ALLOW_PRIVATE lifts this
+for image hosts on a private network). Fetches never go through a proxy.
+
+Resizing needs Pillow, imported on the first image request; without it, or
+with IMAGE_CACHE_DIR empty, the endpoint redirects to the original image.
+"""
+import functools
+import hashlib
+import io
+import ipaddress
+import os
+import re
+import socket
+import time
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.request import (HTTPDefaultErrorHandler, HTTPErrorProcessor, HTTPHandler, HTTPRedirectHandler,
+                            HTTPSHandler, OpenerDirector, Request, UnknownHandler)
+
+from flask import Blueprint, abort, current_app, redirect, request, send_file, url_for
+from sqlalchemy import select
+
+from models import db, Venue, Artist
+
+images = Blueprint('images', __name__, url_prefix='/img')
+
+KINDS = {'venue': Venue, 'artist': Artist}
+# Boxes the image is shrunk to fit, twice the CSS size for high-density screens.
+SIZES = {'tile': (720, 400), 'large': (1110, 1000)}
+FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpg': ('JPEG', 'image/jpeg')}
+VERSION = re.compile('[0-9a-f]{20}')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+TOUCH_SECONDS = 3600
+ERROR_SECONDS = 300
+
+_written = {'bytes': None}
+
+
+def version(image_link):
+    return hashlib.sha256(image_link.encode('utf-8')).hexdigest()[:20]
+
+
+def image_url(kind, id, image_link, size='tile'):
+    """URL of the resized image, or '' when there is no image."""
+    if not image_link:
+        return ''
+    return url_for('images.thumbnail', kind=kind, id=id, size=size, v=version(image_link))
+
+
+@functools.lru_cache(maxsize=None)
+def pillow():
+    """PIL.Image, or None without Pillow; imported on first use, as it is slow to import."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+@functools.lru_cache(maxsize=None)
+def webp():
+    """Whether this Pillow can encode WebP."""
+    if pillow() is None:
+        return False
+    from PIL import features
+    return features.check('webp')
+
+
+def _format():
+    if webp() and 'image/webp' in request.headers.get('Accept', ''):
+        return 'webp'
+    return 'jpg'
+
+
+def _path(directory, v, size, extension):
+    return os.path.join(directory, v[:2], '%s-%s.%s' % (v, size, extension))
+
+
+def is_public(address):
+    """Whether sources may be fetched from ``address``, an ipaddress address."""
+    return address.is_global and not address.is_multicast
+
+
+def _check_address(host, address):
+    if current_app.config['IMAGE_FETCH_ALLOW_PRIVATE']:
+        return
+    # Scoped IPv6 addresses come with a "%<interface>" suffix.
+    if not is_public(ipaddress.ip_address(address.split('%')[0])):
+        raise ValueError('%s is at %s, which is not a public address' % (host, address))
+
+
+class _PublicConnection(object):
+    """Connection mixin: refuse hosts at non-public addresses before sending anything."""
+
+    def connect(self):
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)}
+        except socket.gaierror as error:
+            raise ValueError('cannot resolve %s: %s' % (self.host, error))
+        for address in addresses:
+            _check_address(self.host, address)
+        super().connect()
+        # The name may resolve differently the second time; this is the
+        # address actually connected to.
+        try:
+            _check_address(self.host, self.sock.getpeername()[0])
+        except ValueError:
+            self.close()
+            raise
+
+
+class PublicHTTPConnection(_PublicConnection, HTTPConnection):
+    pass
+
+
+class PublicHTTPSConnection(_PublicConnection, HTTPSConnection):
+    pass
+
+
+class PublicHTTPHandler(HTTPHandler):
+    def do_open(self, http_class, req, **kwargs):
+        return HTTPHandler.do_open(self, PublicHTTPConnection, req, **kwargs)
+
+
+class PublicHTTPSHandler(HTTPSHandler):
+    def do_open(self, http_class, req, **kwargs):
+        return HTTPSHandler.do_open(self, PublicHTTPSConnection, req, **kwargs)
+
+
+def _opener():
+    # Only http(s), with redirects (each one a new, checked connection);
+    # no proxy, ftp or file handlers.
+    opener = OpenerDirector()
+    for handler in (PublicHTTPHandler(), PublicHTTPSHandler(), HTTPRedirectHandler(),
+                    HTTPDefaultErrorHandler(), HTTPErrorProcessor(), UnknownHandler()):
+        opener.add_handler(handler)
+    return opener
+
+
+opener = _opener()
+
+
+def open_url(request_, timeout):
+    """urlopen for URLs users typed in: http(s) only, from public addresses only."""
+    if not request_.full_url.startswith(('http://', 'https://')):
+        raise ValueError('not an http(s) URL')
+    return opener.open(request_, timeout=timeout)
+
+
+def fetch(url):
+    """The bytes of ``url``; raises ValueError for anything that is not a usable image source."""
+    limit = current_app.config['IMAGE_MAX_SOURCE_BYTES']
+    request_ = Request(url, headers={'User-Agent': 'fyyur-images'})
+    with open_url(request_, current_app.config['IMAGE_FETCH_TIMEOUT']) as response:
+        data = response.read(limit + 1)
+    if len(data) > limit:
+        raise ValueError('larger than IMAGE_MAX_SOURCE_BYTES')
+    return data
+
+
+def resize(data, box, format):
+    """``data`` shrunk to fit ``box`` and encoded as ``format`` ('WEBP' or 'JPEG')."""
+    from PIL import Image, ImageOps
+    image = Image.open(io.BytesIO(data))
+    # JPEG decoders can scale down while decoding, which is much faster.
+    image.draft('RGB', box)
+    image = ImageOps.exif_transpose(image)
+    keep_alpha = format == 'WEBP' and image.mode in ('RGBA', 'LA', 'P')
+    image = image.convert('RGBA' if keep_alpha else 'RGB')
+    image.thumbnail(box, Image.LANCZOS)
+    out = io.BytesIO()
+    if format == 'WEBP':
+        image.save(out, 'WEBP', quality=80, method=4)
+    else:
+        image.save(out, 'JPEG', quality=82, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = '%s.%d.tmp' % (path, os.getpid())
+    with open(temporary, 'wb') as out:
+        out.write(data)
+    os.replace(temporary, path)
+
+
+def evict(directory, max_bytes):
+    """Delete the least recently used files until the cache is under 90% of ``max_bytes``."""
+    files = []
+    for parent, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(parent, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
+
+
+def _store(directory, path, data):
+    _write(path, data)
+    max_bytes = current_app.config['IMAGE_CACHE_MAX_BYTES']
+    # Each process counts what it writes and rescans the directory, which
+    # all processes share, whenever its count says the limit is passed.
+    if _written['bytes'] is None:
+        _written['bytes'] = evict(directory, max_bytes)
+    else:
+        _written['bytes'] += len(data)
+    if _written['bytes'] > max_bytes:
+        _written['bytes'] = evict(directory, max_bytes)
+
+
+def _send(path, mimetype, cache_control):
+    now = time.time()
+    try:
+        if now - os.stat(path).st_mtime > TOUCH_SECONDS:
+            os.utime(path, (now, now))
+        response = send_file(path, mimetype=mimetype, conditional=True)
+    except FileNotFoundError:
+        return None
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept')
+    return response
+
+
+@images.route('/<kind>/<int:id>/<size>')
+def thumbnail(kind, id, size):
+    if kind not in KINDS or size not in SIZES:
+        abort(404)
+    directory = current_app.config['IMAGE_CACHE_DIR']
+    v = request.args.get('v', '')
+    if v and not VERSION.fullmatch(v):
+        abort(404)
+    if directory and v and pillow() is not None:
+        extension = _format()
+        response = _send(_path(directory, v, size, extension), FORMATS[extension][1], IMMUTABLE)
+        if response is not None:
+            return response
+
+    model = KINDS[kind]
+    image_link = db.session.scalar(select(model.image_link).where(model.id == id))
+    if not image_link:
+        abort(404)
+    if not directory or pillow() is None:
+        return redirect(image_link)
+    current = version(image_link)
+    if v and v != current:
+        # A page rendered before the image_link changed.
+        return redirect(url_for('images.thumbnail', kind=kind, id=id, size=size, v=current))
+    extension = _format()
+    format, mimetype = FORMATS[extension]
+    path = _path(directory, current, size, extension)
+    cache_control = IMMUTABLE if v else 'public, max-age=%d' % current_app.config['IMAGE_MAX_AGE']
+    response = _send(path, mimetype, cache_control)
+    if response is not None:
+        return response
+
+    failed = _path(directory, current, 'error', 'txt')
+    try:
+        if time.time() - os.stat(failed).st_mtime < ERROR_SECONDS:
+            abort(404)
+    except FileNotFoundError:
+        pass
+    try:
+        data = resize(fetch(image_link), SIZES[size], format)
+    except Exception as error:
+        current_app.logger.warning('Image %s of %s %d failed: %s', image_link, kind, id, error)
+        _write(failed, str(error).encode('utf-8'))
+        abort(404)
+    _store(directory, path, data)
+    return _send(path, mimetype, cache_control)
+
+
+def init_images(app):
+    app.add_template_global(image_url)
@@ -0,0 +1,205 @@
+"""Bulk import of venues, artists and shows: ``flask import <kind> <file>``.
+
+Files are CSV (with a header row) or JSON Lines, read as a stream and
+written in chunks, one transaction per chunk. Each chunk is checked as a
+batch by validation.py, the form rules without a form per row; rejected
+rows are counted and can be written to a JSON Lines file with all their
+errors. A JSON Lines line that does not parse, or is not an object, is a
+rejected row like any other.
+
+Columns are named as in validation.py. Shows without an ``end_time`` last
+SHOW_DEFAULT_MINUTES, and a show overlapping another show of its venue or
+artist, in the database or earlier in the file, is rejected.
+"""
+import csv
+import io
+import json
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert, select
+
+import cache
+import counters
+import scheduling
+import validation
+from models import db, utcnow, Venue, Artist, Show, Genre, artist_genres, venue_genres
+
+# A JSON Lines line that does not parse, read_rows yields it in place of a row.
+BadLine = namedtuple('BadLine', 'number text error')
+
+
+def read_rows(stream, format):
+    if format == 'csv':
+        for row in csv.DictReader(stream):
+            yield row
+    else:
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as error:
+                    yield BadLine(number, line.rstrip('\n'), str(error))
+
+
+def unreadable(row):
+    """The errors of a row that is not an object, so no rule can read it."""
+    if isinstance(row, BadLine):
+        return ['line %d: Not valid JSON: %s.' % (row.number, row.error)]
+    return ['Not a JSON object.']
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def make_schedule_check():
+    """A check of a valid Show record against the other shows of its venue
+    and artist, in the database and accepted before; returns its errors."""
+    timelines = {}
+
+    def timeline(owner, column, owner_id):
+        # Loaded on first use, then kept up to date with the accepted rows.
+        if (owner, owner_id) not in timelines:
+            timelines[owner, owner_id] = scheduling.Timeline(db.session.execute(
+                select(Show.start_time, Show.end_time).where(column == owner_id).order_by(Show.start_time)))
+        return timelines[owner, owner_id]
+
+    def check_schedule(record):
+        start_time, end_time = record['start_time'], record['end_time']
+        lines = [timeline(owner, column, record[column.key]) for owner, column in scheduling.OWNERS]
+        errors = ['start_time: Overlaps another show of this %s.' % owner
+                  for (owner, _), line in zip(scheduling.OWNERS, lines)
+                  if line.clash(start_time, end_time) is not None]
+        if not errors:
+            for line in lines:
+                line.add(start_time, end_time)
+        return errors
+
+    return check_schedule
+
+
+class Importer(object):
+    """Validates and writes rows of one kind, chunk by chunk."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.model = {'venues': Venue, 'artists': Artist, 'shows': Show}[kind]
+        self.check_schedule = None
+        if kind == 'venues':
+            self.schema, self.link_table, self.owner_column = validation.VENUE, venue_genres, 'venue_id'
+        elif kind == 'artists':
+            self.schema, self.link_table, self.owner_column = validation.ARTIST, artist_genres, 'artist_id'
+        else:
+            self.schema = validation.show_schema(
+                set(db.session.scalars(select(Venue.id))), set(db.session.scalars(select(Artist.id))),
+                timedelta(minutes=current_app.config['SHOW_DEFAULT_MINUTES']))
+            self.link_table, self.owner_column = None, None
+            self.check_schedule = make_schedule_check()
+        self.genre_ids = {genre.name: genre.id for genre in Genre.query}
+        self.inserted = 0
+        self.rejected = 0
+
+    def validate(self, chunk, rejects=None):
+        """[(values, genre names)] for the valid rows of ``chunk``."""
+        valid = []
+        results = zip(*validation.validate(self.schema, [row for row in chunk if isinstance(row, dict)]))
+        for row in chunk:
+            if isinstance(row, dict):
+                record, row_errors = next(results)
+            else:
+                record, row_errors = None, unreadable(row)
+                row = row.text if isinstance(row, BadLine) else row
+            if record is not None and self.check_schedule is not None:
+                row_errors = self.check_schedule(record)
+            if row_errors:
+                self.rejected += 1
+                if rejects is not None:
+                    rejects.write(json.dumps({'row': row, 'errors': row_errors}, default=str) + '\n')
+            else:
+                valid.append((record, record.pop('genres', [])))
+        return valid
+
+    def write(self, valid):
+        if not valid:
+            return
+        values = [values for values, _ in valid]
+        try:
+            if self.link_table is None:
+                self._write_shows(values)
+            else:
+                returning = insert(self.model).returning(self.model.id, sort_by_parameter_order=True)
+                ids = db.session.scalars(returning, values).all()
+                links = [
+                    {self.owner_column: id, 'genre_id': self._genre_id(name)}
+                    for id, (_, genres) in zip(ids, valid) for name in genres
+                ]
+                if links:
+                    db.session.execute(insert(self.link_table), links)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Genres created in the failed chunk are gone with it.
+            self.genre_ids = {genre.name: genre.id for genre in Genre.query}
+            raise
+        self.inserted += len(values)
+
+    def _write_shows(self, values):
+        connection = db.session.connection()
+        # Core inserts skip the mapper events that keep the show counters.
+        counters.add_shows(connection, values)
+        if connection.dialect.driver != 'psycopg2':
+            db.session.execute(insert(Show), values)
+            return
+        # COPY is the fastest way to load plain rows into Postgres. It skips
+        # the Python-side column defaults, so updated_at is written here.
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        updated_at = utcnow().isoformat()
+        for value in values:
+            writer.writerow([value['venue_id'], value['artist_id'], value['start_time'].isoformat(),
+                             value['end_time'].isoformat(), updated_at])
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            'COPY "Show" (venue_id, artist_id, start_time, end_time, updated_at) FROM STDIN WITH CSV', buffer)
+
+    def _genre_id(self, name):
+        if name not in self.genre_ids:
+            self.genre_ids[name] = db.session.scalar(insert(Genre).values(name=name).returning(Genre.id))
+        return self.genre_ids[name]
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']),
+              help='File format; guessed from the file extension by default.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows per transaction.')
+@click.option('--rejects', type=click.File('w', encoding='utf-8'),
+              help='Write rejected rows and their errors to this JSON Lines file.')
+@with_appcontext
+def import_command(kind, source, format, chunk_size, rejects):
+    """Bulk import venues, artists or shows from a CSV or JSON Lines file."""
+    format = format or ('csv' if source.name.endswith('.csv') else 'jsonl')
+    importer = Importer(kind)
+    start = time.perf_counter()
+    for chunk in chunked(read_rows(source, format), chunk_size):
+        importer.write(importer.validate(chunk, rejects))
+    # Core inserts skip the mapper events that evict cached pages.
+    cache.clear()
+    elapsed = time.perf_counter() - start
+    total = importer.inserted + importer.rejected
+    click.echo('%s: %d rows read, %d inserted, %d rejected in %.2fs (%.0f rows/s)' % (
+        kind, total, importer.inserted, importer.rejected, elapsed, total / elapsed if elapsed else 0))
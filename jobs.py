@@ -0,0 +1,362 @@
+"""Background jobs: a queue in the database and ``flask worker``.
+
+Request handlers call ``enqueue(name, **payload)``, which adds a Job row to
+the current session, so the job is queued by the same commit as the change
+that asked for it (and dropped with it on rollback). Workers started with
+``flask worker`` claim due jobs in batches and call the handler registered
+under the job's name with the payload as keyword arguments.
+
+A claim leases the job for JOB_LEASE_SECONDS; the rows are picked with
+FOR UPDATE SKIP LOCKED on Postgres and taken with a conditional update
+everywhere, so two workers never run the same job at once, and a job whose
+worker died is picked up again once its lease runs out. Delivery is at
+least once: handlers must be safe to run twice. A failing job is retried
+with exponential backoff; after JOB_MAX_ATTEMPTS failures, or at once on
+``Fail``, it moves to the DeadJob table. ``flask jobs`` shows both.
+
+Queue depth and the age of the oldest due job are exported on /metrics
+(counted at most every JOB_GAUGES_SECONDS), and each worker can serve its
+own run counters and latency histograms (``--metrics-port``).
+"""
+import json
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import Request
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, case, delete, func, or_, select, update
+
+import counters
+import images
+import metrics
+from models import db, utcnow, Venue, Artist, Job, DeadJob
+
+handlers = {}
+
+# (monotonic time they expire, text) of the last queue_gauges.
+_gauges = (0.0, '')
+
+jobs_succeeded = metrics.Counter('fyyur_jobs_succeeded_total', 'Jobs that ran to completion.')
+jobs_retried = metrics.Counter('fyyur_jobs_retried_total', 'Job runs that failed and were scheduled again.')
+jobs_dead = metrics.Counter('fyyur_jobs_dead_total', 'Jobs moved to the dead-letter table.')
+job_wait_seconds = metrics.Histogram(
+    'fyyur_job_wait_seconds', 'Time from when a job was due to when a worker started it.',
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0))
+job_run_seconds = metrics.Histogram('fyyur_job_run_seconds', 'Time spent running a job.')
+
+
+class Fail(Exception):
+    """Raised by a handler for a failure that retrying cannot fix."""
+
+
+def handler(name):
+    """Register the decorated function as the handler of jobs called ``name``."""
+    def decorator(func):
+        handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, delay=0, **payload):
+    """Add a job to the session; it is queued when the session commits."""
+    if name not in handlers:
+        raise ValueError('No handler for job %r.' % name)
+    job = Job(name=name, payload=json.dumps(payload, sort_keys=True),
+              run_at=utcnow() + timedelta(seconds=delay))
+    db.session.add(job)
+    return job
+
+
+def _unlocked(now):
+    return or_(Job.locked_until.is_(None), Job.locked_until < now)
+
+
+def claim(limit):
+    """Lease up to ``limit`` due jobs to this worker, oldest first."""
+    now = utcnow()
+    ids = db.session.scalars(
+        select(Job.id).where(Job.run_at <= now, _unlocked(now)).order_by(Job.run_at).limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not ids:
+        db.session.commit()
+        return []
+    token = uuid.uuid4().hex
+    lease = timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+    # Rows another worker took since the select no longer match and stay theirs.
+    db.session.execute(
+        update(Job).where(Job.id.in_(ids), _unlocked(now))
+        .values(locked_by=token, locked_until=now + lease, attempts=Job.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return db.session.scalars(select(Job).where(Job.locked_by == token).order_by(Job.run_at)).all()
+
+
+def release(jobs):
+    """Give claimed jobs that were not started back to the queue."""
+    ids = [job.id for job in jobs]
+    if ids:
+        db.session.execute(
+            update(Job).where(Job.id.in_(ids))
+            .values(locked_by=None, locked_until=None, attempts=Job.attempts - 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+
+def backoff(attempts):
+    config = current_app.config
+    delay = min(config['JOB_BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['JOB_BACKOFF_MAX_SECONDS'])
+    # Jitter, so jobs that failed together are not all retried together.
+    return timedelta(seconds=delay * random.uniform(0.75, 1.25))
+
+
+def run(job):
+    """Run one claimed job, then delete it, reschedule it or bury it."""
+    job_id, name, attempts = job.id, job.name, job.attempts
+    job_wait_seconds.observe(max((utcnow() - job.run_at).total_seconds(), 0.0))
+    start = time.perf_counter()
+    try:
+        if name not in handlers:
+            raise Fail('No handler for job %r.' % name)
+        if attempts > current_app.config['JOB_MAX_ATTEMPTS']:
+            raise Fail('Earlier runs never finished; their leases expired.')
+        handlers[name](**json.loads(job.payload))
+    except Exception as error:
+        db.session.rollback()
+        _failed(job_id, error, traceback.format_exc())
+        return False
+    else:
+        db.session.execute(delete(Job).where(Job.id == job_id))
+        db.session.commit()
+        jobs_succeeded.inc()
+        return True
+    finally:
+        job_run_seconds.observe(time.perf_counter() - start)
+
+
+def _failed(job_id, error, trace):
+    job = db.session.get(Job, job_id)
+    if isinstance(error, Fail) or job.attempts >= current_app.config['JOB_MAX_ATTEMPTS']:
+        db.session.add(DeadJob(name=job.name, payload=job.payload, attempts=job.attempts,
+                               enqueued_at=job.enqueued_at, error=trace))
+        db.session.delete(job)
+        jobs_dead.inc()
+        current_app.logger.error('Job %s %s failed for good after %d attempts: %s',
+                                 job.id, job.name, job.attempts, error)
+    else:
+        job.run_at = utcnow() + backoff(job.attempts)
+        job.locked_by = job.locked_until = None
+        job.last_error = trace
+        jobs_retried.inc()
+        current_app.logger.warning('Job %s %s failed (attempt %d), retrying at %s: %s',
+                                   job.id, job.name, job.attempts, job.run_at, error)
+    db.session.commit()
+
+
+def work(stopping, burst=False):
+    """Run jobs until ``stopping`` is set, or until none is due with ``burst``; returns how many ran."""
+    config = current_app.config
+    ran = 0
+    while not stopping.is_set():
+        claimed = claim(config['JOB_BATCH_SIZE'])
+        if not claimed:
+            if burst:
+                break
+            stopping.wait(config['JOB_POLL_SECONDS'])
+            continue
+        for position, job in enumerate(claimed):
+            if stopping.is_set():
+                release(claimed[position:])
+                break
+            run(job)
+            ran += 1
+    return ran
+
+
+@metrics.collector
+def queue_gauges():
+    # Every scrape of every process would otherwise count the whole queue.
+    global _gauges
+    if time.monotonic() < _gauges[0]:
+        return _gauges[1]
+    now = utcnow()
+    ready = and_(Job.run_at <= now, _unlocked(now))
+    with db.engine.connect() as connection:
+        due, running, waiting, oldest = connection.execute(select(
+            func.count(case((ready, 1))),
+            func.count(case((Job.locked_until >= now, 1))),
+            func.count(case((Job.run_at > now, 1))),
+            func.min(case((ready, Job.run_at))),
+        )).one()
+        dead = connection.scalar(select(func.count()).select_from(DeadJob))
+    text = (
+        metrics.gauge('fyyur_jobs_due', 'Jobs due and waiting for a worker.', due)
+        + metrics.gauge('fyyur_jobs_running', 'Jobs leased to a worker.', running)
+        + metrics.gauge('fyyur_jobs_scheduled', 'Jobs (and retries) due later.', waiting)
+        + metrics.gauge('fyyur_jobs_dead', 'Jobs in the dead-letter table.', dead)
+        + metrics.gauge('fyyur_jobs_oldest_due_seconds', 'How long the oldest due job has waited.',
+                        (now - oldest).total_seconds() if oldest is not None else 0)
+    )
+    _gauges = time.monotonic() + current_app.config['JOB_GAUGES_SECONDS'], text
+    return text
+
+
+def serve_metrics(app, port):
+    """Serve this process's /metrics on ``port`` from a daemon thread."""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with app.app_context():
+                body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
+
+
+#  Handlers
+#  ----------------------------------------------------------------
+
+IMAGE_CHECK_TIMEOUT = 10
+IMAGE_OWNERS = {'venue': Venue, 'artist': Artist}
+
+
+def check_image_later(kind, entity):
+    """Forget the last check of ``entity``'s image_link and queue a new one; ``entity`` needs its id."""
+    entity.image_link_ok = entity.image_link_checked_at = None
+    if entity.image_link:
+        enqueue('check-image-link', kind=kind, id=entity.id)
+
+
+@handler('check-image-link')
+def check_image_link(kind, id):
+    """Record on the row whether the image_link of a venue or artist is an image.
+
+    A link that is not one fails the job for good. Network and server errors
+    are retried and leave the last result as it was.
+    """
+    model = IMAGE_OWNERS[kind]
+    url = db.session.scalar(select(model.image_link).where(model.id == id))
+    if not url:
+        return
+    try:
+        _check_image(kind, id, url)
+    except Fail:
+        # Committed before run() rolls back, so the result outlives the dead job.
+        _link_checked(model, id, url, False)
+        db.session.commit()
+        raise
+    _link_checked(model, id, url, True)
+
+
+def _link_checked(model, id, url, ok):
+    # Only while the link is the one checked; an edit may have replaced it.
+    db.session.execute(
+        update(model).where(model.id == id, model.image_link == url)
+        .values(image_link_ok=ok, image_link_checked_at=utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _check_image(kind, id, url):
+    if not url.startswith(('http://', 'https://')):
+        raise Fail('%s %d: image_link %r is not an http(s) URL.' % (kind, id, url))
+    try:
+        # Public addresses only, like the fetches of the image proxy.
+        with images.open_url(Request(url, method='HEAD'), IMAGE_CHECK_TIMEOUT) as response:
+            content_type = response.headers.get('Content-Type', '')
+    except HTTPError as error:
+        # Client errors will not go away by asking again; server errors might.
+        if error.code < 500:
+            raise Fail('%s %d: image_link %s answered %d.' % (kind, id, url, error.code))
+        raise
+    except ValueError as error:
+        raise Fail('%s %d: image_link %r is not a usable URL: %s.' % (kind, id, url, error))
+    if not content_type.startswith('image/'):
+        raise Fail('%s %d: image_link %s is %s, not an image.' % (kind, id, url, content_type or 'untyped'))
+
+
+@handler('roll-counters')
+def roll_counters():
+    """Roll the show counters and schedule the next roll."""
+    counters.roll()
+    schedule_roll()
+
+
+def schedule_roll():
+    # The running roll is leased, so only a roll still waiting counts. Rolls
+    # are idempotent, so the rare duplicate from racing workers is harmless.
+    interval = current_app.config['COUNTERS_ROLL_SECONDS']
+    waiting = select(Job.id).where(Job.name == 'roll-counters', Job.locked_by.is_(None))
+    if interval and db.session.scalar(waiting.limit(1)) is None:
+        enqueue('roll-counters', delay=interval)
+        db.session.commit()
+
+
+#  Commands
+#  ----------------------------------------------------------------
+
+@click.command('worker')
+@click.option('--burst', is_flag=True, help='Exit once no job is due instead of waiting for more.')
+@click.option('--metrics-port', type=int, help="Serve this worker's /metrics on this port.")
+@with_appcontext
+def worker_command(burst, metrics_port):
+    """Run queued jobs; SIGTERM or Ctrl-C stops after the current job."""
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stopping.set())
+    if metrics_port:
+        serve_metrics(current_app._get_current_object(), metrics_port)
+    schedule_roll()
+    name = '%s:%d' % (socket.gethostname(), os.getpid())
+    click.echo('worker %s started' % name)
+    ran = work(stopping, burst)
+    click.echo('worker %s stopped after %d jobs' % (name, ran))
+
+
+@click.command('jobs')
+@click.option('--requeue', is_flag=True, help='Move every dead job back to the queue.')
+@with_appcontext
+def jobs_command(requeue):
+    """Show queued jobs by name and the dead-letter table."""
+    if requeue:
+        dead = db.session.scalars(select(DeadJob)).all()
+        for job in dead:
+            db.session.add(Job(name=job.name, payload=job.payload, enqueued_at=job.enqueued_at))
+            db.session.delete(job)
+        db.session.commit()
+        click.echo('%d dead jobs requeued' % len(dead))
+        return
+    now = utcnow()
+    rows = db.session.execute(
+        select(Job.name, func.count(case((and_(Job.run_at <= now, _unlocked(now)), 1))),
+               func.count(case((Job.run_at > now, 1))),
+               func.count(case((Job.locked_until >= now, 1))))
+        .group_by(Job.name).order_by(Job.name)
+    ).all()
+    click.echo('%-24s %8s %10s %8s' % ('job', 'due', 'scheduled', 'running'))
+    for name, due, waiting, running in rows:
+        click.echo('%-24s %8d %10d %8d' % (name, due, waiting, running))
+    for job in db.session.scalars(select(DeadJob).order_by(DeadJob.failed_at)):
+        click.echo('dead %d %s %s after %d attempts at %s: %s' % (
+            job.id, job.name, job.payload, job.attempts, job.failed_at, job.error.strip().splitlines()[-1]))
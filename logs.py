@@ -0,0 +1,173 @@
+"""Non-blocking log pipeline: request threads enqueue, one thread writes.
+
+``app.logger`` records are put on a bounded queue by ``BoundedQueueHandler``
+and written by a ``QueueListener`` thread, so a slow disk never shows up as
+request latency. When the queue is full, LOG_QUEUE_POLICY decides:
+``drop`` discards the record (ERROR and above first wait up to
+LOG_QUEUE_BLOCK_TIMEOUT seconds), ``block`` waits that long for every record
+before dropping it. Dropped records are counted on /metrics.
+
+Records are written as JSON lines carrying the request id (from an
+incoming X-Request-ID header or generated, and echoed on the response) and
+the milliseconds since the request started. Files rotate by size or by time
+(LOG_ROTATE).
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+from flask import g, has_request_context, request
+
+import metrics
+
+dropped = metrics.Counter('fyyur_log_records_dropped_total', 'Log records dropped because the log queue was full.')
+
+_queues = []
+
+
+@metrics.collector
+def queue_gauges():
+    return metrics.gauge('fyyur_log_queue_depth', 'Log records waiting to be written.',
+                         sum(records.qsize() for records in _queues))
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler that never waits longer than ``block_timeout`` on a full queue."""
+
+    def __init__(self, records, policy='drop', block_timeout=0.05, listener=None):
+        QueueHandler.__init__(self, records)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.listener = listener
+
+    def prepare(self, record):
+        # Request details are only available on the request thread; the
+        # JSON formatting itself happens on the listener thread. The copy
+        # leaves the record intact for any other handler.
+        record = copy.copy(record)
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.method = request.method
+            record.path = request.path
+            if 'request_start' in g:
+                record.elapsed_ms = round((time.perf_counter() - g.request_start) * 1000, 3)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.policy == 'block' or record.levelno >= logging.ERROR:
+            try:
+                self.queue.put(record, timeout=self.block_timeout)
+                return
+            except queue.Full:
+                pass
+        dropped.inc()
+
+    def close(self):
+        # Runs at exit and when init_logging replaces this handler; the
+        # handler sits on two loggers, so only the first call stops the
+        # listener and closes the file behind it.
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            atexit.unregister(self.close)
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+            _queues.remove(self.queue)
+        QueueHandler.close(self)
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener that, on stop, waits for room to enqueue its sentinel."""
+
+    def enqueue_sentinel(self):
+        # The stock put_nowait fails on a full queue; blocking here lets the
+        # listener drain the queue before it stops.
+        self.queue.put(self._sentinel)
+
+
+class JSONFormatter(logging.Formatter):
+    FIELDS = ('request_id', 'method', 'path', 'elapsed_ms')
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'location': '%s:%d' % (record.pathname, record.lineno),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry)
+
+
+def file_handler(config, path):
+    """A size- or time-rotating file handler for ``path``, as configured."""
+    if config['LOG_ROTATE'] == 'time':
+        return TimedRotatingFileHandler(path, when=config['LOG_ROTATE_WHEN'], backupCount=config['LOG_BACKUP_COUNT'])
+    return RotatingFileHandler(path, maxBytes=config['LOG_MAX_BYTES'], backupCount=config['LOG_BACKUP_COUNT'])
+
+
+def queued(handler, config):
+    """A handler that hands records to ``handler`` through a bounded queue and a listener thread."""
+    records = queue.Queue(config['LOG_QUEUE_SIZE'])
+    _queues.append(records)
+    listener = DrainingQueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    handler = BoundedQueueHandler(records, config['LOG_QUEUE_POLICY'], config['LOG_QUEUE_BLOCK_TIMEOUT'], listener)
+    atexit.register(handler.close)
+    return handler
+
+
+def detach(*loggers):
+    """Remove and close the queued handlers an earlier init_logging left on ``loggers``."""
+    for logger in loggers:
+        for handler in [h for h in logger.handlers if isinstance(h, BoundedQueueHandler)]:
+            logger.removeHandler(handler)
+            handler.close()
+
+
+def init_logging(app):
+    @app.before_request
+    def start_request():
+        g.request_start = time.perf_counter()
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def echo_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
+    # app.logger and "fyyur" are process-wide, so another create_app (tests,
+    # the CLI, a reloader) would otherwise stack a second queue and thread.
+    detach(app.logger, logging.getLogger('fyyur'))
+    if app.debug:
+        return
+    handler = file_handler(app.config, app.config['LOG_FILE'])
+    handler.setFormatter(JSONFormatter())
+    level = logging.getLevelName(app.config['LOG_LEVEL'])
+    app.logger.setLevel(level)
+    app.logger.addHandler(queued(handler, app.config))
+    # N+1 warnings from the profiler go to the same file.
+    logging.getLogger('fyyur').addHandler(app.logger.handlers[-1])
+    logging.getLogger('fyyur').setLevel(level)
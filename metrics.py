@@ -0,0 +1,162 @@
+"""In-process counters and histograms exported on /metrics.
+
+Values are rendered in the Prometheus text exposition format so any
+Prometheus-compatible scraper can collect them. Each gunicorn worker keeps
+its own registry; the scraper aggregates across workers.
+"""
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_collectors = {}
+
+
+class Counter(object):
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def render(self):
+        return [
+            '# HELP %s %s' % (self.name, self.help),
+            '# TYPE %s counter' % self.name,
+            '%s %s' % (self.name, self.value),
+        ]
+
+
+class Histogram(object):
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    def render(self):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        lines = [
+            '# HELP %s %s' % (self.name, self.help),
+            '# TYPE %s histogram' % self.name,
+        ]
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            lines.append('%s_bucket{le="%s"} %d' % (self.name, bound, cumulative))
+        lines.append('%s_sum %s' % (self.name, total))
+        lines.append('%s_count %d' % (self.name, cumulative))
+        return lines
+
+
+def gauge(name, help, value):
+    return [
+        '# HELP %s %s' % (name, help),
+        '# TYPE %s gauge' % name,
+        '%s %s' % (name, value),
+    ]
+
+
+def collector(func):
+    """Register ``func`` to produce extra lines (usually gauges) at scrape time.
+
+    Collectors are keyed by their qualified name, so one registered again
+    (by another create_app() in the same process) replaces the earlier one.
+    """
+    _collectors[func.__module__ + '.' + func.__qualname__] = func
+    return func
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for func in list(_collectors.values()):
+        lines.extend(func())
+    return '\n'.join(lines) + '\n'
+
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+pool_checkouts = Counter('fyyur_db_pool_checkouts_total', 'Connections handed out by the pool.')
+pool_checkins = Counter('fyyur_db_pool_checkins_total', 'Connections returned to the pool.')
+pool_overflow_checkouts = Counter(
+    'fyyur_db_pool_overflow_checkouts_total', 'Checkouts served while the pool was in overflow.')
+pool_timeouts = Counter(
+    'fyyur_db_pool_timeouts_total', 'Requests that gave up waiting for a pooled connection.')
+pool_connect_seconds = Histogram(
+    'fyyur_db_pool_connect_seconds', 'Time spent opening a new database connection for the pool.')
+pool_hold_seconds = Histogram(
+    'fyyur_db_pool_hold_seconds', 'Time a connection stayed checked out.')
+
+_instrumented = weakref.WeakSet()
+
+
+def instrument_engine(engine):
+    """Count checkouts/checkins/overflow and time connects and holds on ``engine``'s pool.
+
+    Uses the public pool events only; a starved pool shows up as checked-out
+    connections at pool size plus overflow, and then as pool timeouts.
+    Instrumenting the same pool again does nothing.
+    """
+    pool = engine.pool
+    if pool in _instrumented:
+        return
+    _instrumented.add(pool)
+    queued = isinstance(pool, QueuePool)
+
+    @event.listens_for(engine, 'do_connect')
+    def receive_do_connect(dialect, connection_record, cargs, cparams):
+        connection_record.info['connect_started_at'] = time.perf_counter()
+
+    @event.listens_for(pool, 'connect')
+    def receive_connect(dbapi_connection, connection_record):
+        started_at = connection_record.info.pop('connect_started_at', None)
+        if started_at is not None:
+            pool_connect_seconds.observe(time.perf_counter() - started_at)
+
+    @event.listens_for(pool, 'checkout')
+    def receive_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_checkouts.inc()
+        if queued and pool.overflow() > 0:
+            pool_overflow_checkouts.inc()
+        connection_record.info['checked_out_at'] = time.perf_counter()
+
+    @event.listens_for(pool, 'checkin')
+    def receive_checkin(dbapi_connection, connection_record):
+        pool_checkins.inc()
+        checked_out_at = connection_record.info.pop('checked_out_at', None)
+        if checked_out_at is not None:
+            pool_hold_seconds.observe(time.perf_counter() - checked_out_at)
+
+    @collector
+    def pool_gauges():
+        if not queued:
+            return []
+        return (
+            gauge('fyyur_db_pool_size', 'Configured pool size.', pool.size())
+            + gauge('fyyur_db_pool_checked_out', 'Connections currently checked out.', pool.checkedout())
+            + gauge('fyyur_db_pool_overflow', 'Connections open beyond pool_size.', max(pool.overflow(), 0))
+        )
@@ -0,0 +1,50 @@
+"""add upcoming and past show counters to venue and artist
+
+Revision ID: 3c9d2b7e8f41
+Revises: e5a17c3f9b62
+Create Date: 2026-10-18 22:05:12.904816
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9d2b7e8f41'
+down_revision = 'e5a17c3f9b62'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    op.create_table('Watermark',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    for table, _ in OWNERS:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # start_time is naive local time, so the split is made at the local now.
+    now = datetime.now()
+    for table, column in OWNERS:
+        op.execute(sa.text(
+            'UPDATE "{table}" SET '
+            'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{column} = "{table}".id AND "Show".start_time > :now), '
+            'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{column} = "{table}".id AND "Show".start_time <= :now)'
+            .format(table=table, column=column)
+        ).bindparams(now=now))
+    op.execute(sa.text('INSERT INTO "Watermark" (name, value) VALUES (\'shows_rolled_at\', :now)').bindparams(now=now))
+
+
+def downgrade():
+    for table, _ in reversed(OWNERS):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
+    op.drop_table('Watermark')
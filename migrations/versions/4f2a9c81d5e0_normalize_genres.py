@@ -0,0 +1,83 @@
+"""move comma-joined genres into Genre and association tables
+
+Revision ID: 4f2a9c81d5e0
+Revises: 8d1e4f6a2b37
+Create Date: 2026-10-18 18:12:47.901263
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f2a9c81d5e0'
+down_revision = '8d1e4f6a2b37'
+branch_labels = None
+depends_on = None
+
+# (owner table, link table, link owner column)
+OWNERS = [
+    ('Artist', 'artist_genres', 'artist_id'),
+    ('Venue', 'venue_genres', 'venue_id'),
+]
+
+
+def upgrade():
+    op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for owner, link, owner_id in OWNERS:
+        op.create_table(link,
+        sa.Column(owner_id, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([owner_id], [owner + '.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(owner_id, 'genre_id')
+        )
+        op.create_index('ix_%s_genre_id' % link, link, ['genre_id', owner_id], unique=False)
+
+    bind = op.get_bind()
+    genre = sa.table('Genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    genre_ids = {}
+    for owner, link, owner_id in OWNERS:
+        owner_table = sa.table(owner, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        link_table = sa.table(link, sa.column(owner_id, sa.Integer), sa.column('genre_id', sa.Integer))
+        links = []
+        for row in bind.execute(sa.select(owner_table.c.id, owner_table.c.genres)):
+            names = [name.strip() for name in (row.genres or '').split(',') if name.strip()]
+            for name in dict.fromkeys(names):
+                if name not in genre_ids:
+                    genre_ids[name] = bind.execute(
+                        genre.insert().values(name=name).returning(genre.c.id)
+                    ).scalar_one()
+                links.append({owner_id: row.id, 'genre_id': genre_ids[name]})
+        if links:
+            op.bulk_insert(link_table, links)
+        with op.batch_alter_table(owner) as batch_op:
+            batch_op.drop_column('genres')
+
+
+def downgrade():
+    bind = op.get_bind()
+    genre = sa.table('Genre', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    for owner, link, owner_id in OWNERS:
+        with op.batch_alter_table(owner) as batch_op:
+            batch_op.add_column(sa.Column('genres', sa.String(length=120), nullable=True))
+        owner_table = sa.table(owner, sa.column('id', sa.Integer), sa.column('genres', sa.String))
+        link_table = sa.table(link, sa.column(owner_id, sa.Integer), sa.column('genre_id', sa.Integer))
+        genres = {}
+        rows = bind.execute(
+            sa.select(link_table.c[owner_id], genre.c.name)
+            .join(genre, genre.c.id == link_table.c.genre_id)
+            .order_by(link_table.c[owner_id], genre.c.name)
+        )
+        for row in rows:
+            genres.setdefault(row[0], []).append(row.name)
+        for id, names in genres.items():
+            bind.execute(owner_table.update().where(owner_table.c.id == id).values(genres=','.join(names)[:120]))
+        op.drop_index('ix_%s_genre_id' % link, table_name=link)
+        op.drop_table(link)
+    op.drop_table('Genre')
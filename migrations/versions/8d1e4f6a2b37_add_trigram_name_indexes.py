@@ -0,0 +1,32 @@
+"""add trigram indexes on venue and artist names
+
+Revision ID: 8d1e4f6a2b37
+Revises: 2c0ff97405b2
+Create Date: 2026-10-18 17:40:12.418305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d1e4f6a2b37'
+down_revision = '2c0ff97405b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        op.create_index(
+            'ix_%s_name_trgm' % table, table, ['name'], unique=False,
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+        )
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_index('ix_%s_name_trgm' % table, table_name=table)
@@ -0,0 +1,31 @@
+"""record image link health on venues and artists
+
+Revision ID: 9b4e1d7c2a58
+Revises: c4e7a2d9b813
+Create Date: 2026-10-18 21:14:37.218405
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4e1d7c2a58'
+down_revision = 'c4e7a2d9b813'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('image_link_ok', sa.Boolean(), nullable=True))
+        op.add_column(table, sa.Column('image_link_checked_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('image_link_checked_at')
+            batch_op.drop_column('image_link_ok')
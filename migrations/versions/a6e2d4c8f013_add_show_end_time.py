@@ -0,0 +1,63 @@
+"""add show end time and forbid overlapping shows
+
+Revision ID: a6e2d4c8f013
+Revises: 3c9d2b7e8f41
+Create Date: 2026-10-19 09:12:40.227518
+
+Existing shows get an end time two hours after they start, cut short where
+the next show of the same venue or artist starts earlier. Shows starting at
+the same time at one venue or for one artist cannot be told apart and make
+the upgrade fail on ck_Show_end_after_start; delete or move them first.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6e2d4c8f013'
+down_revision = '3c9d2b7e8f41'
+branch_labels = None
+depends_on = None
+
+DEFAULT_MINUTES = 120
+
+
+def upgrade():
+    bind = op.get_bind()
+    op.add_column('Show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            'UPDATE "Show" SET end_time = ends.end_time FROM ('
+            '  SELECT id, LEAST('
+            "    start_time + interval '%d minutes',"
+            '    COALESCE(LEAD(start_time) OVER (PARTITION BY venue_id ORDER BY start_time), \'infinity\'),'
+            '    COALESCE(LEAD(start_time) OVER (PARTITION BY artist_id ORDER BY start_time), \'infinity\')'
+            '  ) AS end_time FROM "Show"'
+            ') AS ends WHERE "Show".id = ends.id' % DEFAULT_MINUTES
+        )
+    else:
+        # SQLite stores 'YYYY-MM-DD HH:MM:SS.ffffff'; datetime() drops the fraction.
+        op.execute(
+            'UPDATE "Show" SET end_time = datetime(start_time, \'+%d minutes\') || substr(start_time, 20)'
+            % DEFAULT_MINUTES
+        )
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.alter_column('end_time', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_check_constraint('ck_Show_end_after_start', 'end_time > start_time')
+    if bind.dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for column in ('venue_id', 'artist_id'):
+            op.execute(
+                'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_{column}_overlap" '
+                'EXCLUDE USING gist ({column} WITH =, tsrange(start_time, end_time) WITH &&)'.format(column=column)
+            )
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for column in ('artist_id', 'venue_id'):
+            op.execute('ALTER TABLE "Show" DROP CONSTRAINT "ex_Show_{column}_overlap"'.format(column=column))
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_constraint('ck_Show_end_after_start', type_='check')
+        batch_op.drop_column('end_time')
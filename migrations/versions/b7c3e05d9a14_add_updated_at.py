@@ -0,0 +1,36 @@
+"""add updated_at to venue, artist and show
+
+Revision ID: b7c3e05d9a14
+Revises: 4f2a9c81d5e0
+Create Date: 2026-10-18 19:03:26.552190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c3e05d9a14'
+down_revision = '4f2a9c81d5e0'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute('UPDATE "%s" SET updated_at = CURRENT_TIMESTAMP' % table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+    op.create_index('ix_Show_venue_id_updated_at', 'Show', ['venue_id', 'updated_at'], unique=False)
+    op.create_index('ix_Show_artist_id_updated_at', 'Show', ['artist_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_artist_id_updated_at', table_name='Show')
+    op.drop_index('ix_Show_venue_id_updated_at', table_name='Show')
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
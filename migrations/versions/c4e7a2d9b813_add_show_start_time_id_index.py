@@ -0,0 +1,24 @@
+"""index show (start_time, id) for keyset pages
+
+Revision ID: c4e7a2d9b813
+Revises: f3b8a1c9e072
+Create Date: 2026-10-18 19:02:11.504318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e7a2d9b813'
+down_revision = 'f3b8a1c9e072'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
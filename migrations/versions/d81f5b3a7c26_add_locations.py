@@ -0,0 +1,37 @@
+"""add venue and artist locations with a geohash index
+
+Revision ID: d81f5b3a7c26
+Revises: a6e2d4c8f013
+Create Date: 2026-10-19 14:37:05.518230
+
+Existing rows get no location; run ``flask geocode`` to place them.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f5b3a7c26'
+down_revision = 'a6e2d4c8f013'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('latitude', sa.Float(), nullable=True))
+        op.add_column(table, sa.Column('longitude', sa.Float(), nullable=True))
+        op.add_column(table, sa.Column('geohash', sa.String(length=12), nullable=True))
+        op.create_index('ix_%s_geohash' % table, table, ['geohash', 'latitude', 'longitude'], unique=False,
+                        postgresql_include=['id'])
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index('ix_%s_geohash' % table, table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('geohash')
+            batch_op.drop_column('longitude')
+            batch_op.drop_column('latitude')
@@ -0,0 +1,220 @@
+from datetime import datetime, timezone
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+
+db = SQLAlchemy()
+
+
+def utcnow():
+    # Naive UTC, like the rest of the DateTime columns.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def trigram_index(table, column='name'):
+    # GIN trigram index used by search.py for ILIKE '%term%' lookups on Postgres.
+    return db.Index(
+        'ix_%s_%s_trgm' % (table, column), column,
+        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'},
+    )
+
+
+def no_overlap(table, column):
+    # GiST exclusion constraint: no two rows with the same ``column`` whose
+    # [start_time, end_time) ranges overlap. Postgres only; needs btree_gist.
+    return ExcludeConstraint(
+        (column, '='), (db.literal_column('tsrange(start_time, end_time)'), '&&'),
+        name='ex_%s_%s_overlap' % (table, column), using='gist',
+    ).ddl_if(dialect='postgresql')
+
+
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+# Genre links; the (genre_id, owner) indexes answer "all <genre> artists/venues".
+artist_genres = db.Table(
+    'artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id', 'genre_id', 'artist_id'),
+)
+
+venue_genres = db.Table(
+    'venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id', 'genre_id', 'venue_id'),
+)
+
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def get_or_create_all(cls, names):
+        """The Genre rows for ``names``, adding the missing ones to the session."""
+        names = list(dict.fromkeys(name for name in names if name))
+        genres = {genre.name: genre for genre in cls.query.filter(cls.name.in_(names))} if names else {}
+        for name in names:
+            if name not in genres:
+                genres[name] = cls(name=name)
+                db.session.add(genres[name])
+        return [genres[name] for name in names]
+
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+    __table_args__ = (
+        trigram_index('Venue'),
+        # Covers geo.within, which reads coordinates from the index alone.
+        db.Index('ix_Venue_geohash', 'geohash', 'latitude', 'longitude', postgresql_include=['id']),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    # Result of the last check-image-link job (jobs.py); None until checked.
+    image_link_ok = db.Column(db.Boolean)
+    image_link_checked_at = db.Column(db.DateTime)
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    seeking_talent = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(500))
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # Set from latitude and longitude by geo.py.
+    geohash = db.Column(db.String(12))
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    # Maintained by counters.py, split at the shows_rolled_at watermark.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name', lazy=True)
+    shows = db.relationship('Show', backref='venue', lazy=True)
+
+
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+    __table_args__ = (
+        trigram_index('Artist'),
+        # Covers geo.within, which reads coordinates from the index alone.
+        db.Index('ix_Artist_geohash', 'geohash', 'latitude', 'longitude', postgresql_include=['id']),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    # Result of the last check-image-link job (jobs.py); None until checked.
+    image_link_ok = db.Column(db.Boolean)
+    image_link_checked_at = db.Column(db.DateTime)
+    facebook_link = db.Column(db.String(120))
+    website = db.Column(db.String(120))
+    seeking_venue = db.Column(db.Boolean, nullable=False, default=False)
+    seeking_description = db.Column(db.String(500))
+    # Home town, set like the venue locations.
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geohash = db.Column(db.String(12))
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    # Maintained by counters.py, split at the shows_rolled_at watermark.
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name', lazy=True)
+    shows = db.relationship('Show', backref='artist', lazy=True)
+
+
+class Show(db.Model):
+    __tablename__ = 'Show'
+    __table_args__ = (
+        # max(updated_at) per venue or artist, for conditional GETs on their pages.
+        db.Index('ix_Show_venue_id_updated_at', 'venue_id', 'updated_at'),
+        db.Index('ix_Show_artist_id_updated_at', 'artist_id', 'updated_at'),
+        # Upcoming/past splits of one venue's or artist's shows.
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        # Keyset pages of /shows walk (start_time, id) in either direction.
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        # A venue hosts, and an artist plays, one show at a time (scheduling.py).
+        db.CheckConstraint('end_time > start_time', name='ck_Show_end_after_start'),
+        no_overlap('Show', 'venue_id'),
+        no_overlap('Show', 'artist_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+
+
+class Watermark(db.Model):
+    """Named points in time that background jobs have processed up to."""
+    __tablename__ = 'Watermark'
+
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.DateTime, nullable=False)
+
+
+class Job(db.Model):
+    """A queued call of a jobs.py handler."""
+    __tablename__ = 'Job'
+    __table_args__ = (db.Index('ix_Job_run_at', 'run_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    # JSON object of the handler's keyword arguments.
+    payload = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    enqueued_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    # Set by the worker running the job; once locked_until passes, another may take it.
+    locked_by = db.Column(db.String(64))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+
+class DeadJob(db.Model):
+    """A job that failed for good, kept until it is requeued or deleted."""
+    __tablename__ = 'DeadJob'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False)
+    enqueued_at = db.Column(db.DateTime, nullable=False)
+    failed_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    error = db.Column(db.Text, nullable=False)
+
+
+# before_update also fires for rows whose only change is a relationship (such
+# as genres), where a column onupdate would not.
+@event.listens_for(Venue, 'before_update')
+@event.listens_for(Artist, 'before_update')
+@event.listens_for(Show, 'before_update')
+def touch_updated_at(mapper, connection, target):
+    target.updated_at = utcnow()
+
+
+for table in (Venue.__table__, Artist.__table__):
+    event.listen(
+        table, 'before_create',
+        DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'),
+    )
+event.listen(
+    Show.__table__, 'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'),
+)
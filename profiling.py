@@ -0,0 +1,172 @@
+"""Opt-in per-request profiling: SQL, template rendering and filter time.
+
+Enabled with PROFILING=1. Each request records its SQL statements (from the
+engine's cursor events), the templates it rendered (from the
+``before_render_template``/``template_rendered`` signals) and the time spent
+in the ``datetime`` filter. The totals go out in a ``Server-Timing`` header,
+which browser dev tools show per request.
+
+A statement run PROFILING_DUPLICATE_QUERIES times or more in one request is
+logged as a suspected N+1. Requests slower than PROFILING_SLOW_MS are
+sampled (PROFILING_SLOW_SAMPLE_RATE) into a JSON Lines log, written through
+the queued pipeline in logs.py. With PROFILING_PANEL=1 HTML pages also get
+a panel listing the queries and templates, for local debugging only.
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import before_render_template, g, has_app_context, request, template_rendered
+from sqlalchemy import event
+
+import logs
+from models import db
+
+# Filters whose time is reported separately from rendering.
+TIMED_FILTERS = ('datetime',)
+
+logger = logging.getLogger('fyyur.profiling')
+slow_logger = logging.getLogger('fyyur.profiling.slow')
+
+
+class RequestProfile(object):
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = []
+        self.templates = []
+        self.timers = {}
+        self._rendering = []
+
+    @property
+    def query_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+    @property
+    def render_ms(self):
+        return sum(duration for _, duration in self.templates)
+
+    def add_time(self, name, duration):
+        count, total = self.timers.get(name, (0, 0.0))
+        self.timers[name] = (count + 1, total + duration)
+
+    def duplicates(self, threshold):
+        """Statements run at least ``threshold`` times, most repeated first."""
+        counts = Counter(statement for statement, _ in self.queries)
+        return [(statement, count) for statement, count in counts.most_common() if count >= threshold]
+
+
+def current_profile():
+    return g.get('profile') if has_app_context() else None
+
+
+def timed(name, func):
+    """``func``, adding its call time to the current request's ``name`` timer."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = current_profile()
+        if profile is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.add_time(name, (time.perf_counter() - start) * 1000)
+    return wrapper
+
+
+def server_timing(profile, total_ms):
+    parts = ['db;dur=%.2f;desc="%d queries"' % (profile.query_ms, len(profile.queries)),
+             'render;dur=%.2f' % profile.render_ms]
+    for name, (count, duration) in sorted(profile.timers.items()):
+        parts.append('%s;dur=%.2f;desc="%d calls"' % (name, duration, count))
+    parts.append('total;dur=%.2f' % total_ms)
+    return ', '.join(parts)
+
+
+def init_profiling(app):
+    # Like init_logging: another create_app replaces the slow log handler.
+    logs.detach(slow_logger)
+    if not app.config['PROFILING']:
+        return
+    slow_ms = app.config['PROFILING_SLOW_MS']
+    sample_rate = app.config['PROFILING_SLOW_SAMPLE_RATE']
+    threshold = app.config['PROFILING_DUPLICATE_QUERIES']
+    panel = app.config['PROFILING_PANEL']
+
+    handler = logs.file_handler(app.config, app.config['PROFILING_SLOW_LOG'])
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_logger.addHandler(logs.queued(handler, app.config))
+    slow_logger.setLevel(logging.INFO)
+    slow_logger.propagate = False
+
+    for name in TIMED_FILTERS:
+        app.jinja_env.filters[name] = timed(name, app.jinja_env.filters[name])
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('profiling_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info['profiling_start'].pop()
+        profile = current_profile()
+        if profile is not None:
+            profile.queries.append((statement, (time.perf_counter() - start) * 1000))
+
+    @before_render_template.connect_via(app)
+    def before_render(sender, template, context, **extra):
+        profile = current_profile()
+        if profile is not None:
+            profile._rendering.append(time.perf_counter())
+
+    @template_rendered.connect_via(app)
+    def after_render(sender, template, context, **extra):
+        profile = current_profile()
+        if profile is not None and profile._rendering:
+            profile.templates.append((template.name, (time.perf_counter() - profile._rendering.pop()) * 1000))
+
+    @app.before_request
+    def start_profile():
+        g.profile = RequestProfile()
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        total_ms = (time.perf_counter() - profile.start) * 1000
+        response.headers['Server-Timing'] = server_timing(profile, total_ms)
+
+        duplicates = profile.duplicates(threshold)
+        for statement, count in duplicates:
+            logger.warning('Possible N+1 on %s %s: statement ran %d times: %s',
+                           request.method, request.full_path, count, ' '.join(statement.split()))
+        if total_ms >= slow_ms and random.random() < sample_rate:
+            slow_logger.info(json.dumps({
+                'time': datetime.now(timezone.utc).isoformat(),
+                'request_id': g.get('request_id'),
+                'method': request.method,
+                'path': request.full_path,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 2),
+                'db_ms': round(profile.query_ms, 2),
+                'queries': len(profile.queries),
+                'render_ms': round(profile.render_ms, 2),
+                'timers': {name: round(duration, 2) for name, (_, duration) in profile.timers.items()},
+                'duplicates': [[' '.join(statement.split()), count] for statement, count in duplicates],
+            }))
+        if panel and response.mimetype == 'text/html' and not response.is_streamed:
+            html = app.jinja_env.get_template('layouts/profile_panel.html').render(
+                profile=profile, total_ms=total_ms, duplicates=dict(duplicates))
+            body = response.get_data(as_text=True)
+            position = body.rfind('</body>')
+            if position != -1:
+                response.set_data(body[:position] + html + body[position:])
+        return response
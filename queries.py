@@ -0,0 +1,307 @@
+"""Read queries behind the listing and detail pages.
+
+Each function returns plain dicts shaped like the data the templates in
+templates/pages expect, and issues a fixed number of SQL statements no
+matter how many rows are involved.
+"""
+import base64
+import hashlib
+from datetime import datetime, timezone
+from itertools import groupby
+
+from models import db, Venue, Artist, Show, Genre, artist_genres, venue_genres
+
+
+_GENRE_LINKS = {
+    Venue: (venue_genres, venue_genres.c.venue_id),
+    Artist: (artist_genres, artist_genres.c.artist_id),
+}
+
+
+def with_genre(query, model, genre):
+    """Restrict ``query`` over ``model`` to rows linked to the genre called ``genre``.
+
+    Resolves through the unique Genre.name index and the (genre_id, owner)
+    index of the link table rather than scanning the owners.
+    """
+    if not genre:
+        return query
+    link_table, owner_column = _GENRE_LINKS[model]
+    return query.join(link_table, owner_column == model.id) \
+        .join(Genre, Genre.id == link_table.c.genre_id) \
+        .filter(Genre.name == genre)
+
+
+def venue_directory_statement(genre=None):
+    """Venues with their upcoming show counts, those of the same area adjacent.
+
+    Reads the counters stored on Venue, so the query never touches Show.
+    ``genre`` keeps only the venues of that genre.
+    """
+    query = db.select(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows'),
+    )
+    return with_genre(query, Venue, genre).order_by(Venue.city, Venue.state, Venue.name, Venue.id)
+
+
+def group_areas(rows):
+    """Fold venue_directory_statement rows into one entry per (city, state)."""
+    areas = []
+    for (city, state), area_rows in groupby(rows, key=lambda row: (row.city, row.state)):
+        areas.append({
+            'city': city,
+            'state': state,
+            'venues': [{
+                'id': row.id,
+                'name': row.name,
+                'num_upcoming_shows': row.num_upcoming_shows,
+            } for row in area_rows],
+        })
+    return areas
+
+
+def venue_directory(genre=None):
+    """Venues grouped by (city, state) with their upcoming show counts, in one query."""
+    return group_areas(db.session.execute(venue_directory_statement(genre)).all())
+
+
+def _show_columns(counterpart, prefix):
+    return (
+        counterpart.id.label(prefix + '_id'),
+        counterpart.name.label(prefix + '_name'),
+        counterpart.image_link.label(prefix + '_image_link'),
+        Show.start_time,
+    )
+
+
+def _show_rows(owner_column, owner_id, counterpart, prefix):
+    """Shows of one venue or artist, joined to the other side of the booking.
+
+    Each row carries whether the show is upcoming and how many shows share
+    that state, both computed by the database.
+    """
+    is_upcoming = (Show.start_time > datetime.now()).label('is_upcoming')
+    return db.session.query(
+        *_show_columns(counterpart, prefix),
+        is_upcoming,
+        db.func.count(Show.id).over(partition_by=is_upcoming).label('state_count'),
+    ).join(counterpart, counterpart.id == getattr(Show, prefix + '_id')) \
+        .filter(owner_column == owner_id) \
+        .order_by(Show.start_time) \
+        .all()
+
+
+def show_rows_statement(owner_column, owner_id, counterpart, prefix, upcoming, now):
+    """The upcoming (or past) shows of one venue or artist, as a statement to run separately."""
+    state = Show.start_time > now if upcoming else Show.start_time <= now
+    return db.select(*_show_columns(counterpart, prefix)) \
+        .join(counterpart, counterpart.id == getattr(Show, prefix + '_id')) \
+        .where(owner_column == owner_id, state) \
+        .order_by(Show.start_time)
+
+
+def _attach_shows(data, rows, prefix):
+    keys = (prefix + '_id', prefix + '_name', prefix + '_image_link')
+    data.update(past_shows=[], upcoming_shows=[], past_shows_count=0, upcoming_shows_count=0)
+    for row in rows:
+        state = 'upcoming' if row.is_upcoming else 'past'
+        show = {key: getattr(row, key) for key in keys}
+        show['start_time'] = row.start_time
+        data[state + '_shows'].append(show)
+        data[state + '_shows_count'] = row.state_count
+    return data
+
+
+def attach_split_shows(data, upcoming_rows, past_rows, prefix):
+    """Like _attach_shows, for shows fetched by two show_rows_statement queries."""
+    keys = (prefix + '_id', prefix + '_name', prefix + '_image_link', 'start_time')
+    for state, rows in (('upcoming', upcoming_rows), ('past', past_rows)):
+        data[state + '_shows'] = [{key: getattr(row, key) for key in keys} for row in rows]
+        data[state + '_shows_count'] = len(rows)
+    return data
+
+
+def venue_data(venue):
+    return {
+        'id': venue.id,
+        'name': venue.name,
+        'genres': [genre.name for genre in venue.genres],
+        'address': venue.address,
+        'city': venue.city,
+        'state': venue.state,
+        'phone': venue.phone,
+        'website': venue.website,
+        'facebook_link': venue.facebook_link,
+        'seeking_talent': venue.seeking_talent,
+        'seeking_description': venue.seeking_description,
+        'image_link': venue.image_link,
+    }
+
+
+def artist_data(artist):
+    return {
+        'id': artist.id,
+        'name': artist.name,
+        'genres': [genre.name for genre in artist.genres],
+        'city': artist.city,
+        'state': artist.state,
+        'phone': artist.phone,
+        'website': artist.website,
+        'facebook_link': artist.facebook_link,
+        'seeking_venue': artist.seeking_venue,
+        'seeking_description': artist.seeking_description,
+        'image_link': artist.image_link,
+    }
+
+
+def venue_detail(venue_id):
+    """The show_venue page payload, or None if there is no such venue.
+
+    Two queries: the venue with its genres, and its shows. The page adds a
+    third, the freshness check of conditional.py.
+    """
+    venue = db.session.get(Venue, venue_id, options=[db.joinedload(Venue.genres)])
+    if venue is None:
+        return None
+    return _attach_shows(venue_data(venue), _show_rows(Show.venue_id, venue_id, Artist, 'artist'), 'artist')
+
+
+def artist_detail(artist_id):
+    """The show_artist page payload in two queries, like venue_detail."""
+    artist = db.session.get(Artist, artist_id, options=[db.joinedload(Artist.genres)])
+    if artist is None:
+        return None
+    return _attach_shows(artist_data(artist), _show_rows(Show.artist_id, artist_id, Venue, 'venue'), 'venue')
+
+
+def _page_validators(model, owner_column, counterpart, counterpart_column, entity_id):
+    """What the detail page of one venue or artist depends on, in one aggregate query.
+
+    Returns ``(etag, last_modified)``, or None if there is no such row. The
+    ETag covers the row, its shows, the counterparts of those shows and the
+    most recent show to have moved from upcoming to past; Last-Modified is
+    the latest of those moments, as an aware UTC datetime.
+    """
+    now = datetime.now()
+    row = db.session.query(
+        model.updated_at,
+        db.func.max(Show.updated_at),
+        db.func.max(counterpart.updated_at),
+        db.func.count(Show.id),
+        db.func.max(db.case((Show.start_time <= now, Show.start_time))),
+    ).outerjoin(Show, owner_column == model.id) \
+        .outerjoin(counterpart, counterpart.id == counterpart_column) \
+        .filter(model.id == entity_id) \
+        .group_by(model.id) \
+        .first()
+    if row is None:
+        return None
+    updated_at, shows_updated_at, counterparts_updated_at, show_count, last_past_show = row
+    moments = [
+        moment.replace(tzinfo=timezone.utc)
+        for moment in (updated_at, shows_updated_at, counterparts_updated_at) if moment is not None
+    ]
+    if last_past_show is not None:
+        # start_time is naive local time, as compared against datetime.now().
+        moments.append(last_past_show.astimezone(timezone.utc))
+    etag = hashlib.sha1(repr((model.__name__, entity_id, tuple(row))).encode()).hexdigest()
+    return etag, max(moments)
+
+
+def venue_validators(venue_id):
+    return _page_validators(Venue, Show.venue_id, Artist, Show.artist_id, venue_id)
+
+
+def artist_validators(artist_id):
+    return _page_validators(Artist, Show.artist_id, Venue, Show.venue_id, artist_id)
+
+
+def artist_list_statement(genre=None):
+    """Artists ordered by name; ``genre`` keeps only the artists of that genre."""
+    return with_genre(db.select(Artist.id, Artist.name), Artist, genre).order_by(Artist.name, Artist.id)
+
+
+def artist_list(genre=None):
+    return [{'id': row.id, 'name': row.name} for row in db.session.execute(artist_list_statement(genre))]
+
+
+def encode_cursor(start_time, show_id):
+    raw = '%s|%d' % (start_time.isoformat(), show_id)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """The (start_time, id) position encoded in a cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        start_time, show_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(start_time), int(show_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def show_page_arguments(args, page_size, max_page_size):
+    """``(limit, cursors)`` for show_page from request arguments, or None for a bad cursor."""
+    limit = max(1, min(args.get('limit', page_size, type=int), max_page_size))
+    cursors = {}
+    for direction in ('after', 'before'):
+        cursor = args.get(direction)
+        if cursor:
+            cursors[direction] = decode_cursor(cursor)
+            if cursors[direction] is None:
+                return None
+    return limit, cursors
+
+
+def show_page(limit, after=None, before=None):
+    """One page of shows in (start_time, id) order, using keyset pagination.
+
+    ``after`` and ``before`` are positions from ``decode_cursor``. Only
+    ``limit + 1`` rows are read: the extra row tells whether another page
+    exists in the direction of travel.
+    """
+    position = db.tuple_(Show.start_time, Show.id)
+    query = db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+    ).join(Venue, Venue.id == Show.venue_id) \
+        .join(Artist, Artist.id == Show.artist_id)
+
+    if before is not None:
+        query = query.filter(position < before).order_by(Show.start_time.desc(), Show.id.desc())
+    else:
+        if after is not None:
+            query = query.filter(position > after)
+        query = query.order_by(Show.start_time, Show.id)
+    rows = query.limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before is not None:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after is not None, has_more
+
+    shows = [{
+        'venue_id': row.venue_id,
+        'venue_name': row.venue_name,
+        'artist_id': row.artist_id,
+        'artist_name': row.artist_name,
+        'artist_image_link': row.artist_image_link,
+        'start_time': row.start_time,
+    } for row in rows]
+    return {
+        'shows': shows,
+        'prev_cursor': encode_cursor(rows[0].start_time, rows[0].id) if rows and has_prev else None,
+        'next_cursor': encode_cursor(rows[-1].start_time, rows[-1].id) if rows and has_next else None,
+    }
@@ -0,0 +1,132 @@
+"""Show scheduling: a venue hosts, and an artist plays, one show at a time.
+
+A show occupies [start_time, end_time). On Postgres the
+``ex_Show_venue_id_overlap`` and ``ex_Show_artist_id_overlap`` exclusion
+constraints (GiST over ``tsrange``) reject overlapping shows from any
+writer. ``book`` also checks every database itself, with one probe per
+owner on the (venue_id, start_time) and (artist_id, start_time) indexes:
+the shows of one venue never overlap, so ordered by start they are also
+ordered by end, and the only one that can clash with a new show is the
+last one starting before the new show ends. That costs O(log n) however
+many shows there are. The new row is flushed before the probe, which on
+SQLite takes the write lock, so two bookings cannot both pass the check.
+
+``Timeline`` keeps the same ordering in memory for batches: the importer
+and the seeder check every row against one, and ``free_slots`` reads the
+gaps between a venue's shows from one.
+"""
+from bisect import bisect_left
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Show
+
+OWNERS = (('venue', Show.venue_id), ('artist', Show.artist_id))
+
+
+class Conflict(Exception):
+    """The show overlaps another show of the same venue or artist."""
+
+    def __init__(self, owner, show_id=None):
+        self.owner = owner
+        self.show_id = show_id
+        if show_id is None:
+            message = 'Overlaps another show of this %s.' % owner
+        else:
+            message = 'Overlaps show %d of this %s.' % (show_id, owner)
+        Exception.__init__(self, message)
+
+
+class Timeline(object):
+    """One venue's or artist's shows as sorted, non-overlapping intervals."""
+
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+        for start, end in intervals:
+            self.add(start, end)
+
+    def clash(self, start, end):
+        """Position of the interval overlapping [start, end), or None."""
+        position = bisect_left(self.starts, end) - 1
+        if position >= 0 and self.ends[position] > start:
+            return position
+        return None
+
+    def add(self, start, end):
+        position = bisect_left(self.starts, start)
+        self.starts.insert(position, start)
+        self.ends.insert(position, end)
+
+    def gaps(self, start, end, length):
+        """The free ranges of at least ``length`` within [start, end), in order."""
+        free = []
+        position = bisect_left(self.starts, start)
+        if position and self.ends[position - 1] > start:
+            start = self.ends[position - 1]
+        for busy_start, busy_end in zip(self.starts[position:], self.ends[position:]):
+            if busy_start >= end:
+                break
+            if busy_start - start >= length:
+                free.append((start, busy_start))
+            start = max(start, busy_end)
+        if end - start >= length:
+            free.append((start, end))
+        return free
+
+
+def _last_before(column, owner_id, time, exclude=None):
+    """The owner's show with the latest start before ``time``."""
+    query = select(Show.id, Show.start_time, Show.end_time).where(column == owner_id, Show.start_time < time)
+    if exclude is not None:
+        query = query.where(Show.id != exclude)
+    return db.session.execute(query.order_by(Show.start_time.desc()).limit(1)).first()
+
+
+def find_conflict(venue_id, artist_id, start_time, end_time, exclude=None):
+    """A Conflict for the first show overlapping [start_time, end_time), or None."""
+    for (owner, column), owner_id in zip(OWNERS, (venue_id, artist_id)):
+        row = _last_before(column, owner_id, end_time, exclude)
+        if row is not None and row.end_time > start_time:
+            return Conflict(owner, row.id)
+    return None
+
+
+def book(venue_id, artist_id, start_time, end_time):
+    """Insert and commit a Show, or raise Conflict if it overlaps another."""
+    if end_time <= start_time:
+        raise ValueError('A show must end after it starts.')
+    show = Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time, end_time=end_time)
+    db.session.add(show)
+    try:
+        db.session.flush()
+    except IntegrityError as error:
+        db.session.rollback()
+        # 23P01 is Postgres' exclusion_violation.
+        if getattr(error.orig, 'pgcode', None) == '23P01':
+            raise Conflict('venue' if 'venue_id' in str(error.orig) else 'artist')
+        raise
+    conflict = find_conflict(venue_id, artist_id, start_time, end_time, exclude=show.id)
+    if conflict is not None:
+        db.session.rollback()
+        raise conflict
+    db.session.commit()
+    return show
+
+
+def free_slots(venue_id, start, end, length):
+    """The free ranges of at least ``length`` at the venue within [start, end).
+
+    Reads the show running at ``start`` and the shows starting in the window,
+    both from the (venue_id, start_time) index.
+    """
+    shows = db.session.execute(
+        select(Show.start_time, Show.end_time)
+        .where(Show.venue_id == venue_id, Show.start_time >= start, Show.start_time < end)
+        .order_by(Show.start_time)
+    ).all()
+    running = _last_before(Show.venue_id, venue_id, start)
+    if running is not None:
+        shows.insert(0, (running.start_time, running.end_time))
+    return Timeline(shows).gaps(start, end, length)
@@ -0,0 +1,167 @@
+"""Case-insensitive partial name search for venues and artists.
+
+On Postgres the search runs as ``ILIKE '%term%'`` backed by the pg_trgm GIN
+indexes on ``name`` and is ranked by ``similarity()``. Other databases (the
+SQLite setup used for development and benchmarks) are served by
+``NGramIndex``, an in-process trigram index checked against the table
+before each search.
+
+Terms need MIN_TERM_LENGTH characters. Results hold the SEARCH_MAX_RESULTS
+best matches, with the upcoming show counters stored on each row, and the
+total number of matches.
+"""
+import heapq
+import re
+import threading
+import time
+from array import array
+
+from flask import current_app
+from sqlalchemy import event, func, or_, select
+
+from models import db, Venue, Artist
+
+_WORD = re.compile(r'[^\W_]+')
+# Shorter terms have no trigram to look up and would rank the whole table.
+MIN_TERM_LENGTH = 3
+# How often NGramIndex checks the table for writes made outside this process.
+REFRESH_SECONDS = 1.0
+
+
+def trigrams(text):
+    """The pg_trgm trigram set of ``text``: words padded with two leading and one trailing blank."""
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """pg_trgm ``similarity()``: shared trigrams over the union of both sets."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+class NGramIndex(object):
+    """Substring index over one model's ``name`` column, held by each process.
+
+    Postings map every raw trigram of a lowercased name to the ids holding it.
+    A term of three characters or more can only match names found in the
+    postings of each of its trigrams, so only the shortest of those postings
+    is checked. Renamed rows leave stale postings behind; they are skipped
+    because the substring check runs against ``names``.
+
+    Before a match the index compares the table's row count, highest id and
+    latest updated_at with the ones it last saw, after this process wrote a
+    row or at most REFRESH_SECONDS after the last check, so rows written by
+    other processes or by Core inserts (``flask import``) are picked up too:
+    rows added or updated since are indexed, and a table that lost rows is
+    indexed again from scratch. Renames are seen through updated_at, which
+    ORM updates bump (models.touch_updated_at).
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()
+        self.names = None
+        self.postings = None
+        self.seen = None
+        self.checked_at = None
+
+    def clear(self):
+        with self.lock:
+            self.names = None
+
+    def changed(self):
+        self.checked_at = None
+
+    def _add_rows(self, rows):
+        names, postings = self.names, self.postings
+        for id, name in rows:
+            name = (name or '').lower()
+            names[id] = name
+            for i in range(len(name) - 2):
+                postings.setdefault(name[i:i + 3], array('l')).append(id)
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.names is not None and self.checked_at is not None and now - self.checked_at < REFRESH_SECONDS:
+            return
+        self.checked_at = now
+        model = self.model
+        state = tuple(db.session.execute(
+            select(func.count(model.id), func.max(model.id), func.max(model.updated_at))).one())
+        if self.names is not None and state == self.seen:
+            return
+        query = select(model.id, model.name)
+        if self.names is not None:
+            count, max_id, updated_at = self.seen
+            changed = model.id > (max_id or 0)
+            if updated_at is not None:
+                changed = or_(changed, model.updated_at >= updated_at)
+            self._add_rows(db.session.execute(query.where(changed)))
+            if len(self.names) == state[0]:
+                self.seen = state
+                return
+        self.names, self.postings = {}, {}
+        self._add_rows(db.session.execute(query.execution_options(yield_per=10000)))
+        self.seen = state
+
+    def match(self, term, limit):
+        """How many names contain ``term`` (ignoring case), and the ids of the ``limit`` most similar."""
+        with self.lock:
+            self._refresh()
+            names, postings = self.names, self.postings
+            term = term.lower()
+            shortest = min((postings.get(term[i:i + 3], ()) for i in range(len(term) - 2)), key=len)
+            ids = {id for id in shortest if term in names.get(id, '')}
+            best = heapq.nsmallest(limit, ids, key=lambda id: (-similarity(names[id], term), names[id]))
+            return len(ids), best
+
+
+_indexes = {Venue: NGramIndex(Venue), Artist: NGramIndex(Artist)}
+
+for _model, _index in _indexes.items():
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, lambda *args, index=_index: index.changed())
+    # Recreated tables (benchmarks, tests) start from an empty index.
+    event.listen(_model.__table__, 'after_create', lambda *args, index=_index, **kwargs: index.clear())
+
+
+def _search(model, term):
+    term = (term or '').strip()
+    if len(term) < MIN_TERM_LENGTH:
+        return {'count': 0, 'data': []}
+    limit = current_app.config['SEARCH_MAX_RESULTS']
+    query = db.session.query(model.id, model.name, model.upcoming_shows_count.label('num_upcoming_shows'))
+    if db.engine.dialect.name == 'postgresql':
+        escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        matches = model.name.ilike('%' + escaped + '%')
+        rows = query.filter(matches) \
+            .order_by(db.func.similarity(model.name, term).desc(), model.name) \
+            .limit(limit) \
+            .all()
+        count = len(rows) if len(rows) < limit else db.session.scalar(select(func.count(model.id)).where(matches))
+    else:
+        count, ids = _indexes[model].match(term, limit)
+        order = {id: position for position, id in enumerate(ids)}
+        rows = sorted(query.filter(model.id.in_(ids)), key=lambda row: order[row.id]) if ids else []
+    return {
+        'count': count,
+        'data': [{
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.num_upcoming_shows,
+        } for row in rows],
+    }
+
+
+def search_venues(term):
+    return _search(Venue, term)
+
+
+def search_artists(term):
+    return _search(Artist, term)
@@ -0,0 +1,186 @@
+"""Synthetic data for development and load tests: ``flask seed``.
+
+Rows are skewed the way real listings are: a few hot venues host most of
+the shows and a few prolific artists play most of them (Zipf-like weights),
+cities and genres have uneven popularity, and shows are mostly in the past
+with a shorter run of upcoming evenings. No two shows of one venue or one
+artist overlap; once a hot venue's evenings are full, draws go elsewhere.
+Rows go through the bulk insert path of ``flask import``, one transaction
+per chunk.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+import cache
+import scheduling
+from forms import GENRES
+from importer import Importer, chunked
+from models import db, Venue, Artist, Show
+
+CITIES = [
+    ('New York', 'NY', 30), ('Los Angeles', 'CA', 20), ('Chicago', 'IL', 14),
+    ('Austin', 'TX', 12), ('Nashville', 'TN', 10), ('San Francisco', 'CA', 10),
+    ('Seattle', 'WA', 8), ('New Orleans', 'LA', 8), ('Denver', 'CO', 6),
+    ('Portland', 'OR', 5), ('Boston', 'MA', 5), ('Atlanta', 'GA', 4),
+    ('Minneapolis', 'MN', 3), ('Detroit', 'MI', 3), ('Asheville', 'NC', 1),
+]
+POPULAR_GENRES = {'Rock n Roll': 12, 'Jazz': 10, 'Pop': 10, 'Hip-Hop': 8, 'Electronic': 8,
+                  'Folk': 6, 'Alternative': 6, 'Blues': 5, 'R&B': 5, 'Country': 4}
+VENUE_WORDS = (['The', 'Old', 'Blue', 'Golden', 'Velvet', 'Red', 'Silver', 'Electric'],
+               ['Musical', 'Dueling', 'Lantern', 'Anchor', 'Owl', 'Fox', 'Crown', 'Harbor'],
+               ['Hop', 'Hall', 'Room', 'Lounge', 'Ballroom', 'Tavern', 'Theatre', 'Club'])
+ARTIST_WORDS = (['Guns', 'Matt', 'The Wild', 'Midnight', 'Sabrina', 'Neon', 'Paper', 'Quiet'],
+                ['N', 'Quevado', 'Sax', 'Echo', 'Static', 'Hollow', 'Velvet', 'River'],
+                ['Petals', 'Band', 'Trio', 'Collective', 'Kings', 'Project', 'Sisters', 'Orchestra'])
+
+# Draws in a row that may clash with booked shows before giving up.
+MAX_MISSES = 10000
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights for ``count`` items where rank r has weight 1 / r**exponent."""
+    return list(accumulate(1.0 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class Generator(object):
+    """Draws venue, artist and show rows from one seeded random source."""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.cities = CITIES
+        self.city_weights = list(accumulate(weight for _, _, weight in CITIES))
+        self.genres = sorted(GENRES)
+        self.genre_weights = list(accumulate(POPULAR_GENRES.get(name, 1) for name in self.genres))
+
+    def _name(self, words, number):
+        return '%s %s %s %d' % tuple([self.rng.choice(part) for part in words] + [number])
+
+    def _place(self):
+        city, state, _ = self.rng.choices(self.cities, cum_weights=self.city_weights)[0]
+        return city, state
+
+    def _genres(self):
+        count = self.rng.choice((1, 1, 2, 2, 3))
+        return list(dict.fromkeys(self.rng.choices(self.genres, cum_weights=self.genre_weights, k=count)))
+
+    def _phone(self):
+        return '%03d-%03d-%04d' % (self.rng.randint(200, 999), self.rng.randint(200, 999), self.rng.randint(0, 9999))
+
+    def venue(self, number):
+        city, state = self._place()
+        seeking_talent = self.rng.random() < 0.3
+        return {
+            'name': self._name(VENUE_WORDS, number),
+            'city': city,
+            'state': state,
+            'address': '%d %s Street' % (self.rng.randint(1, 2000), self.rng.choice(VENUE_WORDS[1])),
+            'phone': self._phone(),
+            'image_link': None,
+            'facebook_link': 'https://www.facebook.com/venue%d' % number,
+            'website': 'https://venue%d.example.com' % number,
+            'seeking_talent': seeking_talent,
+            'seeking_description': 'Looking for local acts on weekends.' if seeking_talent else None,
+        }, self._genres()
+
+    def artist(self, number):
+        city, state = self._place()
+        seeking_venue = self.rng.random() < 0.4
+        return {
+            'name': self._name(ARTIST_WORDS, number),
+            'city': city,
+            'state': state,
+            'phone': self._phone(),
+            'image_link': None,
+            'facebook_link': 'https://www.facebook.com/artist%d' % number,
+            'website': None,
+            'seeking_venue': seeking_venue,
+            'seeking_description': 'Touring next season.' if seeking_venue else None,
+        }, self._genres()
+
+    def shows(self, count, venue_ids, artist_ids, now=None, timelines=None):
+        """``count`` show rows over the given ids, hot ranks drawn first in shuffled order.
+
+        ``timelines`` maps ('venue_id' or 'artist_id', id) to the
+        scheduling.Timeline of the shows already booked there.
+        """
+        now = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+        venue_ids, artist_ids = list(venue_ids), list(artist_ids)
+        # Which rows are hot is random, not simply the lowest ids.
+        self.rng.shuffle(venue_ids)
+        self.rng.shuffle(artist_ids)
+        venue_weights = zipf_weights(len(venue_ids), 1.1)
+        artist_weights = zipf_weights(len(artist_ids), 0.9)
+        timelines = {} if timelines is None else timelines
+        made = misses = 0
+        while made < count:
+            if misses == MAX_MISSES:
+                raise ValueError('No free evening left after %d shows; add venues or artists.' % made)
+            # Two years of history, six months of upcoming shows, in the evening.
+            day = self.rng.randint(-730, -1) if self.rng.random() < 0.7 else self.rng.randint(0, 180)
+            start_time = now + timedelta(days=day)
+            start_time = start_time.replace(hour=self.rng.randint(18, 23), minute=self.rng.choice((0, 15, 30, 45)))
+            end_time = start_time + timedelta(minutes=self.rng.choice((90, 120, 150, 180)))
+            values = {
+                'venue_id': self.rng.choices(venue_ids, cum_weights=venue_weights)[0],
+                'artist_id': self.rng.choices(artist_ids, cum_weights=artist_weights)[0],
+                'start_time': start_time,
+                'end_time': end_time,
+            }
+            lines = [timelines.setdefault((column, values[column]), scheduling.Timeline())
+                     for column in ('venue_id', 'artist_id')]
+            if any(line.clash(start_time, end_time) is not None for line in lines):
+                misses += 1
+                continue
+            for line in lines:
+                line.add(start_time, end_time)
+            made += 1
+            misses = 0
+            yield values, []
+
+
+@click.command('seed')
+@click.option('--venues', default=0, show_default=True, help='Venues to add.')
+@click.option('--artists', default=0, show_default=True, help='Artists to add.')
+@click.option('--shows', default=0, show_default=True,
+              help='Shows to add, spread over every venue and artist in the database.')
+@click.option('--seed', 'seed', type=int, help='Random seed, for repeatable data sets.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows per transaction.')
+@with_appcontext
+def seed_command(venues, artists, shows, seed, chunk_size):
+    """Fill the database with realistic synthetic venues, artists and shows."""
+    generator = Generator(seed)
+    start = time.perf_counter()
+    first_venue = (db.session.scalar(select(db.func.max(Venue.id))) or 0) + 1
+    first_artist = (db.session.scalar(select(db.func.max(Artist.id))) or 0) + 1
+    for kind, count, make, first in (('venues', venues, generator.venue, first_venue),
+                                     ('artists', artists, generator.artist, first_artist)):
+        if count:
+            importer = Importer(kind)
+            for chunk in chunked((make(number) for number in range(first, first + count)), chunk_size):
+                importer.write(chunk)
+            click.echo('%s: %d inserted' % (kind, importer.inserted))
+    if shows:
+        venue_ids = db.session.scalars(select(Venue.id)).all()
+        artist_ids = db.session.scalars(select(Artist.id)).all()
+        if not venue_ids or not artist_ids:
+            raise click.UsageError('Shows need at least one venue and one artist.')
+        timelines = {}
+        booked = select(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time).order_by(Show.start_time)
+        for venue_id, artist_id, start_time, end_time in db.session.execute(booked):
+            for key in (('venue_id', venue_id), ('artist_id', artist_id)):
+                timelines.setdefault(key, scheduling.Timeline()).add(start_time, end_time)
+        importer = Importer('shows')
+        try:
+            for chunk in chunked(generator.shows(shows, venue_ids, artist_ids, timelines=timelines), chunk_size):
+                importer.write(chunk)
+        except ValueError as error:
+            raise click.ClickException('%s (%d shows inserted)' % (error, importer.inserted))
+        click.echo('shows: %d inserted' % importer.inserted)
+    cache.clear()
+    click.echo('Seeded in %.2fs' % (time.perf_counter() - start))
@@ -0,0 +1,59 @@
+"""Show pages: the paginated listing and the create form."""
+from datetime import timedelta
+
+from flask import Blueprint, Response, abort, current_app, flash, render_template, request, stream_template
+
+import cache
+import queries
+import scheduling
+from forms import ShowForm
+from models import db
+
+shows = Blueprint('shows', __name__, url_prefix='/shows')
+
+
+@shows.route('')
+@cache.cached_page('shows')
+def index():
+    # displays one page of shows at /shows, ?after=<cursor> or ?before=<cursor>
+    # moves between pages and ?stream=1 streams the rendered page
+    config = current_app.config
+    arguments = queries.show_page_arguments(request.args, config['SHOWS_PAGE_SIZE'], config['SHOWS_MAX_PAGE_SIZE'])
+    if arguments is None:
+        abort(400)
+    limit, cursors = arguments
+    page = queries.show_page(limit, **cursors)
+    if request.args.get('stream', config['SHOWS_STREAM'], type=lambda value: value == '1'):
+        # stream_template keeps the request context alive while the body is sent
+        return Response(stream_template('pages/shows.html', limit=limit, **page))
+    return render_template('pages/shows.html', limit=limit, **page)
+
+
+@shows.route('/create')
+def create_form():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@shows.route('/create', methods=['POST'])
+def create_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    form = ShowForm(request.form)
+    start_time = form.start_time.data
+    end_time = form.end_time.data
+    try:
+        if start_time is None:
+            raise ValueError('Start time is not a valid date and time.')
+        end_time = end_time or start_time + timedelta(minutes=current_app.config['SHOW_DEFAULT_MINUTES'])
+        scheduling.book(int(form.venue_id.data), int(form.artist_id.data), start_time, end_time)
+        flash('Show was successfully listed!')
+    except scheduling.Conflict as conflict:
+        flash('Show could not be listed. %s' % conflict)
+    except Exception:
+        db.session.rollback()
+        flash('An error occurred. Show could not be listed.')
+        current_app.logger.exception('Error adding show')
+    finally:
+        db.session.close()
+    return render_template('pages/home.html')
@@ -0,0 +1,102 @@
+"""Fixtures for the test suite.
+
+Tests run against an in-memory SQLite database with the page cache, the
+Jinja bytecode cache and profiling off; the app is built once and every
+test starts from empty tables:
+
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+SCRATCH = tempfile.mkdtemp(prefix='fyyur-tests-')
+os.environ.update(
+    DATABASE_URL='sqlite://',
+    CACHE_BACKEND='none',
+    TEMPLATE_CACHE_DIR='',
+    IMAGE_CACHE_DIR=os.path.join(SCRATCH, 'images'),
+    LOG_FILE=os.path.join(SCRATCH, 'error.log'),
+    PROFILING='',
+)
+
+from sqlalchemy import event
+
+from app import create_app
+from models import db, Venue, Artist, Show
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return app
+
+
+@pytest.fixture(autouse=True)
+def database(app):
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def count_queries(app):
+    """A context manager collecting the SQL statements sent inside its block."""
+    @contextmanager
+    def count_queries():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, params, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return count_queries
+
+
+def add_venue(**fields):
+    fields.setdefault('name', 'The Musical Hop')
+    fields.setdefault('city', 'San Francisco')
+    fields.setdefault('state', 'CA')
+    fields.setdefault('address', '1015 Folsom Street')
+    venue = Venue(**fields)
+    db.session.add(venue)
+    db.session.commit()
+    return venue
+
+
+def add_artist(**fields):
+    fields.setdefault('name', 'Guns N Petals')
+    fields.setdefault('city', 'San Francisco')
+    fields.setdefault('state', 'CA')
+    artist = Artist(**fields)
+    db.session.add(artist)
+    db.session.commit()
+    return artist
+
+
+def add_shows(venue, artist, hours):
+    """One-hour shows of ``artist`` at ``venue``, starting ``hours`` from now."""
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    for hour in hours:
+        start_time = now + timedelta(hours=hour)
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id,
+                            start_time=start_time, end_time=start_time + timedelta(hours=1)))
+    db.session.commit()
@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+import aio
+import config
+import venues
+from conftest import add_venue, add_artist, add_shows
+from app import create_app
+from models import db
+
+
+@pytest.fixture
+def async_app(tmp_path):
+    """An ASYNC_MODE app on a SQLite file, which the async engine can share."""
+    url = 'sqlite:///%s' % (tmp_path / 'fyyur.db')
+    app = create_app(type('Config', (), dict(vars(config), ASYNC_MODE=True, SQLALCHEMY_DATABASE_URI=url)))
+    with app.app_context():
+        db.create_all()
+        venue, artist = add_venue(name='Async Hall'), add_artist()
+        add_shows(venue, artist, [-24, 24])
+        db.session.remove()
+    yield app
+    aio._loop.call_soon_threadsafe(aio._loop.stop)
+
+
+def test_async_views_render_on_the_request_thread(async_app, monkeypatch):
+    threads = {}
+    render_template = venues.render_template
+    all_rows = aio._all
+
+    def recording_render(*args, **kwargs):
+        threads['render'] = threading.current_thread()
+        return render_template(*args, **kwargs)
+
+    async def recording_all(statement):
+        threads['query'] = threading.current_thread()
+        return await all_rows(statement)
+
+    monkeypatch.setattr(venues, 'render_template', recording_render)
+    monkeypatch.setattr(aio, '_all', recording_all)
+    response = async_app.test_client().get('/venues/1')
+    assert response.status_code == 200
+    assert 'Async Hall' in response.get_data(as_text=True)
+    assert threads['render'] is threading.current_thread()
+    assert threads['query'].name == 'aio-db'
+
+
+def test_the_request_loop_is_reused(async_app):
+    client = async_app.test_client()
+    client.get('/venues')
+    loop = aio._local.loop
+    assert client.get('/venues').status_code == 200
+    assert aio._local.loop is loop
@@ -0,0 +1,42 @@
+import gzip
+import json
+
+import pytest
+
+import api
+from conftest import add_venue
+
+
+@pytest.fixture
+def venues():
+    # Enough for a body over COMPRESS_MIN_SIZE.
+    for i in range(40):
+        add_venue(name='Venue %d' % i)
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip', 'gzip'),
+    ('br, gzip', 'gzip'),
+    ('br;q=1.0, gzip;q=0.5', 'gzip'),
+    ('*', 'gzip'),
+    ('br', None),
+    ('identity', None),
+])
+def test_without_brotli_falls_through_to_gzip(client, venues, monkeypatch, accept, expected):
+    monkeypatch.setattr(api, 'brotli', None)
+    response = client.get('/api/v1/venues', headers={'Accept-Encoding': accept})
+    assert response.headers.get('Content-Encoding') == expected
+    body = gzip.decompress(response.data) if expected == 'gzip' else response.data
+    assert len(json.loads(body)['data'][0]['venues']) == 40
+
+
+def test_brotli_is_preferred_when_available(client, venues):
+    brotli = pytest.importorskip('brotli')
+    response = client.get('/api/v1/venues', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.data))['data']
+
+
+def test_gzip_is_not_used_when_refused(client, venues):
+    response = client.get('/api/v1/venues', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def run(*args):
+    return subprocess.run([sys.executable] + list(args), cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT),
+                          capture_output=True, text=True, check=True).stdout
+
+
+def test_servers_do_not_import_flask_migrate():
+    output = run('-c', 'import sys, app; a = app.create_app(); print("flask_migrate" in sys.modules, "migrate" in a.extensions)')
+    assert output.split() == ['False', 'False']
+
+
+def test_the_flask_command_registers_migrate():
+    assert 'upgrade' in run('-m', 'flask', '--app', 'app', 'db', '--help')
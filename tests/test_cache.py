@@ -0,0 +1,33 @@
+import importlib
+
+import pytest
+
+import config
+
+
+@pytest.fixture
+def backend_for(monkeypatch):
+    """CACHE_BACKEND as config.py works it out from the given environment."""
+    def backend_for(**environ):
+        for name in ('CACHE_BACKEND', 'CACHE_REDIS_URL', 'WEB_CONCURRENCY'):
+            monkeypatch.delenv(name, raising=False)
+        for name, value in environ.items():
+            monkeypatch.setenv(name, value)
+        return importlib.reload(config).CACHE_BACKEND
+    yield backend_for
+    monkeypatch.undo()
+    importlib.reload(config)
+
+
+def test_one_process_defaults_to_the_local_cache(backend_for):
+    assert backend_for() == 'lru'
+    assert backend_for(WEB_CONCURRENCY='1') == 'lru'
+
+
+def test_several_workers_default_to_the_shared_cache(backend_for):
+    assert backend_for(WEB_CONCURRENCY='4') == 'redis'
+    assert backend_for(CACHE_REDIS_URL='redis://cache:6379/0') == 'redis'
+
+
+def test_the_setting_wins(backend_for):
+    assert backend_for(WEB_CONCURRENCY='4', CACHE_BACKEND='lru') == 'lru'
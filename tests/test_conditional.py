@@ -0,0 +1,91 @@
+from datetime import datetime, timezone
+
+import pytest
+from jinja2 import ChoiceLoader, DictLoader
+
+import assets
+import conditional
+from conftest import add_venue, add_artist, add_shows
+from models import db
+
+PAGES = ('/venues/1', '/artists/1', '/api/v1/venues/1', '/api/v1/artists/1')
+
+
+@pytest.fixture
+def booked():
+    venue, artist = add_venue(), add_artist()
+    add_shows(venue, artist, [-24, 24])
+    return venue, artist
+
+
+@pytest.fixture
+def redeploy(app):
+    """Call to recompute the release after changing templates or assets."""
+    saved = app.extensions['release'], app.jinja_env.loader, dict(assets.manifest)
+    yield lambda: conditional.init_conditional(app)
+    app.extensions['release'], app.jinja_env.loader = saved[:2]
+    assets.manifest.clear()
+    assets.manifest.update(saved[2])
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_matching_etag_is_answered_with_304(client, booked, count_queries, page):
+    etag = client.get(page).headers['ETag']
+    db.session.remove()
+    with count_queries() as statements:
+        response = client.get(page, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert len(statements) == 1
+    assert response.headers['ETag'] == etag
+
+
+def test_if_modified_since_is_answered_with_304(client, booked):
+    last_modified = client.get('/venues/1').headers['Last-Modified']
+    response = client.get('/venues/1', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+
+def test_a_write_changes_the_etag(client, booked):
+    venue, _ = booked
+    etag = client.get('/venues/1').headers['ETag']
+    venue.phone = '123-123-1234'
+    db.session.commit()
+    response = client.get('/venues/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_a_template_change_invalidates_the_etag(app, client, booked, redeploy):
+    etag = client.get('/venues/1').headers['ETag']
+    assert client.get('/venues/1', headers={'If-None-Match': etag}).status_code == 304
+    app.jinja_env.loader = ChoiceLoader([
+        DictLoader({'pages/show_venue.html': '{{ venue.name }} (new layout)'}), app.jinja_env.loader])
+    redeploy()
+    response = client.get('/venues/1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'new layout' in response.get_data(as_text=True)
+
+
+def test_an_asset_build_invalidates_the_etag(client, booked, redeploy):
+    etag = client.get('/venues/1').headers['ETag']
+    assets.manifest['css/site.css'] = 'dist/css/site.0123456789ab.css'
+    redeploy()
+    assert client.get('/venues/1', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_last_modified_is_no_older_than_the_release(app, client, booked, redeploy):
+    redeploy()
+    version, _ = app.extensions['release']
+    app.extensions['release'] = version, datetime(2100, 1, 1, tzinfo=timezone.utc)
+    response = client.get('/venues/1')
+    assert response.last_modified == datetime(2100, 1, 1, tzinfo=timezone.utc)
+
+
+def test_release_setting_names_the_version(app, client, booked, redeploy):
+    app.config['RELEASE'] = 'v42'
+    try:
+        redeploy()
+    finally:
+        app.config['RELEASE'] = ''
+    assert client.get('/venues/1').headers['ETag'].startswith('W/"v42-')
@@ -0,0 +1,37 @@
+import pytest
+
+from conftest import add_venue, add_artist, add_shows
+
+# Freshness validators, the venue or artist with its genres, its shows.
+EXPECTED_QUERIES = 3
+PAGES = ('/venues/1', '/artists/1')
+
+
+@pytest.mark.parametrize('page', PAGES)
+@pytest.mark.parametrize('shows', [0, 1, 50])
+def test_statement_count_does_not_grow_with_shows(client, database, count_queries, page, shows):
+    venue, artist = add_venue(), add_artist()
+    add_shows(venue, artist, range(-shows // 2, shows - shows // 2))
+    database.session.remove()
+    with count_queries() as statements:
+        response = client.get(page)
+    assert response.status_code == 200
+    assert len(statements) == EXPECTED_QUERIES, statements
+
+
+@pytest.mark.parametrize('page', PAGES)
+def test_unknown_id_is_404(client, page):
+    assert client.get(page).status_code == 404
+
+
+def test_shows_are_split_into_upcoming_and_past(client):
+    venue = add_venue(name='The Dueling Pianos Bar')
+    artist = add_artist(name='Matt Quevado')
+    add_shows(venue, artist, [-48, -24, 24])
+    page = client.get('/venues/%d' % venue.id).get_data(as_text=True)
+    assert '1 Upcoming Show' in page
+    assert '2 Past Shows' in page
+    assert 'Matt Quevado' in page
+    page = client.get('/artists/%d' % artist.id).get_data(as_text=True)
+    assert '1 Upcoming Show' in page
+    assert 'The Dueling Pianos Bar' in page
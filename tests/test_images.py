@@ -0,0 +1,167 @@
+import http.server
+import io
+import ipaddress
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import images
+from conftest import ROOT, add_venue, add_artist
+from models import db, Venue
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def photo(color, size=(1600, 1200)):
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, 'JPEG')
+    return out.getvalue()
+
+
+class Stub(http.server.ThreadingHTTPServer):
+    """A local image host; ``routes`` maps a path to (status, headers, body)."""
+
+    def __init__(self, host='127.0.0.1'):
+        self.routes, self.fetches = {}, []
+        http.server.ThreadingHTTPServer.__init__(self, (host, 0), StubHandler)
+        self.base = 'http://%s:%d' % (host, self.server_port)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.fetches.append(self.path)
+        status, headers, body = self.server.routes.get(self.path, (404, {}, b''))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = Stub()
+    server.routes['/hop.jpg'] = (200, {'Content-Type': 'image/jpeg'}, photo('red'))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMAGE_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(images, '_written', {'bytes': None})
+    return tmp_path
+
+
+@pytest.fixture
+def private_hosts(app, monkeypatch):
+    """Allow fetches from the stub, which listens on a loopback address."""
+    monkeypatch.setitem(app.config, 'IMAGE_FETCH_ALLOW_PRIVATE', True)
+
+
+def thumbnail_url(app, kind, record, size='tile'):
+    with app.test_request_context():
+        return images.image_url(kind, record.id, record.image_link, size)
+
+
+def cached_files(directory):
+    return sorted(name for _, _, names in os.walk(directory) for name in names if not name.endswith('.txt'))
+
+
+def test_an_image_is_fetched_once_then_served_from_disk(app, client, stub, cache_dir, private_hosts):
+    url = thumbnail_url(app, 'venue', add_venue(image_link=stub.base + '/hop.jpg'))
+    for _ in range(3):
+        response = client.get(url, headers={'Accept': 'image/*'})
+        assert response.status_code == 200
+        assert response.mimetype == 'image/jpeg'
+        assert response.headers['Cache-Control'] == images.IMMUTABLE
+        assert 'Accept' in response.headers['Vary']
+        assert Image.open(io.BytesIO(response.data)).size == (533, 400)
+        response.close()
+    assert stub.fetches == ['/hop.jpg']
+
+
+def test_a_broken_link_is_fetched_once(app, client, stub, cache_dir, private_hosts):
+    url = thumbnail_url(app, 'venue', add_venue(image_link=stub.base + '/missing.jpg'))
+    assert client.get(url).status_code == 404
+    assert client.get(url).status_code == 404
+    assert stub.fetches == ['/missing.jpg']
+
+
+def test_a_stale_version_redirects_to_the_current_one(app, client, stub, cache_dir, private_hosts):
+    venue = add_venue(image_link=stub.base + '/old.jpg')
+    stale = thumbnail_url(app, 'venue', venue, 'large')
+    venue.image_link = stub.base + '/hop.jpg'
+    db.session.commit()
+    response = client.get(stale)
+    assert response.status_code == 302
+    assert response.location.endswith(thumbnail_url(app, 'venue', db.session.get(Venue, venue.id), 'large'))
+    assert stub.fetches == []
+
+
+def test_the_least_recently_used_images_are_evicted(app, client, stub, cache_dir, private_hosts, monkeypatch):
+    stub.routes['/petals.jpg'] = (200, {'Content-Type': 'image/jpeg'}, photo('blue'))
+    first = thumbnail_url(app, 'venue', add_venue(image_link=stub.base + '/hop.jpg'))
+    client.get(first).close()
+    size = sum(os.path.getsize(os.path.join(parent, name)) for parent, _, names in os.walk(cache_dir) for name in names)
+    old = cached_files(cache_dir)
+    for parent, _, names in os.walk(cache_dir):
+        for name in names:
+            os.utime(os.path.join(parent, name), (1, 1))
+    monkeypatch.setitem(app.config, 'IMAGE_CACHE_MAX_BYTES', int(size * 1.5))
+    second = thumbnail_url(app, 'artist', add_artist(image_link=stub.base + '/petals.jpg'))
+    assert client.get(second).status_code == 200
+    left = cached_files(cache_dir)
+    assert len(left) == 1 and left != old
+
+
+@pytest.mark.parametrize('host', [
+    '127.0.0.1', '10.0.0.8', '192.168.1.1', '169.254.169.254', '[::1]', '[fe80::1]', '0.0.0.0', '224.0.0.1'])
+def test_sources_at_non_public_addresses_are_refused(app, host):
+    with app.app_context(), pytest.raises(ValueError, match='not a public address'):
+        images.fetch('http://%s/latest/meta-data/' % host)
+
+
+def test_a_refused_source_is_never_requested(app, client, stub, cache_dir):
+    url = thumbnail_url(app, 'venue', add_venue(image_link=stub.base + '/hop.jpg'))
+    assert client.get(url).status_code == 404
+    assert stub.fetches == []
+
+
+def test_redirects_to_non_public_addresses_are_refused(app, client, stub, cache_dir, monkeypatch):
+    # Pretend 127.0.0.2 is a public host that redirects into the network.
+    public = Stub('127.0.0.2')
+    public.routes['/hop.jpg'] = (302, {'Location': stub.base + '/hop.jpg'}, b'')
+    monkeypatch.setattr(images, 'is_public', lambda address: address == ipaddress.ip_address('127.0.0.2'))
+    try:
+        url = thumbnail_url(app, 'venue', add_venue(image_link=public.base + '/hop.jpg'))
+        assert client.get(url).status_code == 404
+    finally:
+        public.shutdown()
+        public.server_close()
+    assert public.fetches == ['/hop.jpg']
+    assert stub.fetches == []
+
+
+def test_other_schemes_are_refused(app):
+    with app.app_context():
+        for url in ('file:///etc/passwd', 'ftp://example.com/a.jpg'):
+            with pytest.raises(ValueError):
+                images.fetch(url)
+
+
+def test_pillow_is_not_imported_with_the_app():
+    code = 'import sys, app; app.create_app(); print("PIL" in sys.modules)'
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip().endswith('False')
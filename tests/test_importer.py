@@ -0,0 +1,80 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import queries
+from conftest import add_venue, add_artist
+from models import db, Show
+
+
+@pytest.fixture
+def import_shows(app, tmp_path):
+    """Run ``flask import shows`` on the given rows; returns the click result."""
+    add_venue(), add_artist()
+
+    def import_shows(*rows):
+        source = tmp_path / 'shows.jsonl'
+        source.write_text(''.join(json.dumps(dict(row, venue_id=1, artist_id=1)) + '\n' for row in rows))
+        return app.test_cli_runner().invoke(args=['import', 'shows', str(source)])
+    return import_shows
+
+
+@pytest.fixture
+def local_zone(monkeypatch):
+    """Run in UTC-5 (no daylight saving), so local and UTC times differ."""
+    monkeypatch.setenv('TZ', 'America/Bogota')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_utc_times_are_stored_as_local_time(import_shows, local_zone):
+    result = import_shows({'start_time': '2035-04-01T20:00:00.000Z'})
+    assert result.exit_code == 0, result.output
+    assert '1 inserted' in result.output
+    assert db.session.scalars(db.select(Show.start_time)).all() == [datetime(2035, 4, 1, 15)]
+
+
+def test_offsets_are_converted_to_local_time(import_shows, local_zone):
+    result = import_shows({'start_time': '2035-04-01T10:00:00', 'end_time': '2035-04-01T19:00:00+02:00'})
+    assert result.exit_code == 0, result.output
+    show = db.session.scalars(db.select(Show)).one()
+    assert (show.start_time, show.end_time) == (datetime(2035, 4, 1, 10), datetime(2035, 4, 1, 12))
+
+
+def test_aware_rows_are_checked_against_naive_ones(import_shows, local_zone):
+    import_shows({'start_time': '2035-04-01T20:00:00', 'end_time': '2035-04-01T22:00:00'})
+    result = import_shows({'start_time': '2035-04-02T01:30:00Z'})
+    assert result.exit_code == 0, result.output
+    assert '1 rejected' in result.output
+
+
+def test_a_show_an_hour_ago_in_utc_is_past(import_shows, local_zone):
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    import_shows({'start_time': start.isoformat()})
+    venue = queries.venue_detail(1)
+    assert (venue['past_shows_count'], venue['upcoming_shows_count']) == (1, 0)
+
+
+def test_a_number_for_a_time_is_rejected(import_shows):
+    result = import_shows({'start_time': 1900000000})
+    assert result.exit_code == 0, result.output
+    assert '1 rejected' in result.output
+
+
+def test_unreadable_lines_are_rejected(app, tmp_path):
+    venue = json.dumps({'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+                        'address': '1015 Folsom Street', 'genres': ['Jazz']})
+    source, rejects = tmp_path / 'venues.jsonl', tmp_path / 'rejects.jsonl'
+    source.write_text('\n'.join([venue, '{"name": "Park Square', '[1, 2]', '"Bar"', venue]) + '\n')
+    result = app.test_cli_runner().invoke(
+        args=['import', 'venues', str(source), '--chunk-size', '2', '--rejects', str(rejects)])
+    assert result.exit_code == 0, result.output
+    assert '5 rows read, 2 inserted, 3 rejected' in result.output
+    rejected = [json.loads(line) for line in rejects.read_text().splitlines()]
+    assert [entry['row'] for entry in rejected] == ['{"name": "Park Square', [1, 2], 'Bar']
+    assert rejected[0]['errors'][0].startswith('line 2: Not valid JSON: ')
+    assert [entry['errors'] for entry in rejected[1:]] == [['Not a JSON object.'], ['Not a JSON object.']]
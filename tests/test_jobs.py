@@ -0,0 +1,127 @@
+import json
+import threading
+
+import pytest
+
+import jobs
+import metrics
+from conftest import add_venue, add_artist
+from models import db, Venue, Job, DeadJob
+
+VENUE_FORM = {'name': 'The Dueling Pianos Bar', 'city': 'New York', 'state': 'NY',
+              'address': '335 Delancey Street', 'phone': '914-003-1132', 'genres': ['Jazz', 'Folk'],
+              'image_link': 'https://example.com/bar.jpg', 'facebook_link': 'https://www.facebook.com/bar'}
+ARTIST_FORM = {'name': 'Matt Quevedo', 'city': 'New York', 'state': 'NY', 'genres': ['Jazz'],
+               'image_link': 'https://example.com/matt.jpg', 'facebook_link': 'https://www.facebook.com/matt'}
+
+
+def queued_checks():
+    return [json.loads(job.payload) for job in db.session.scalars(
+        db.select(Job).where(Job.name == 'check-image-link').order_by(Job.id))]
+
+
+def run_jobs():
+    return jobs.work(threading.Event(), burst=True)
+
+
+@pytest.fixture
+def image_check(monkeypatch):
+    """Replace the HTTP check: set ``.error`` to the exception it should raise."""
+    class Check(object):
+        error = None
+
+        def __call__(self, kind, id, url):
+            if self.error is not None:
+                raise self.error
+    check = Check()
+    monkeypatch.setattr(jobs, '_check_image', check)
+    return check
+
+
+def test_creating_a_venue_queues_its_image_check(client):
+    client.post('/venues/create', data=VENUE_FORM)
+    venue = db.session.scalars(db.select(Venue)).one()
+    assert (venue.name, venue.website, [genre.name for genre in venue.genres]) == (
+        'The Dueling Pianos Bar', None, ['Folk', 'Jazz'])
+    assert queued_checks() == [{'kind': 'venue', 'id': venue.id}]
+
+
+@pytest.mark.parametrize('kind, add, form', [
+    ('venue', add_venue, VENUE_FORM),
+    ('artist', add_artist, ARTIST_FORM),
+])
+def test_editing_the_image_link_queues_a_check(client, kind, add, form):
+    entity = add(image_link=form['image_link'], image_link_ok=False)
+    model, id = type(entity), entity.id
+    response = client.post('/%ss/%d/edit' % (kind, id), data=dict(form, phone='123-123-1234'))
+    assert response.status_code == 302
+    assert db.session.get(model, id).phone == '123-123-1234'
+    assert queued_checks() == []
+    client.post('/%ss/%d/edit' % (kind, id), data=dict(form, image_link='https://example.com/new.jpg'))
+    entity = db.session.get(model, id)
+    assert (entity.image_link, entity.image_link_ok) == ('https://example.com/new.jpg', None)
+    assert queued_checks() == [{'kind': kind, 'id': id}]
+
+
+def test_editing_an_unknown_venue_is_404(client):
+    assert client.post('/venues/7/edit', data=VENUE_FORM).status_code == 404
+
+
+def test_a_good_link_is_recorded(image_check):
+    venue = add_venue(image_link='https://example.com/hop.jpg')
+    jobs.enqueue('check-image-link', kind='venue', id=venue.id)
+    db.session.commit()
+    assert run_jobs() == 1
+    db.session.expire_all()
+    assert venue.image_link_ok is True
+    assert venue.image_link_checked_at is not None
+
+
+def test_a_broken_link_stays_recorded_after_a_requeue(app, image_check):
+    artist = add_artist(image_link='https://example.com/gone.jpg')
+    jobs.enqueue('check-image-link', kind='artist', id=artist.id)
+    db.session.commit()
+    image_check.error = jobs.Fail('artist 1: image_link answered 404.')
+    run_jobs()
+    assert db.session.scalar(db.select(db.func.count()).select_from(DeadJob)) == 1
+    result = app.test_cli_runner().invoke(args=['jobs', '--requeue'])
+    assert '1 dead jobs requeued' in result.output
+    db.session.expire_all()
+    assert artist.image_link_ok is False
+
+
+def test_a_retried_error_leaves_the_last_result(image_check):
+    venue = add_venue(image_link='https://example.com/hop.jpg', image_link_ok=True)
+    jobs.enqueue('check-image-link', kind='venue', id=venue.id)
+    db.session.commit()
+    image_check.error = OSError('connection reset')
+    run_jobs()
+    db.session.expire_all()
+    assert venue.image_link_ok is True
+    assert db.session.scalars(db.select(Job)).one().last_error
+
+
+def test_a_result_for_a_replaced_link_is_not_recorded(monkeypatch):
+    venue = add_venue(image_link='https://example.com/old.jpg')
+
+    def edited_while_checking(kind, id, url):
+        db.session.execute(db.update(Venue).values(image_link='https://example.com/new.jpg'))
+    monkeypatch.setattr(jobs, '_check_image', edited_while_checking)
+    jobs.enqueue('check-image-link', kind='venue', id=venue.id)
+    db.session.commit()
+    run_jobs()
+    db.session.expire_all()
+    assert venue.image_link_ok is None
+
+
+def test_queue_gauges_are_reused_between_scrapes(count_queries, monkeypatch):
+    monkeypatch.setattr(jobs, '_gauges', (0.0, ''))
+    with count_queries() as statements:
+        metrics.render()
+        jobs.enqueue('roll-counters')
+        db.session.commit()
+        assert 'fyyur_jobs_due 0' in metrics.render()
+    assert sum('FROM "Job"' in statement for statement in statements) == 1
+    # Once they expire, the queue is counted again.
+    monkeypatch.setattr(jobs, '_gauges', (0.0, jobs._gauges[1]))
+    assert 'fyyur_jobs_due 1' in metrics.render()
@@ -0,0 +1,55 @@
+import logging
+
+import pytest
+
+import config
+import logs
+from app import create_app
+
+
+@pytest.fixture
+def production(tmp_path):
+    """Settings for an app that logs through the queue (debug apps do not)."""
+    yield type('Config', (), dict(vars(config), DEBUG=False, LOG_FILE=str(tmp_path / 'fyyur.log')))
+    logs.detach(logging.getLogger('app'), logging.getLogger('fyyur'), logging.getLogger('fyyur.profiling.slow'))
+
+
+def queued_handlers(logger):
+    return [h for h in logger.handlers if isinstance(h, logs.BoundedQueueHandler)]
+
+
+def test_another_app_replaces_the_log_handler(production):
+    first, = queued_handlers(create_app(production).logger)
+    listener = first.listener
+    second, = queued_handlers(create_app(production).logger)
+    assert second is not first
+    assert queued_handlers(logging.getLogger('fyyur')) == [second]
+    assert listener._thread is None
+    assert logs._queues == [second.queue]
+
+
+def test_records_are_written_once(production, tmp_path):
+    create_app(production)
+    app = create_app(production)
+    app.logger.warning('written once')
+    logs.detach(app.logger)
+    assert (tmp_path / 'fyyur.log').read_text().count('written once') == 1
+
+
+def test_a_debug_app_removes_the_log_handler(production):
+    create_app(production)
+    create_app()
+    assert not queued_handlers(logging.getLogger('app'))
+    assert not logs._queues
+
+
+def test_another_profiling_app_replaces_the_slow_log_handler(production, tmp_path):
+    profiling = type('Config', (production,), {'PROFILING': True, 'PROFILING_SLOW_LOG': str(tmp_path / 'slow.log')})
+    slow = logging.getLogger('fyyur.profiling.slow')
+    create_app(profiling)
+    first, = queued_handlers(slow)
+    create_app(profiling)
+    second, = queued_handlers(slow)
+    assert second is not first and first.listener is None
+    create_app(production)
+    assert not queued_handlers(slow)
@@ -0,0 +1,27 @@
+from sqlalchemy import text
+
+import metrics
+from app import create_app
+from models import db
+
+
+def test_pool_checkouts_and_checkins_are_counted(app):
+    checkouts, checkins = metrics.pool_checkouts.value, metrics.pool_checkins.value
+    db.session.execute(text('SELECT 1'))
+    db.session.remove()
+    assert metrics.pool_checkouts.value == checkouts + 1
+    assert metrics.pool_checkins.value == checkins + 1
+
+
+def test_another_app_does_not_duplicate_series(app):
+    types = [line for line in metrics.render().splitlines() if line.startswith('# TYPE')]
+    create_app()
+    assert [line for line in metrics.render().splitlines() if line.startswith('# TYPE')] == types
+
+
+def test_instrumenting_a_pool_twice_counts_once(app):
+    metrics.instrument_engine(db.engine)
+    checkouts = metrics.pool_checkouts.value
+    db.session.execute(text('SELECT 1'))
+    db.session.remove()
+    assert metrics.pool_checkouts.value == checkouts + 1
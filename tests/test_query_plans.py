@@ -0,0 +1,44 @@
+"""The hot Show queries must search an index, never scan the table.
+
+benchmarks/plan_check.py checks the same plans against 1M shows (and on
+Postgres); these run on the test database's empty-ish tables, where
+SQLite plans from the schema alone.
+"""
+import pytest
+from sqlalchemy import event
+
+import queries
+from conftest import add_venue, add_artist, add_shows
+from models import db
+
+CALLS = {
+    'venue detail': lambda: queries.venue_detail(1),
+    'artist detail': lambda: queries.artist_detail(1),
+    'venue validators': lambda: queries.venue_validators(1),
+    'artist validators': lambda: queries.artist_validators(1),
+}
+
+
+def plans(call):
+    """EXPLAIN QUERY PLAN lines of each statement ``call`` sends that reads "Show"."""
+    found = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if '"Show"' in statement:
+            found.extend(row[-1] for row in cursor.connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', explain)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', explain)
+    return found
+
+
+@pytest.mark.parametrize('name', sorted(CALLS))
+def test_show_is_searched_through_an_index(name):
+    venue, artist = add_venue(), add_artist()
+    add_shows(venue, artist, [-2, -1, 1, 2])
+    plan = plans(CALLS[name])
+    assert any(line.startswith('SEARCH Show USING INDEX') for line in plan), plan
+    assert not any(line.startswith('SCAN Show') for line in plan), plan
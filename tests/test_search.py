@@ -0,0 +1,71 @@
+from sqlalchemy import delete, insert, update
+
+import search
+from conftest import add_venue
+from models import db, utcnow, Venue
+
+
+def names(result):
+    return [row['name'] for row in result['data']]
+
+
+def test_matches_part_of_the_name_ignoring_case():
+    add_venue(name='The Musical Hop')
+    add_venue(name='Park Square Live Music & Coffee')
+    add_venue(name='The Dueling Pianos Bar')
+    result = search.search_venues('MUSIC')
+    assert result['count'] == 2
+    assert sorted(names(result)) == ['Park Square Live Music & Coffee', 'The Musical Hop']
+
+
+def test_short_terms_match_nothing():
+    add_venue(name='Venue')
+    assert search.search_venues('ve') == {'count': 0, 'data': []}
+    assert search.search_venues('  v ') == {'count': 0, 'data': []}
+
+
+def test_results_are_capped_and_counted(app):
+    for i in range(12):
+        add_venue(name='Hall %d' % i)
+    app.config['SEARCH_MAX_RESULTS'] = 5
+    try:
+        result = search.search_venues('hall')
+    finally:
+        app.config['SEARCH_MAX_RESULTS'] = 50
+    assert result['count'] == 12
+    assert len(result['data']) == 5
+
+
+def test_closest_names_come_first():
+    add_venue(name='Blue Room Lounge Annex')
+    add_venue(name='Blue Room')
+    assert names(search.search_venues('blue room'))[0] == 'Blue Room'
+
+
+def test_sees_rows_written_outside_the_orm(monkeypatch):
+    monkeypatch.setattr(search, 'REFRESH_SECONDS', 0)
+    add_venue(name='Old Hall')
+    assert search.search_venues('hall')['count'] == 1
+    db.session.execute(insert(Venue), [{'name': 'New Hall'}, {'name': 'Other Place'}])
+    assert sorted(names(search.search_venues('hall'))) == ['New Hall', 'Old Hall']
+    # A rename committed by another process, which bumps updated_at.
+    db.session.execute(update(Venue).where(Venue.name == 'Other Place')
+                       .values(name='Other Hall', updated_at=utcnow()))
+    assert search.search_venues('hall')['count'] == 3
+    db.session.execute(delete(Venue).where(Venue.name == 'Old Hall'))
+    assert sorted(names(search.search_venues('hall'))) == ['New Hall', 'Other Hall']
+
+
+def test_search_page_explains_short_terms(client):
+    page = client.post('/venues/search', data={'search_term': 'a'}).get_data(as_text=True)
+    assert 'at least 3 characters' in page
+
+
+def test_sees_its_own_writes_at_once():
+    venue = add_venue(name='Old Hall')
+    assert search.search_venues('hall')['count'] == 1
+    venue.name = 'Old Barn'
+    db.session.commit()
+    assert search.search_venues('hall')['count'] == 0
+    add_venue(name='New Hall')
+    assert names(search.search_venues('hall')) == ['New Hall']
@@ -0,0 +1,39 @@
+from sqlalchemy import event
+
+import queries
+from conftest import add_venue, add_artist, add_shows
+from models import db
+
+
+def test_pages_walk_every_show_in_order():
+    venue, artist = add_venue(), add_artist()
+    add_shows(venue, artist, range(-7, 8))
+    seen, page = [], queries.show_page(4)
+    while True:
+        seen.extend(show['start_time'] for show in page['shows'])
+        if page['next_cursor'] is None:
+            break
+        page = queries.show_page(4, after=queries.decode_cursor(page['next_cursor']))
+    assert len(seen) == 15 and seen == sorted(seen)
+
+    back = queries.show_page(4, before=queries.decode_cursor(page['prev_cursor']))
+    assert [show['start_time'] for show in back['shows']] == seen[-7:-3]
+
+
+def test_pages_read_the_keyset_index_without_sorting():
+    venue, artist = add_venue(), add_artist()
+    add_shows(venue, artist, range(3))
+    middle = queries.show_page(2)['shows'][1]['start_time'], 2
+    plans = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        plans.extend(row[-1] for row in cursor.connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', explain)
+    try:
+        for cursors in ({}, {'after': middle}, {'before': middle}):
+            queries.show_page(2, **cursors)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', explain)
+    assert sum('ix_Show_start_time_id' in line for line in plans) == 3, plans
+    assert not any('TEMP B-TREE' in line for line in plans), plans
@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+import pytest
+
+import validation
+
+VENUE = {'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA',
+         'address': '1015 Folsom Street', 'genres': ['Jazz', 'Folk'],
+         'facebook_link': 'https://www.facebook.com/TheMusicalHop'}
+ARTIST = {'name': 'Guns N Petals', 'city': 'San Francisco', 'state': 'CA', 'genres': 'Rock n Roll'}
+
+
+@pytest.mark.parametrize('path, record', [
+    ('/api/v1/venues/validate', VENUE),
+    ('/api/v1/artists/validate', ARTIST),
+])
+def test_valid_records_pass(client, path, record):
+    response = client.post(path, json=[record])
+    assert response.status_code == 200
+    assert response.json == {'count': 1, 'valid': 1, 'errors': [[]]}
+
+
+@pytest.mark.parametrize('path, record', [
+    ('/api/v1/venues/validate', VENUE),
+    ('/api/v1/artists/validate', ARTIST),
+])
+@pytest.mark.parametrize('field, value, error', [
+    ('name', 1, 'name: Not a valid string.'),
+    ('facebook_link', 1, 'facebook_link: Not a valid string.'),
+    ('website_link', {'url': 'x'}, 'website_link: Not a valid string.'),
+    ('genres', [1, 2], 'genres: Not a valid list of names.'),
+    ('genres', 7, 'genres: Not a valid list of names.'),
+    ('state', ['CA'], 'state: Not a valid string.'),
+    ('latitude', [1], 'latitude, longitude: Not a valid coordinate pair.'),
+    ('latitude', True, 'latitude, longitude: Not a valid coordinate pair.'),
+])
+def test_values_of_the_wrong_type_are_field_errors(client, path, record, field, value, error):
+    response = client.post(path, json=[record, dict(record, **{field: value})])
+    assert response.status_code == 400
+    assert response.json == {'count': 2, 'valid': 1, 'errors': [[], [error]]}
+
+
+@pytest.mark.parametrize('value', [['no'], 1, 0, {'yes': True}])
+def test_flags_of_the_wrong_type_are_field_errors(value):
+    records, errors = validation.validate(validation.VENUE, [dict(VENUE, seeking_talent=value)])
+    assert records == [None]
+    assert errors == [['seeking_talent: Not a valid boolean.']]
+
+
+@pytest.mark.parametrize('value, expected', [(True, True), (False, False), ('yes', True), ('', False), (None, False)])
+def test_flags_take_booleans_and_form_strings(value, expected):
+    records, _ = validation.validate(validation.VENUE, [dict(VENUE, seeking_talent=value)])
+    assert records[0]['seeking_talent'] is expected
+
+
+def test_coordinates_take_numbers_and_strings():
+    records, _ = validation.validate(validation.VENUE, [dict(VENUE, latitude=37, longitude='-122.4')])
+    assert (records[0]['latitude'], records[0]['longitude']) == (37.0, -122.4)
+
+
+@pytest.mark.parametrize('venue_id, error', [
+    (3.9, 'venue_id: Not a valid integer.'),
+    (True, 'venue_id: Not a valid integer.'),
+    ('3.9', 'venue_id: Not a valid integer.'),
+    ([3], 'venue_id: Not a valid integer.'),
+    (4, 'venue_id: No such record.'),
+])
+def test_ids_must_be_integers(venue_id, error):
+    schema = validation.show_schema({1, 3}, {1}, timedelta(hours=2))
+    row = {'venue_id': venue_id, 'artist_id': 1, 'start_time': '2035-04-01T20:00:00'}
+    assert validation.validate(schema, [row]) == ([None], [[error]])
+
+
+@pytest.mark.parametrize('venue_id', [3, '3'])
+def test_ids_take_integers_and_digit_strings(venue_id):
+    schema = validation.show_schema({1, 3}, {1}, timedelta(hours=2))
+    records, _ = validation.validate(schema, [{'venue_id': venue_id, 'artist_id': 1, 'start_time': '2035-04-01T20:00:00'}])
+    assert records[0]['venue_id'] == 3
+
+
+@pytest.mark.parametrize('start_time, error', [
+    (1900000000, 'start_time: Not a valid string.'),
+    (['2035-04-01'], 'start_time: Not a valid string.'),
+    ('next week', 'start_time: Not a valid datetime value.'),
+])
+def test_show_times_of_the_wrong_type_are_field_errors(start_time, error):
+    schema = validation.show_schema({1}, {1}, timedelta(hours=2))
+    records, errors = validation.validate(schema, [{'venue_id': 1, 'artist_id': 1, 'start_time': start_time}])
+    assert records == [None]
+    assert errors == [[error]]
@@ -0,0 +1,203 @@
+"""Form rules for batches of records, without WTForms.
+
+VenueForm, ArtistForm and ShowForm check one submission through bound
+field objects. Imports and API clients send thousands of records, so the
+same rules are plain functions over dicts here. A schema is a tuple of
+(column, rule) pairs; a rule takes the raw record and returns the cleaned
+value (or, for column None, a dict of columns) or raises Invalid.
+``validate(schema, rows)`` runs every rule on every row and returns the
+cleaned records, None for invalid rows, and each row's list of errors.
+
+Values are strings, as a form would post them (JSON records may also give
+``genres`` as a list, coordinates as numbers, ids as integers and flags
+as booleans); any other type is an error of that field.
+
+Field names follow the forms (``website_link`` or ``website``, ``genres``
+as a list or a comma-separated string); venues and artists may also give
+``latitude`` and ``longitude``, both or neither.
+"""
+from datetime import datetime
+from functools import partial
+
+from wtforms.validators import URL
+
+import geo
+from forms import STATES, GENRES
+
+URL_PATTERN = URL().regex
+TRUE_VALUES = frozenset(['1', 'y', 'yes', 'true', 't', 'on'])
+
+
+class Invalid(ValueError):
+    """A record breaks a rule; the message starts with the field name."""
+
+
+def text(row, field, required=False):
+    value = row.get(field)
+    if value is not None and not isinstance(value, str):
+        raise Invalid('%s: Not a valid string.' % field)
+    value = value.strip() if value is not None else value
+    if required and not value:
+        raise Invalid('%s: This field is required.' % field)
+    return value or None
+
+
+def url(row, field):
+    value = text(row, field)
+    if value is not None and not URL_PATTERN.match(value):
+        raise Invalid('%s: Invalid URL.' % field)
+    return value
+
+
+def website(row):
+    return text(row, 'website_link') or text(row, 'website')
+
+
+def genres(row):
+    value = row.get('genres') or []
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise Invalid('genres: Not a valid list of names.')
+    names = list(dict.fromkeys(name.strip() for name in value if name.strip()))
+    if not names:
+        raise Invalid('genres: This field is required.')
+    if not GENRES.issuperset(names):
+        raise Invalid('genres: Not a valid choice: %s.' % ', '.join(name for name in names if name not in GENRES))
+    return names
+
+
+def state(row):
+    value = text(row, 'state', required=True)
+    if value not in STATES:
+        raise Invalid('state: Not a valid choice.')
+    return value
+
+
+def flag(row, field):
+    value = row.get(field)
+    if isinstance(value, bool):
+        return value
+    if value is not None and not isinstance(value, str):
+        raise Invalid('%s: Not a valid boolean.' % field)
+    return (value or '').strip().lower() in TRUE_VALUES
+
+
+def known_id(row, field, known_ids):
+    value = row.get(field)
+    # int() would also take 3.9 (as 3) and True (as 1).
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise Invalid('%s: Not a valid integer.' % field)
+    try:
+        value = int(value)
+    except ValueError:
+        raise Invalid('%s: Not a valid integer.' % field)
+    if value not in known_ids:
+        raise Invalid('%s: No such record.' % field)
+    return value
+
+
+def timestamp(row, field, required=False):
+    """A naive local datetime; values with an offset ("Z", "+02:00") are converted to local time."""
+    value = row.get(field)
+    if not isinstance(value, datetime):
+        value = text(row, field, required=required)
+    if value is not None and not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            try:
+                import dateutil.parser
+                value = dateutil.parser.parse(value)
+            except (ValueError, OverflowError):
+                raise Invalid('%s: Not a valid datetime value.' % field)
+    if value is not None and value.tzinfo is not None:
+        # Show times are naive local time, compared with datetime.now()
+        # (queries.py, counters.py), and an aware value cannot be compared
+        # with them at all.
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def location(row):
+    """latitude, longitude and geohash; all None when the row has no location."""
+    values = [row.get(field) for field in ('latitude', 'longitude')]
+    values = [value.strip() if isinstance(value, str) else value for value in values]
+    if all(value in (None, '') for value in values):
+        return {'latitude': None, 'longitude': None, 'geohash': None}
+    if any(isinstance(value, bool) or not isinstance(value, (int, float, str)) for value in values):
+        raise Invalid('latitude, longitude: Not a valid coordinate pair.')
+    try:
+        latitude, longitude = (float(value) for value in values)
+    except (TypeError, ValueError):
+        raise Invalid('latitude, longitude: Not a valid coordinate pair.')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise Invalid('latitude, longitude: Out of range.')
+    return {'latitude': latitude, 'longitude': longitude, 'geohash': geo.encode(latitude, longitude)}
+
+
+def show_times(row, default_length):
+    start_time = timestamp(row, 'start_time', required=True)
+    end_time = timestamp(row, 'end_time') or start_time + default_length
+    if end_time <= start_time:
+        raise Invalid('end_time: Must be after start_time.')
+    return {'start_time': start_time, 'end_time': end_time}
+
+
+VENUE = (
+    ('name', partial(text, field='name', required=True)),
+    ('city', partial(text, field='city', required=True)),
+    ('state', state),
+    ('address', partial(text, field='address', required=True)),
+    ('phone', partial(text, field='phone')),
+    ('image_link', partial(text, field='image_link')),
+    ('facebook_link', partial(url, field='facebook_link')),
+    ('website', website),
+    ('seeking_talent', partial(flag, field='seeking_talent')),
+    ('seeking_description', partial(text, field='seeking_description')),
+    (None, location),
+    ('genres', genres),
+)
+
+ARTIST = (
+    ('name', partial(text, field='name', required=True)),
+    ('city', partial(text, field='city', required=True)),
+    ('state', state),
+    ('phone', partial(text, field='phone')),
+    ('image_link', partial(text, field='image_link')),
+    ('facebook_link', partial(url, field='facebook_link')),
+    ('website', website),
+    ('seeking_venue', partial(flag, field='seeking_venue')),
+    ('seeking_description', partial(text, field='seeking_description')),
+    (None, location),
+    ('genres', genres),
+)
+
+
+def show_schema(venue_ids, artist_ids, default_length):
+    """Show rules against the given venue and artist ids; shows without an end last ``default_length``."""
+    return (
+        ('venue_id', partial(known_id, field='venue_id', known_ids=venue_ids)),
+        ('artist_id', partial(known_id, field='artist_id', known_ids=artist_ids)),
+        (None, partial(show_times, default_length=default_length)),
+    )
+
+
+def validate(schema, rows):
+    """([record or None], [[error, ...]]) for ``rows``, in order."""
+    records, errors = [], []
+    for row in rows:
+        record, row_errors = {}, []
+        for column, rule in schema:
+            try:
+                value = rule(row)
+            except Invalid as error:
+                row_errors.append(str(error))
+                continue
+            if column is None:
+                record.update(value)
+            else:
+                record[column] = value
+        records.append(None if row_errors else record)
+        errors.append(row_errors)
+    return records, errors
@@ -0,0 +1,181 @@
+"""Venue pages: directory, search, detail, create and edit."""
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+
+import aio
+import cache
+import conditional
+import geo
+import jobs
+import queries
+import search
+from forms import VenueForm
+from models import db, Venue, Genre
+
+venues = Blueprint('venues', __name__, url_prefix='/venues')
+
+
+@venues.route('')
+@cache.cached_page('venues')
+def index():
+    # ?genre=<name> keeps only the venues of that genre
+    return render_template('pages/venues.html', areas=queries.venue_directory(request.args.get('genre')))
+
+
+@venues.route('/search', methods=['POST'], endpoint='search')
+def search_venues():
+    search_term = request.form.get('search_term', '')
+    response = cache.fragment(
+        'search:venues:' + search_term.strip().lower(), ['venues'],
+        lambda: search.search_venues(search_term))
+    return render_template('pages/search_venues.html', results=response, search_term=search_term,
+                           min_term_length=search.MIN_TERM_LENGTH)
+
+
+@venues.route('/nearby')
+def nearby():
+    # ?lat=&lng= (degrees), optional ?radius= (km) and ?limit= (nearest first)
+    arguments = geo.nearby_arguments(request.args)
+    if arguments is None:
+        abort(400)
+    latitude, longitude, radius, limit = arguments
+    return render_template('pages/nearby_venues.html', results=geo.nearby_venues(latitude, longitude, radius, limit),
+                           latitude=latitude, longitude=longitude, radius=radius)
+
+
+@venues.route('/<int:venue_id>')
+@conditional.conditional_page(queries.venue_validators)
+@cache.cached_page('venue:{venue_id}')
+def show(venue_id):
+    # shows the venue page with the given venue_id
+    data = queries.venue_detail(venue_id)
+    if data is None:
+        abort(404)
+    cache.add_tags(*('artist:%s' % show['artist_id'] for show in data['past_shows'] + data['upcoming_shows']))
+    return render_template('pages/show_venue.html', venue=data)
+
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+def fill_venue(venue, form):
+    """Copy the fields of a submitted VenueForm onto ``venue``; returns it."""
+    venue.name = form.name.data
+    venue.city = form.city.data
+    venue.state = form.state.data
+    venue.address = form.address.data
+    venue.phone = form.phone.data
+    venue.genres = Genre.get_or_create_all(form.genres.data)
+    venue.image_link = form.image_link.data
+    venue.facebook_link = form.facebook_link.data
+    venue.website = form.website_link.data
+    venue.seeking_talent = form.seeking_talent.data
+    venue.seeking_description = form.seeking_description.data
+    return venue
+
+
+@venues.route('/create', methods=['GET'])
+def create_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@venues.route('/create', methods=['POST'])
+def create_submission():
+    form = VenueForm(request.form)
+    try:
+        new_venue = fill_venue(Venue(), form)
+        db.session.add(new_venue)
+        db.session.flush()
+        # Checked by a worker; committed with the venue.
+        jobs.check_image_later('venue', new_venue)
+        db.session.commit()
+        flash('Venue ' + new_venue.name + ' was successfully listed!')
+    except Exception:
+        db.session.rollback()
+        flash('An error occurred. Venue ' + request.form.get('name', '') + ' could not be listed.')
+        current_app.logger.exception('Error adding venue')
+    finally:
+        db.session.close()
+    return render_template('pages/home.html')
+
+
+@venues.route('/<venue_id>', methods=['DELETE'])
+def delete(venue_id):
+    # TODO: Complete this endpoint for taking a venue_id, and using
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return None
+
+
+#  Update
+#  ----------------------------------------------------------------
+
+@venues.route('/<int:venue_id>/edit', methods=['GET'])
+def edit(venue_id):
+    form = VenueForm()
+    venue = {
+        "id": 1,
+        "name": "The Musical Hop",
+        "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
+        "address": "1015 Folsom Street",
+        "city": "San Francisco",
+        "state": "CA",
+        "phone": "123-123-1234",
+        "website": "https://www.themusicalhop.com",
+        "facebook_link": "https://www.facebook.com/TheMusicalHop",
+        "seeking_talent": True,
+        "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
+        "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
+    }
+    # TODO: populate form with values from venue with ID <venue_id>
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+
+@venues.route('/<int:venue_id>/edit', methods=['POST'])
+def edit_submission(venue_id):
+    venue = db.session.get(Venue, venue_id)
+    if venue is None:
+        abort(404)
+    image_link = venue.image_link
+    try:
+        fill_venue(venue, VenueForm(request.form))
+        if venue.image_link != image_link:
+            jobs.check_image_later('venue', venue)
+        db.session.commit()
+        flash('Venue ' + venue.name + ' was successfully updated!')
+    except Exception:
+        db.session.rollback()
+        flash('An error occurred. Venue could not be updated.')
+        current_app.logger.exception('Error updating venue %s', venue_id)
+    finally:
+        db.session.close()
+    return redirect(url_for('venues.show', venue_id=venue_id))
+
+
+#  Async variants
+#  ----------------------------------------------------------------
+# With ASYNC_MODE=1 these replace the sync views of the same endpoint: the
+# queries run on the async engine in aio.py, independent ones concurrently.
+
+async def index_async():
+    return render_template('pages/venues.html', areas=await aio.venue_directory(request.args.get('genre')))
+
+
+async def show_async(venue_id):
+    data = await aio.venue_detail(venue_id)
+    if data is None:
+        abort(404)
+    cache.add_tags(*('artist:%s' % show['artist_id'] for show in data['past_shows'] + data['upcoming_shows']))
+    return render_template('pages/show_venue.html', venue=data)
+
+
+@venues.record_once
+def use_async_views(state):
+    if state.app.config['ASYNC_MODE']:
+        state.app.view_functions.update({
+            'venues.index': cache.cached_page('venues')(index_async),
+            'venues.show': conditional.conditional_page(queries.venue_validators)(
+                cache.cached_page('venue:{venue_id}')(show_async)),
+        })